@@ -1,6 +1,8 @@
 from msd import create_app
 
-app = create_app()
+# عمليات التحليل الفرعية (spawn) تعيد تنفيذ هذا الملف باسم __mp_main__ ولا تحتاج التطبيق
+if __name__ != "__mp_main__":
+    app = create_app()
 
 if __name__ == "__main__":
     # يمكنك تغيير debug/host/port حسب حاجتك
@@ -7,4 +7,52 @@ class Config:
     SECRET_KEY = os.environ.get("EMP_SYS_SECRET") or "change_this_secret_12345"
     DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "employees.db")
     EXPORT_DIR = "static/exports"
-    MAX_IMPORT_ROWS = 5000
\ No newline at end of file
+    # ملفات التصدير المؤقتة (xlsx) تُحذف بعد الإرسال أو بعد انتهاء المدة
+    EXPORT_TEMP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports")
+    EXPORT_TTL_SECONDS = 3600
+    # حد سياسة لعدد صفوف ملف الاستيراد (0 = بلا حد)؛ القراءة تتم على دفعات
+    MAX_IMPORT_ROWS = 5000
+    IMPORT_CHUNK_SIZE = 1000
+    # مهام الاستيراد في الخلفية: عدد الخيوط ومجلد الملفات المرفوعة ومدة صلاحية المعاينة
+    IMPORT_WORKERS = 2
+    # عمليات تحليل الأوراق/الملفات المتعددة بالتوازي
+    IMPORT_PARSE_PROCESSES = 2
+    # أسماء أعمدة إضافية لكل حقل، مثال: {"national_id": ["الرقم المدني"]}
+    IMPORT_COLUMN_ALIASES = {}
+    IMPORT_STAGING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imports")
+    IMPORT_CACHE_TTL_SECONDS = 3600
+    # عدد اتصالات SQLite المحفوظة في المجمّع (اتصال لكل خيط)
+    DB_POOL_SIZE = 16
+    # عدد نتائج الاستعلامات المحفوظة في الذاكرة لكل عملية (0 = بلا تخزين)
+    RESULT_CACHE_SIZE = 256
+    # نسخ WebUser المحفوظة لمحمّل المستخدم (0 = بلا تخزين) ومدة صلاحيتها بالثواني
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL_SECONDS = 300
+    # تحقق كلمات المرور (bcrypt) في مجمّع خيوط محدود: العمال + الانتظار، وما زاد يُرفض (503)
+    AUTH_HASH_WORKERS = 2
+    AUTH_HASH_QUEUE_SIZE = 16
+    AUTH_HASH_TIMEOUT_SECONDS = 10
+    # محاولات الدخول: سعة الدلو ومعدل امتلائه في الدقيقة لكل اسم مستخدم ولكل IP (429 عند النفاد)
+    LOGIN_USER_BURST = 5
+    LOGIN_USER_PER_MINUTE = 5
+    LOGIN_IP_BURST = 20
+    LOGIN_IP_PER_MINUTE = 30
+    # سياسة تجزئة كلمات المرور: المخطط الأول للتجزئة والبقية للتحقق فقط (تُعاد تجزئتها عند الدخول)
+    PASSWORD_SCHEMES = ["bcrypt"]
+    # جولات bcrypt ثابتة؛ None = المعايرة المحفوظة أو معايرة عند التشغيل (flask passwords calibrate)
+    PASSWORD_HASH_ROUNDS = None
+    PASSWORD_TARGET_MS = 250
+    PASSWORD_MIN_ROUNDS = 10
+    PASSWORD_MAX_ROUNDS = 16
+    PASSWORD_CALIBRATE_ON_STARTUP = True
+    # مفتاح HMAC لرموز API (الافتراضي SECRET_KEY؛ تغييره يُبطل كل الرموز) وفترة كتابة last_used_at
+    API_TOKEN_SECRET = os.environ.get("EMP_SYS_API_TOKEN_SECRET")
+    API_TOKEN_TOUCH_SECONDS = 60
+    # ملف تخزين SQLite: legacy / balanced (WAL) / durable — انظر msd/database/storage.py
+    SQLITE_STORAGE_PROFILE = os.environ.get("EMP_SYS_SQLITE_PROFILE") or "balanced"
+    # تجاوز إعدادات مفردة، مثال: {"busy_timeout": 10000}
+    SQLITE_PRAGMAS = {}
+    # المجدول الداخلي (التراكم الشهري وإعادة ضبط الطارئة)
+    SCHEDULER_ENABLED = True
+    SCHEDULER_POLL_SECONDS = 60
+    SCHEDULER_LEASE_SECONDS = 600
@@ -21,6 +21,18 @@ def create_app(config_class="config.Config"):
 
     # تهيئة تسجيل الدخول
     login_manager.init_app(app)
+    try:
+        from .auth.service import load_user_by_id
+        login_manager.user_loader(load_user_by_id)
+    except Exception as e:
+        app.logger.warning(f"User loader not registered: {e}")
+
+    # رموز API: Authorization: Bearer لواجهات JSON دون جلسة أو bcrypt
+    try:
+        from .auth.token_service import init_api_tokens
+        init_api_tokens(app, login_manager)
+    except Exception as e:
+        app.logger.warning(f"API tokens not initialized: {e}")
 
     # تهيئة قاعدة البيانات/المخطط
     try:
@@ -44,22 +56,49 @@ def create_app(config_class="config.Config"):
         # إن لم تكن وحدة الموظفين متاحة بعد، لا نوقف التطبيق
         pass
 
-    # خدمات تلقائية (تراكم/إعادة ضبط) — غير معطِّلة للتشغيل
     try:
-        from .vacations.accrual_service import run_monthly_accrual
-        from .vacations.emergency_reset_service import run_annual_reset
-        with app.app_context():
-            try:
-                run_monthly_accrual()
-            except Exception as e:
-                app.logger.info(f"Accrual service skipped: {e}")
-            try:
-                run_annual_reset()
-            except Exception as e:
-                app.logger.info(f"Emergency reset skipped: {e}")
-    except Exception:
-        # الخدمات اختيارية
-        pass
+        from .absences.routes import absences_bp
+        app.register_blueprint(absences_bp)
+    except Exception as e:
+        app.logger.warning(f"Absences blueprint not registered: {e}")
+
+    try:
+        from .vacations.routes import vacations_bp
+        app.register_blueprint(vacations_bp)
+    except Exception as e:
+        app.logger.warning(f"Vacations blueprint not registered: {e}")
+
+    try:
+        from .scheduler.routes import scheduler_bp
+        app.register_blueprint(scheduler_bp)
+    except Exception as e:
+        app.logger.warning(f"Scheduler blueprint not registered: {e}")
+
+    try:
+        from .auth.password_service import init_password_verifier
+        init_password_verifier(app)
+    except Exception as e:
+        app.logger.warning(f"Password verifier not initialized: {e}")
+
+    try:
+        from .employees.import_jobs import init_import_jobs
+        init_import_jobs(app)
+    except Exception as e:
+        app.logger.warning(f"Import jobs not initialized: {e}")
+
+    # خدمات تلقائية (تراكم/إعادة ضبط) — تعمل في الخلفية خارج مسار الطلبات
+    try:
+        from .scheduler.service import init_scheduler
+        init_scheduler(app)
+    except Exception as e:
+        app.logger.warning(f"Scheduler not started: {e}")
+
+    try:
+        from .auth.cli import passwords_cli, tokens_cli
+        app.cli.add_command(passwords_cli)
+        app.cli.add_command(tokens_cli)
+    except Exception as e:
+        app.logger.warning(f"Password CLI not registered: {e}")
 
     @app.route("/")
     def index():
@@ -0,0 +1,2 @@
+# msd/absences/__init__.py
+"""Absences package for MSD Employee Management System"""
@@ -0,0 +1,117 @@
+# msd/absences/routes.py
+"""
+Absences routes blueprint
+"""
+
+import os
+import logging
+from datetime import date, datetime
+
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
+from flask_login import login_required
+
+from ..database.connection import get_conn
+from ..database.pagination import page_limit
+from ..dashboard.service import dashboard_stats
+from ..employees.routes import scoped_department_id
+from ..utils.export import (
+    EXPORT_FORMATS, MIMETYPES, iter_cursor, iter_csv, write_xlsx, iter_file_then_remove,
+    export_temp_path, remove_export
+)
+from .service import EXPORT_HEADERS, absence_export_query, list_absences_page, absence_employees, absence_total, recent_months
+
+logger = logging.getLogger(__name__)
+
+absences_bp = Blueprint("absences", __name__, url_prefix="")
+
+
+@absences_bp.route("/absences")
+@login_required
+def absences_list():
+    """GET /absences: absences page; rows are loaded page by page from /api/absences"""
+    department_id = scoped_department_id()
+    stats = dashboard_stats(department_id=department_id)
+    return render_template("absences.html",
+                           employees=absence_employees(department_id),
+                           months=recent_months(),
+                           total_absences=absence_total(department_id),
+                           today_absences=stats['today_absences'],
+                           today=date.today().isoformat())
+
+
+@absences_bp.route("/api/absences")
+@login_required
+def absences_page():
+    """GET /api/absences: keyset page of absences, newest first, scoped to the user's department"""
+    try:
+        page = list_absences_page(
+            cursor=request.args.get('cursor'),
+            limit=page_limit(request.args.get('limit')),
+            department_id=scoped_department_id(),
+            employee_id=request.args.get('employee') or None,
+            abs_type=request.args.get('type') or None,
+            month=request.args.get('month') or None,
+            q=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"success": True, **page})
+
+
+@absences_bp.route("/export/absences")
+@login_required
+def export_absences():
+    """GET /export/absences: absence report as xlsx (default) or csv, streamed from the cursor"""
+    fmt = request.args.get('format', 'xlsx').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"صيغة التصدير غير مدعومة: {fmt}"}), 400
+
+    try:
+        query, params = absence_export_query(
+            month=request.args.get('month'),
+            employee_id=request.args.get('employee'),
+            abs_type=request.args.get('type'),
+            year=request.args.get('year'),
+            date_from=request.args.get('from'),
+            date_to=request.args.get('to'),
+            department_id=scoped_department_id()
+        )
+    except ValueError as e:
+        return jsonify({"error": f"فترة غير صالحة: {e}"}), 400
+    filename = f"absences_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+    if fmt == 'csv':
+        return Response(stream_with_context(_stream_csv(query, params)), mimetype=MIMETYPES['csv'],
+                        headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+    path = export_temp_path('xlsx')
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        write_xlsx(path, EXPORT_HEADERS, iter_cursor(cur), title='الغياب')
+    except Exception as e:
+        remove_export(path)
+        logger.exception("خطأ في تصدير تقرير الغياب")
+        return jsonify({"error": str(e)}), 500
+    finally:
+        conn.close()
+
+    # لا send_file: تمريره المباشر يتجاوز call_on_close فيبقى الملف المؤقت
+    return Response(iter_file_then_remove(path), mimetype=MIMETYPES['xlsx'],
+                    headers={"Content-Disposition": f"attachment; filename={filename}",
+                             "Content-Length": str(os.path.getsize(path))})
+
+
+def _stream_csv(query, params):
+    # الاتصال يبقى مفتوحاً طوال إرسال الاستجابة
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        yield from iter_csv(EXPORT_HEADERS, iter_cursor(cur))
+    except Exception:
+        logger.exception("خطأ في تصدير تقرير الغياب")
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,116 @@
+# msd/absences/service.py
+"""
+Absence queries shared by the absences routes
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from ..database.connection import get_conn
+from ..database.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from ..database.report_filters import ReportFilter
+
+EXPORT_HEADERS = ['الموظف', 'التاريخ', 'النوع', 'المدة', 'ملاحظات', 'القسم']
+
+EXPORT_QUERY = """
+    SELECT e.name, a.date, a.type, a.duration, a.notes, d.name as department
+    FROM absences a
+    JOIN employees e ON a.employee_id = e.id
+    LEFT JOIN departments d ON e.department_id = d.id
+    WHERE 1=1
+"""
+
+PAGE_QUERY = """
+    SELECT a.id, a.employee_id, e.name AS employee_name, a.department_id, d.name AS department,
+           a.date, a.type, a.duration, a.notes, a.created_at
+    FROM absences a
+    JOIN employees e ON a.employee_id = e.id
+    LEFT JOIN departments d ON a.department_id = d.id
+    WHERE 1=1
+"""
+PAGE_KEYS = ("a.date", "a.id")
+
+ARABIC_MONTHS = ['يناير', 'فبراير', 'مارس', 'أبريل', 'مايو', 'يونيو',
+                 'يوليو', 'أغسطس', 'سبتمبر', 'أكتوبر', 'نوفمبر', 'ديسمبر']
+
+
+def recent_months(count: int = 12, today: Optional[date] = None) -> List[Dict[str, str]]:
+    """The last ``count`` months as [{'value': 'YYYY-MM', 'name': ...}], newest first."""
+    today = today or date.today()
+    months = []
+    year, month = today.year, today.month
+    for _ in range(count):
+        months.append({'value': f"{year:04d}-{month:02d}", 'name': f"{ARABIC_MONTHS[month - 1]} {year}"})
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return months
+
+
+def absence_employees(department_id: Optional[int] = None) -> List[Dict]:
+    """Employee id/name pairs for the absence filters and form."""
+    query = "SELECT id, name FROM employees"
+    params = []
+    if department_id is not None:
+        query += " WHERE department_id = ?"
+        params.append(department_id)
+    conn = get_conn()
+    try:
+        return [dict(row) for row in conn.execute(query + " ORDER BY name", params).fetchall()]
+    finally:
+        conn.close()
+
+
+def absence_total(department_id: Optional[int] = None) -> int:
+    """Number of recorded absences, summed from the per-day counters (migration 11)."""
+    query = "SELECT COALESCE(SUM(value), 0) FROM stats_counters WHERE name = 'absences'"
+    params = []
+    if department_id is not None:
+        query += " AND department_id = ?"
+        params.append(department_id)
+    conn = get_conn()
+    try:
+        return conn.execute(query, params).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def absence_export_query(
+    month: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    abs_type: Optional[str] = None,
+    year: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    department_id: Optional[int] = None
+) -> Tuple[str, List]:
+    """SQL and parameters of the absence report, newest first (ValueError on a bad period)."""
+    filters = (ReportFilter()
+               .period("a.date", month=month, year=year, date_from=date_from, date_to=date_to)
+               .equals("a.department_id", department_id)
+               .equals("a.employee_id", employee_id)
+               .equals("a.type", abs_type))
+    return filters.build(EXPORT_QUERY, order_by="a.date DESC")
+
+
+def list_absences_page(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    department_id: Optional[int] = None,
+    employee_id: Optional[str] = None,
+    abs_type: Optional[str] = None,
+    month: Optional[str] = None,
+    q: Optional[str] = None
+) -> Dict:
+    """One page of absences, newest first, ordered by (date, id); see msd.database.pagination"""
+    filters = (ReportFilter()
+               .period("a.date", month=month)
+               .equals("a.department_id", department_id)
+               .equals("a.employee_id", employee_id)
+               .equals("a.type", abs_type)
+               .search(q, contains=["e.name"]))
+
+    conn = get_conn()
+    try:
+        return keyset_page(conn.cursor(), PAGE_QUERY + filters.sql(), filters.params, PAGE_KEYS,
+                           cursor=cursor, limit=limit, descending=True)
+    finally:
+        conn.close()
@@ -1 +1,5 @@
-# Auth package
\ No newline at end of file
+# Auth package
+from .service import WebUser, find_user_by_username, load_user_by_id, user_cache_stats
+
+# الاسم القديم (msd/auth.py) الذي تستورده app_factory.py وapp_integrated.py
+load_user = load_user_by_id
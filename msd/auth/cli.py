@@ -0,0 +1,85 @@
+"""
+``flask passwords ...``: calibrate and benchmark the password hashing policy.
+``flask tokens ...``: issue and revoke API tokens for machine clients.
+"""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .password_policy import (
+    DEFAULT_MAX_ROUNDS, DEFAULT_MIN_ROUNDS, DEFAULT_SCHEMES, DEFAULT_TARGET_MS,
+    benchmark, calibrate_rounds, measure_verify_ms, save_rounds, password_context
+)
+from .service import WebUser, find_user_by_username
+from .token_service import create_api_token, revoke_api_token
+
+passwords_cli = AppGroup("passwords", help="Password hashing policy (bcrypt cost).")
+
+
+@passwords_cli.command("calibrate")
+@click.option("--target-ms", type=float, default=None, help="Target verify latency (default PASSWORD_TARGET_MS).")
+@click.option("--save/--dry-run", default=True, help="Store the rounds for all processes (app_settings).")
+def calibrate_command(target_ms, save):
+    """Pick the bcrypt rounds whose verification takes about --target-ms on this machine."""
+    config = current_app.config
+    target_ms = target_ms or float(config.get("PASSWORD_TARGET_MS", DEFAULT_TARGET_MS))
+    rounds = calibrate_rounds(target_ms, int(config.get("PASSWORD_MIN_ROUNDS", DEFAULT_MIN_ROUNDS)),
+                              int(config.get("PASSWORD_MAX_ROUNDS", DEFAULT_MAX_ROUNDS)))
+    click.echo(f"bcrypt rounds={rounds}: verify {measure_verify_ms('bcrypt', rounds):.1f} ms "
+               f"(target {target_ms:.0f} ms)")
+    if config.get("PASSWORD_HASH_ROUNDS"):
+        click.echo(f"note: PASSWORD_HASH_ROUNDS={config['PASSWORD_HASH_ROUNDS']} in the config takes precedence")
+    if save:
+        save_rounds(rounds)
+        click.echo("saved; running processes pick it up on restart, old hashes are upgraded at login")
+
+
+@passwords_cli.command("benchmark")
+@click.option("--scheme", "schemes", multiple=True, help="Scheme to measure (repeatable; default PASSWORD_SCHEMES).")
+@click.option("--rounds", "costs", multiple=True, type=int, help="Cost to measure (repeatable).")
+@click.option("--samples", type=int, default=3, show_default=True, help="Verifications per cost (best is kept).")
+def benchmark_command(schemes, costs, samples):
+    """Verify latency per scheme and cost."""
+    schemes = schemes or current_app.config.get("PASSWORD_SCHEMES", DEFAULT_SCHEMES)
+    current = password_context()
+    default_scheme = current.default_scheme()
+    current_rounds = current.handler(default_scheme).default_rounds if hasattr(
+        current.handler(default_scheme), "default_rounds") else None
+    click.echo(f"{'scheme':<16}{'rounds':>10}{'verify ms':>12}")
+    for row in benchmark(schemes, list(costs) or None, samples):
+        marker = "  <- policy" if (row["scheme"], row["rounds"]) == (default_scheme, current_rounds) else ""
+        rounds = "-" if row["rounds"] is None else row["rounds"]
+        click.echo(f"{row['scheme']:<16}{rounds:>10}{row['verify_ms']:>12.1f}{marker}")
+
+
+tokens_cli = AppGroup("tokens", help="API tokens for machine clients.")
+
+
+@tokens_cli.command("create")
+@click.argument("username")
+@click.option("--name", required=True, help="What the token is for (e.g. telegram-bot).")
+@click.option("--role", type=click.Choice(["manager", "dept_head", "employee"]), default=None,
+              help="Narrower role than the user's.")
+@click.option("--department", "department_id", type=int, default=None,
+              help="Department the token is limited to (not for manager tokens).")
+@click.option("--days", "expires_days", type=int, default=None, help="Expire after this many days.")
+def create_token_command(username, name, role, department_id, expires_days):
+    """Issue a token acting as USERNAME; the secret is printed once."""
+    row = find_user_by_username(username)
+    if not row or row["is_active"] == 0:
+        raise click.ClickException(f"no active user {username}")
+    owner = WebUser(row["id"], row["username"], row["role"], row["department_id"], row["dept_name"])
+    try:
+        token, info = create_api_token(owner, name, role, department_id, expires_days)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"token {info['id']} ({info['role']}): {token}")
+
+
+@tokens_cli.command("revoke")
+@click.argument("token_id", type=int)
+def revoke_token_command(token_id):
+    """Revoke a token by id."""
+    if not revoke_api_token(token_id, WebUser(0, "cli", "manager")):
+        raise click.ClickException(f"token {token_id} not found or already revoked")
+    click.echo(f"token {token_id} revoked")
@@ -0,0 +1,165 @@
+"""
+Password hashing policy (passlib CryptContext) with cost calibration.
+
+The bcrypt cost is chosen for the hardware instead of passlib's fixed
+default: the rounds whose verification takes about PASSWORD_TARGET_MS. It
+comes from, in order:
+
+1. PASSWORD_HASH_ROUNDS in the config (fixed),
+2. the ``password_hash_rounds`` row of ``app_settings`` (written by
+   ``flask passwords calibrate`` or by the first calibrating process),
+3. a calibration at startup when PASSWORD_CALIBRATE_ON_STARTUP is set.
+
+The chosen rounds are also the context's minimum, so needs_update() flags
+only weaker hashes (fewer rounds, or a scheme that is no longer first in
+PASSWORD_SCHEMES); they are replaced on the next successful login.
+"""
+
+import math
+import time
+import logging
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from flask import current_app, has_app_context
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+from msd.database.connection import get_conn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEMES = ("bcrypt",)
+DEFAULT_TARGET_MS = 250
+DEFAULT_MIN_ROUNDS = 10
+DEFAULT_MAX_ROUNDS = 16
+SETTING_KEY = "password_hash_rounds"
+# مخططات تُضبط كلفتها بعدد الجولات اللوغاريتمي نفسه
+ROUNDS_SCHEMES = ("bcrypt", "bcrypt_sha256")
+_SAMPLE_PASSWORD = "calibration-sample-password"
+
+
+def build_context(schemes: Iterable[str] = DEFAULT_SCHEMES, rounds: Optional[int] = None) -> CryptContext:
+    """Context hashing with the first scheme; the others are only verified (and flagged for rehash)."""
+    schemes = list(schemes)
+    settings = {}
+    if rounds is not None:
+        for scheme in ROUNDS_SCHEMES:
+            if scheme in schemes:
+                settings[f"{scheme}__default_rounds"] = rounds
+                settings[f"{scheme}__min_rounds"] = rounds
+    return CryptContext(schemes=schemes, deprecated="auto", **settings)
+
+
+def measure_verify_ms(scheme: str, rounds: Optional[int] = None, samples: int = 3) -> float:
+    """Best-of-``samples`` verify time (ms) for one scheme and cost."""
+    handler = get_crypt_handler(scheme)
+    if rounds is not None:
+        handler = handler.using(rounds=rounds)
+    hashed = handler.hash(_SAMPLE_PASSWORD)
+    best = math.inf
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.verify(_SAMPLE_PASSWORD, hashed)
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def calibrate_rounds(target_ms: float = DEFAULT_TARGET_MS, min_rounds: int = DEFAULT_MIN_ROUNDS,
+                     max_rounds: int = DEFAULT_MAX_ROUNDS, scheme: str = "bcrypt") -> int:
+    """Highest rounds whose verification stays within ``target_ms`` (each round doubles the cost)."""
+    rounds = min_rounds
+    elapsed = measure_verify_ms(scheme, rounds)
+    # القياس عند الحد الأدنى ثم التقدير بالمضاعفة، مع التحقق من الجولة المختارة
+    if elapsed > 0:
+        rounds = max(min_rounds, min(max_rounds, min_rounds + int(math.log2(target_ms / elapsed))))
+    while rounds > min_rounds and measure_verify_ms(scheme, rounds, samples=1) > target_ms * 1.25:
+        rounds -= 1
+    return rounds
+
+
+def saved_rounds() -> Optional[int]:
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (SETTING_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        # قبل الترحيل 16
+        return None
+    finally:
+        conn.close()
+    return int(row[0]) if row else None
+
+
+def save_rounds(rounds: int, replace: bool = True) -> int:
+    """Store the rounds for every process; with ``replace=False`` an existing value wins. Returns the stored value."""
+    conn = get_conn()
+    try:
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        conn.execute(f"""
+            {verb} INTO app_settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        """, (SETTING_KEY, str(rounds)))
+        conn.commit()
+        return int(conn.execute("SELECT value FROM app_settings WHERE key = ?", (SETTING_KEY,)).fetchone()[0])
+    finally:
+        conn.close()
+
+
+def resolve_rounds(config) -> Optional[int]:
+    """Rounds of the policy (see the module docstring); None = passlib's default."""
+    if config.get("PASSWORD_HASH_ROUNDS"):
+        return int(config["PASSWORD_HASH_ROUNDS"])
+    rounds = saved_rounds()
+    if rounds is None and config.get("PASSWORD_CALIBRATE_ON_STARTUP", True):
+        started = time.perf_counter()
+        rounds = calibrate_rounds(float(config.get("PASSWORD_TARGET_MS", DEFAULT_TARGET_MS)),
+                                  int(config.get("PASSWORD_MIN_ROUNDS", DEFAULT_MIN_ROUNDS)),
+                                  int(config.get("PASSWORD_MAX_ROUNDS", DEFAULT_MAX_ROUNDS)))
+        # أول عملية تحفظ القيمة؛ البقية تعتمدها كي لا تختلف الجولات بين العمليات
+        rounds = save_rounds(rounds, replace=False)
+        logger.info(f"Password hashing calibrated to {rounds} rounds in {time.perf_counter() - started:.2f}s")
+    return rounds
+
+
+def init_password_policy(app) -> CryptContext:
+    with app.app_context():
+        rounds = resolve_rounds(app.config)
+    context = build_context(app.config.get("PASSWORD_SCHEMES", DEFAULT_SCHEMES), rounds)
+    app.extensions["msd_password_context"] = context
+    return context
+
+
+def password_context() -> CryptContext:
+    """The app's policy; before it is initialized, the configured schemes at the configured (or default) rounds."""
+    if has_app_context():
+        context = current_app.extensions.get("msd_password_context")
+        if context is not None:
+            return context
+        return build_context(current_app.config.get("PASSWORD_SCHEMES", DEFAULT_SCHEMES),
+                             current_app.config.get("PASSWORD_HASH_ROUNDS"))
+    return build_context()
+
+
+def hash_password(password: str) -> str:
+    """Hash a new password with the current policy."""
+    return password_context().hash(password)
+
+
+def benchmark(schemes: Iterable[str], costs: Optional[List[int]] = None, samples: int = 3) -> List[Dict]:
+    """Verify latency per scheme and cost: [{'scheme', 'rounds', 'verify_ms'}]."""
+    results = []
+    for scheme in schemes:
+        handler = get_crypt_handler(scheme)
+        scheme_costs = costs or _default_costs(handler)
+        for rounds in scheme_costs if hasattr(handler, "rounds_cost") else [None]:
+            results.append({"scheme": scheme, "rounds": rounds,
+                            "verify_ms": round(measure_verify_ms(scheme, rounds, samples), 2)})
+    return results
+
+
+def _default_costs(handler) -> Optional[List[int]]:
+    if not hasattr(handler, "rounds_cost"):
+        return None
+    if handler.rounds_cost == "log2":
+        return list(range(max(handler.min_rounds, DEFAULT_MIN_ROUNDS), min(handler.max_rounds, 14) + 1))
+    # كلفة خطية (pbkdf2، sha512_crypt): نصف الافتراضي وضعفه
+    return [handler.default_rounds // 2, handler.default_rounds, handler.default_rounds * 2]
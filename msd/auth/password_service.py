@@ -0,0 +1,230 @@
+"""
+Password verification off the request threads, with login throttling.
+
+bcrypt is deliberately slow and CPU bound. Verifications run on a small
+dedicated thread pool (bcrypt releases the GIL while hashing), so a burst
+of login attempts occupies at most AUTH_HASH_WORKERS cores; attempts beyond
+the pool plus AUTH_HASH_QUEUE_SIZE waiting are refused at once instead of
+piling up behind it. Before any hashing, every attempt takes a token from a
+per-username and a per-IP bucket.
+
+Buckets and metrics live in process memory: with several worker processes
+each one throttles on its own.
+"""
+
+import time
+import atexit
+import logging
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+from passlib.context import CryptContext
+
+from .password_policy import init_password_policy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HASH_WORKERS = 2
+DEFAULT_HASH_QUEUE_SIZE = 16
+DEFAULT_HASH_TIMEOUT_SECONDS = 10
+DEFAULT_LOGIN_USER_BURST = 5
+DEFAULT_LOGIN_USER_PER_MINUTE = 5
+DEFAULT_LOGIN_IP_BURST = 20
+DEFAULT_LOGIN_IP_PER_MINUTE = 30
+# عدد الدلاء المحفوظة لكل نوع؛ الأقدم استخداماً يُحذف (دلو جديد ممتلئ)
+MAX_TRACKED_KEYS = 10000
+LATENCY_SAMPLES = 1000
+
+
+class VerifierBusy(Exception):
+    """The verification pool and its queue are full (or the wait timed out)."""
+
+
+class TokenBucket:
+    """``capacity`` attempts at once, refilled at ``rate`` tokens per second."""
+
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def retry_after(self) -> float:
+        """Seconds until a token is available (0 if one is)."""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class LoginThrottle:
+    """Per-username and per-IP token buckets, checked together before hashing."""
+
+    def __init__(self, user_burst: float, user_per_minute: float, ip_burst: float, ip_per_minute: float):
+        self.limits = {"user": (user_burst, user_per_minute / 60.0), "ip": (ip_burst, ip_per_minute / 60.0)}
+        self._buckets = {"user": OrderedDict(), "ip": OrderedDict()}
+        self._lock = threading.Lock()
+        self.stats = {"allowed": 0, "throttled_user": 0, "throttled_ip": 0}
+
+    def _bucket(self, kind: str, key: str, now: float) -> TokenBucket:
+        buckets = self._buckets[kind]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = TokenBucket(*self.limits[kind])
+            if len(buckets) > MAX_TRACKED_KEYS:
+                buckets.popitem(last=False)
+        else:
+            buckets.move_to_end(key)
+        bucket.refill(now)
+        return bucket
+
+    def acquire(self, username: str, ip: Optional[str]) -> float:
+        """Take one token from both buckets; returns 0, or seconds to wait when refused."""
+        now = time.monotonic()
+        with self._lock:
+            buckets = {"user": self._bucket("user", (username or "").strip().casefold(), now),
+                       "ip": self._bucket("ip", ip or "-", now)}
+            waits = {kind: bucket.retry_after() for kind, bucket in buckets.items()}
+            # لا يُستهلك رمز من أي دلو إذا رُفضت المحاولة
+            refused = [kind for kind, wait in waits.items() if wait > 0]
+            if refused:
+                for kind in refused:
+                    self.stats[f"throttled_{kind}"] += 1
+                return max(waits.values())
+            for bucket in buckets.values():
+                bucket.tokens -= 1
+            self.stats["allowed"] += 1
+            return 0.0
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, tracked_users=len(self._buckets["user"]),
+                        tracked_ips=len(self._buckets["ip"]))
+
+
+class PasswordVerifier:
+    """Bounded thread pool for password hash checks, with latency and queue metrics."""
+
+    def __init__(self, app, context: CryptContext):
+        self.workers = int(app.config.get("AUTH_HASH_WORKERS", DEFAULT_HASH_WORKERS))
+        self.queue_size = int(app.config.get("AUTH_HASH_QUEUE_SIZE", DEFAULT_HASH_QUEUE_SIZE))
+        self.timeout = float(app.config.get("AUTH_HASH_TIMEOUT_SECONDS", DEFAULT_HASH_TIMEOUT_SECONDS))
+        self.context = context
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="msd-auth-hash")
+        # مقاعد التنفيذ + الانتظار؛ ما بعدها يُرفض فوراً
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._lock = threading.Lock()
+        self._hash_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._wait_ms = deque(maxlen=LATENCY_SAMPLES)
+        self.in_flight = 0
+        self.running = 0
+        self.stats = {"verified": 0, "rejected_busy": 0, "timeouts": 0, "errors": 0, "rehashed": 0,
+                      "peak_queue_depth": 0}
+
+    def verify(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check ``password`` on the pool; raises VerifierBusy when saturated.
+
+        Returns (valid, new_hash): new_hash is set when the stored hash is
+        below the current policy and should replace it.
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected_busy")
+            raise VerifierBusy("password verification queue is full")
+        with self._lock:
+            self.in_flight += 1
+            self.stats["peak_queue_depth"] = max(self.stats["peak_queue_depth"], self.in_flight - self.running)
+        submitted = time.perf_counter()
+        try:
+            future = self.executor.submit(self._run, password, password_hash, submitted)
+        except RuntimeError:
+            self._release()
+            raise VerifierBusy("password verifier is shut down")
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # يكمل العامل ويحرر مقعده بنفسه؛ الطلب لا ينتظره
+            self._count("timeouts")
+            logger.warning(f"Password verification waited more than {self.timeout}s; pool saturated")
+            raise VerifierBusy("password verification timed out")
+
+    def _run(self, password: str, password_hash: str, submitted: float) -> Tuple[bool, Optional[str]]:
+        started = time.perf_counter()
+        with self._lock:
+            self.running += 1
+            self._wait_ms.append((started - submitted) * 1000)
+        try:
+            result = self.context.verify_and_update(password, password_hash)
+            self._count("verified")
+            if result[1] is not None:
+                self._count("rehashed")
+            return result
+        except ValueError:
+            # تجزئة تالفة أو بصيغة غير معروفة = كلمة مرور خاطئة
+            self._count("errors")
+            return False, None
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._hash_ms.append((time.perf_counter() - started) * 1000)
+            self._release()
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats, workers=self.workers, queue_size=self.queue_size,
+                        running=self.running, queue_depth=self.in_flight - self.running,
+                        hash_ms=_summary(self._hash_ms), wait_ms=_summary(self._wait_ms))
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+def _summary(samples) -> Dict[str, Optional[float]]:
+    """Count, p50, p95 and max of the recent samples."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+    return {"count": len(ordered), "p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1], 2)}
+
+
+def init_password_verifier(app) -> PasswordVerifier:
+    verifier = PasswordVerifier(app, init_password_policy(app))
+    app.extensions["msd_password_verifier"] = verifier
+    app.extensions["msd_login_throttle"] = LoginThrottle(
+        float(app.config.get("LOGIN_USER_BURST", DEFAULT_LOGIN_USER_BURST)),
+        float(app.config.get("LOGIN_USER_PER_MINUTE", DEFAULT_LOGIN_USER_PER_MINUTE)),
+        float(app.config.get("LOGIN_IP_BURST", DEFAULT_LOGIN_IP_BURST)),
+        float(app.config.get("LOGIN_IP_PER_MINUTE", DEFAULT_LOGIN_IP_PER_MINUTE)))
+    atexit.register(verifier.shutdown, wait=False)
+    return verifier
+
+
+def password_verifier() -> PasswordVerifier:
+    return current_app.extensions["msd_password_verifier"]
+
+
+def login_throttle() -> LoginThrottle:
+    return current_app.extensions["msd_login_throttle"]
+
+
+def auth_stats() -> Dict:
+    """Verifier (hash latency, queue depth) and throttle counters of this process."""
+    return {"verifier": password_verifier().get_stats(), "throttle": login_throttle().get_stats()}
@@ -1,8 +1,11 @@
 """Authentication routes."""
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from flask_login import login_user, logout_user, login_required
-from passlib.hash import bcrypt
-from msd.auth.service import find_user_by_username, WebUser
+import math
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from flask_login import login_user, logout_user, login_required, current_user
+from msd.auth.service import find_user_by_username, update_password_hash, WebUser
+from msd.auth.password_service import VerifierBusy, login_throttle, password_verifier
+from msd.auth.token_service import create_api_token, list_api_tokens, revoke_api_token
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -14,11 +17,29 @@ def login():
         username = request.form.get("username", "").strip()
         password = request.form.get("password", "")
 
+        # الرفض قبل أي تجزئة: دلو لكل اسم مستخدم ولكل عنوان IP
+        wait = login_throttle().acquire(username, request.remote_addr)
+        if wait:
+            seconds = math.ceil(wait)
+            flash(f"محاولات دخول كثيرة، حاول مجدداً بعد {seconds} ثانية", "danger")
+            return render_template("login.html"), 429, {"Retry-After": str(seconds)}
+
         user_row = find_user_by_username(username)
-        if user_row and bcrypt.verify(password, user_row["password_hash"]):
+        try:
+            valid, new_hash = (password_verifier().verify(password, user_row["password_hash"])
+                               if user_row else (False, None))
+        except VerifierBusy:
+            flash("الخادم مشغول حالياً، حاول مجدداً بعد قليل", "danger")
+            return render_template("login.html"), 503, {"Retry-After": "1"}
+        if valid:
+            if new_hash:
+                # التجزئة أضعف من السياسة الحالية؛ تُستبدل بكلمة المرور الصحيحة المتاحة الآن
+                update_password_hash(user_row["id"], new_hash)
             user = WebUser(user_row["id"], user_row["username"], user_row["role"],
-                          user_row["department_id"], user_row["dept_name"])
-            login_user(user)
+                          user_row["department_id"], user_row["dept_name"], user_row["is_active"] != 0)
+            if not login_user(user):
+                flash("هذا الحساب موقوف", "danger")
+                return render_template("login.html")
             # For now, redirect to a simple success page since other routes aren't moved yet
             return f"""
             <h1>تم تسجيل الدخول بنجاح!</h1>
@@ -37,4 +58,36 @@ def login():
 def logout():
     """Logout route."""
     logout_user()
-    return redirect(url_for("auth.login"))
\ No newline at end of file
+    return redirect(url_for("auth.login"))
+
+
+@auth_bp.route("/api/tokens", methods=["GET"])
+@login_required
+def api_tokens_list():
+    """GET /api/tokens: the current user's API tokens (secrets are never returned again)"""
+    return jsonify({"success": True, "tokens": list_api_tokens(int(current_user.id))})
+
+
+@auth_bp.route("/api/tokens", methods=["POST"])
+@login_required
+def api_tokens_create():
+    """POST /api/tokens {name, role?, department_id?, expires_days?}: issue a token; the secret is shown once"""
+    if current_user.token_id is not None:
+        return jsonify({"success": False, "message": "إصدار الرموز يتطلب تسجيل الدخول بكلمة المرور"}), 403
+    data = request.get_json(silent=True) or {}
+    try:
+        token, info = create_api_token(current_user, data.get("name"), role=data.get("role"),
+                                       department_id=data.get("department_id"),
+                                       expires_days=data.get("expires_days"))
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, "token": token, "token_info": info}), 201
+
+
+@auth_bp.route("/api/tokens/<int:token_id>", methods=["DELETE"])
+@login_required
+def api_tokens_revoke(token_id):
+    """DELETE /api/tokens/<id>: revoke one of the user's tokens (managers: any token)"""
+    if not revoke_api_token(token_id, current_user):
+        return jsonify({"success": False, "message": "الرمز غير موجود أو ملغى مسبقاً"}), 404
+    return jsonify({"success": True, "message": "تم إلغاء الرمز"})
@@ -1,19 +1,91 @@
 """Authentication service and user models."""
+import time
+import threading
+from collections import OrderedDict
+
+from flask import current_app
 from flask_login import UserMixin
-from passlib.hash import bcrypt
 from msd.database.connection import get_conn
+from msd.database.result_cache import table_versions
+
+DEFAULT_USER_CACHE_SIZE = 1024
+DEFAULT_USER_CACHE_TTL_SECONDS = 300
+
+# الجداول التي يُبنى منها WebUser؛ تغيّر أيٍّ منها يُسقط النسخ المخزنة
+USER_TABLES = ("web_users", "departments")
+
+_MISS = object()
 
 
 class WebUser(UserMixin):
     """User model for Flask-Login."""
+
+    # رقم رمز API عند الدخول بـ Authorization: Bearer (None لجلسة عادية)
+    token_id = None
     
-    def __init__(self, id, username, role, dept_id=None, dept_name=None):
+    def __init__(self, id, username, role, dept_id=None, dept_name=None, active=True):
         # id as str for Flask-Login compatibility
         self.id = str(id)
         self.username = username
         self.role = role
         self.dept_id = dept_id
         self.dept_name = dept_name
+        self.active = bool(active)
+
+    @property
+    def is_active(self):
+        return self.active
+
+
+class UserCache:
+    """
+    Bounded LRU of loaded users with a TTL.
+
+    Each entry remembers the versions of USER_TABLES it was read at and is
+    dropped when they move on, so role, department and is_active changes
+    apply from the next request. Unknown and inactive ids are cached as None.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()  # user_id -> (expires_at, versions, user)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0, "evictions": 0}
+
+    def lookup(self, user_id, versions):
+        """The cached user (possibly None) or _MISS."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                expires_at, cached_versions, user = entry
+                if expires_at > time.monotonic() and cached_versions == versions:
+                    self._entries.move_to_end(user_id)
+                    self.stats["hits"] += 1
+                    return user
+                del self._entries[user_id]
+                self.stats["expired" if cached_versions == versions else "invalidated"] += 1
+            self.stats["misses"] += 1
+            return _MISS
+
+    def store(self, user_id, versions, user, ttl, size):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + ttl, versions, user)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self._entries),
+                        hit_ratio=round(self.stats["hits"] / lookups, 3) if lookups else None)
+
+
+user_cache = UserCache()
 
 
 def find_user_by_username(username):
@@ -21,7 +93,8 @@ def find_user_by_username(username):
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("""
-        SELECT wu.id, wu.username, wu.role, wu.password_hash, wu.department_id, d.name as dept_name
+        SELECT wu.id, wu.username, wu.role, wu.password_hash, wu.department_id, d.name as dept_name,
+               wu.is_active
         FROM web_users wu 
         LEFT JOIN departments d ON wu.department_id = d.id 
         WHERE wu.username = ?
@@ -31,19 +104,54 @@ def find_user_by_username(username):
     return result
 
 
-def load_user_by_id(user_id):
-    """Load user by ID for Flask-Login."""
+def update_password_hash(user_id, password_hash):
+    """Replace a user's stored hash (rehash on login)."""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("UPDATE web_users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
+    conn.commit()
+    conn.close()
+
+
+def _fetch_user(user_id):
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("""
-        SELECT wu.id, wu.username, wu.role, wu.department_id, d.name as dept_name
+        SELECT wu.id, wu.username, wu.role, wu.department_id, d.name as dept_name, wu.is_active
         FROM web_users wu 
         LEFT JOIN departments d ON wu.department_id = d.id 
         WHERE wu.id = ?
     """, (user_id,))
     result = cur.fetchone()
     conn.close()
-    if not result:
+    # المستخدم الموقوف يُعامل كغير موجود فتنتهي جلسته
+    if not result or result["is_active"] == 0:
         return None
     return WebUser(result["id"], result["username"], result["role"], 
-                  result["department_id"], result["dept_name"])
\ No newline at end of file
+                  result["department_id"], result["dept_name"])
+
+
+def load_user_by_id(user_id):
+    """
+    Load user by ID for Flask-Login (runs once per authenticated request).
+
+    Served from user_cache while the entry is younger than
+    USER_CACHE_TTL_SECONDS and web_users/departments are unchanged.
+    """
+    size = int(current_app.config.get("USER_CACHE_SIZE", DEFAULT_USER_CACHE_SIZE))
+    versions = table_versions(*USER_TABLES) if size > 0 else None
+    if versions is None:
+        return _fetch_user(user_id)
+
+    key = str(user_id)
+    user = user_cache.lookup(key, versions)
+    if user is _MISS:
+        user = _fetch_user(user_id)
+        ttl = float(current_app.config.get("USER_CACHE_TTL_SECONDS", DEFAULT_USER_CACHE_TTL_SECONDS))
+        user_cache.store(key, versions, user, ttl, size)
+    return user
+
+
+def user_cache_stats():
+    """Hit/miss counters of the user-loader cache; one lookup per authenticated request."""
+    return user_cache.get_stats()
@@ -0,0 +1,276 @@
+"""
+API tokens for machine clients (Telegram bot, scripts).
+
+A token is a random secret shown once at creation; only its HMAC-SHA256
+(keyed with API_TOKEN_SECRET, else SECRET_KEY) is stored, so checking a
+request is one keyed hash and an indexed lookup - no bcrypt, no session.
+Tokens act as their owner with a role and department no wider than the
+owner's, can expire and be revoked, and resolved tokens are kept in a
+UserCache validated against the api_tokens/web_users/departments versions.
+
+last_used_at is collected in memory and written in batches every
+API_TOKEN_TOUCH_SECONDS (and at exit), not on every request.
+"""
+
+import hmac
+import time
+import atexit
+import secrets
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from msd.database.connection import get_conn
+from msd.database.result_cache import table_versions
+from .service import WebUser, UserCache, _MISS, DEFAULT_USER_CACHE_SIZE, DEFAULT_USER_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PREFIX = "msd_"
+DEFAULT_TOUCH_SECONDS = 60
+ROLE_RANK = {"employee": 0, "dept_head": 1, "manager": 2}
+# ما يؤثر في صلاحية الرمز؛ last_used_at لا يغيّر عداد api_tokens (الترحيل 17)
+TOKEN_TABLES = ("api_tokens", "web_users", "departments")
+_TIMESTAMP = "%Y-%m-%d %H:%M:%S"
+
+
+def _utcnow() -> str:
+    # بصيغة CURRENT_TIMESTAMP في SQLite (UTC)
+    return datetime.utcnow().strftime(_TIMESTAMP)
+
+
+def hash_token(token: str) -> str:
+    secret = current_app.config.get("API_TOKEN_SECRET") or current_app.config["SECRET_KEY"]
+    return hmac.new(secret.encode("utf-8"), token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def create_api_token(owner: WebUser, name: str, role: Optional[str] = None, department_id: Optional[int] = None,
+                     expires_days: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Issue a token acting as ``owner``; returns (secret, token row).
+
+    The role defaults to the owner's and may only be narrower; non-managers
+    are limited to their own department. Manager-role tokens cannot carry a
+    department (manager routes do not filter by one). ValueError on invalid input.
+    """
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("اسم الرمز مطلوب")
+    role = role or owner.role
+    if role not in ROLE_RANK or ROLE_RANK[role] > ROLE_RANK.get(owner.role, -1):
+        raise ValueError(f"لا يمكن إصدار رمز بالدور: {role}")
+    if owner.role != "manager":
+        if department_id not in (None, owner.dept_id):
+            raise ValueError("لا يمكن إصدار رمز لقسم آخر")
+        department_id = owner.dept_id
+    if role == "manager" and department_id is not None:
+        raise ValueError("رمز المدير لا يُقيَّد بقسم؛ استخدم دور رئيس القسم لرمز خاص بقسم")
+    if role == "dept_head" and department_id is None:
+        raise ValueError("رمز رئيس القسم يحتاج إلى قسم")
+    expires_at = None
+    if expires_days:
+        expires_at = (datetime.utcnow() + timedelta(days=int(expires_days))).strftime(_TIMESTAMP)
+
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO api_tokens (user_id, name, token_hash, token_prefix, role, department_id, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (int(owner.id), name, hash_token(token), token[:len(TOKEN_PREFIX) + 6], role, department_id,
+              expires_at))
+        conn.commit()
+        token_id = cur.lastrowid
+    finally:
+        conn.close()
+    logger.info(f"API token {token_id} ({name}) issued for user {owner.id} as {role}")
+    return token, get_api_token(token_id)
+
+
+def get_api_token(token_id: int) -> Optional[Dict]:
+    conn = get_conn()
+    try:
+        row = conn.execute("""
+            SELECT id, user_id, name, token_prefix, role, department_id, created_at, expires_at,
+                   last_used_at, revoked_at
+            FROM api_tokens WHERE id = ?
+        """, (token_id,)).fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def list_api_tokens(user_id: int) -> List[Dict]:
+    """A user's tokens, newest first (without the hashes)."""
+    conn = get_conn()
+    try:
+        rows = conn.execute("""
+            SELECT id, name, token_prefix, role, department_id, created_at, expires_at, last_used_at, revoked_at
+            FROM api_tokens WHERE user_id = ? ORDER BY id DESC
+        """, (user_id,)).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def revoke_api_token(token_id: int, actor: WebUser) -> bool:
+    """Revoke a token of ``actor`` (managers: any token); False if not found or already revoked."""
+    query = "UPDATE api_tokens SET revoked_at = CURRENT_TIMESTAMP WHERE id = ? AND revoked_at IS NULL"
+    params = [token_id]
+    if actor.role != "manager":
+        query += " AND user_id = ?"
+        params.append(int(actor.id))
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, params)
+        conn.commit()
+        revoked = cur.rowcount > 0
+    finally:
+        conn.close()
+    if revoked:
+        logger.info(f"API token {token_id} revoked by user {actor.id}")
+    return revoked
+
+
+def _fetch_token_user(token_hash: str) -> Tuple[Optional[WebUser], Optional[str]]:
+    conn = get_conn()
+    try:
+        row = conn.execute("""
+            SELECT t.id, t.role, t.department_id, t.expires_at, wu.id AS user_id, wu.username,
+                   wu.role AS user_role, wu.department_id AS user_department_id, d.name AS dept_name
+            FROM api_tokens t
+            JOIN web_users wu ON wu.id = t.user_id
+            LEFT JOIN departments d ON d.id = t.department_id
+            WHERE t.token_hash = ? AND t.revoked_at IS NULL
+              AND (t.expires_at IS NULL OR t.expires_at > CURRENT_TIMESTAMP)
+              AND COALESCE(wu.is_active, 1) != 0
+        """, (token_hash,)).fetchone()
+    finally:
+        conn.close()
+    if not row:
+        return None, None
+    # إذا خُفّض دور المالك أو نُقل من قسمه بعد الإصدار لا يبقى للرمز أكثر مما يملكه
+    if ROLE_RANK[row["role"]] > ROLE_RANK.get(row["user_role"], -1):
+        return None, None
+    if row["user_role"] != "manager" and row["department_id"] != row["user_department_id"]:
+        return None, None
+    # رمز مدير بقسم (صدر قبل منعه) يبدو مقيداً لكنه يقرأ كل الأقسام؛ يُرفض
+    if row["role"] == "manager" and row["department_id"] is not None:
+        return None, None
+    user = WebUser(row["user_id"], row["username"], row["role"], row["department_id"], row["dept_name"])
+    user.token_id = row["id"]
+    return user, row["expires_at"]
+
+
+class TokenUsage:
+    """last_used_at per token, held in memory and written in one batch per interval."""
+
+    def __init__(self):
+        self._pending: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flushing = False
+        self.stats = {"touches": 0, "flushes": 0, "rows_written": 0, "flush_errors": 0}
+
+    def touch(self, token_id: int, interval: float):
+        with self._lock:
+            self._pending[token_id] = _utcnow()
+            self.stats["touches"] += 1
+            due = not self._flushing and time.monotonic() - self._last_flush >= interval
+            if due:
+                self._flushing = True
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write the pending timestamps; returns the number of tokens updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        try:
+            if not pending:
+                return 0
+            conn = get_conn()
+            try:
+                conn.executemany("""
+                    UPDATE api_tokens SET last_used_at = ?
+                    WHERE id = ? AND (last_used_at IS NULL OR last_used_at < ?)
+                """, [(used, token_id, used) for token_id, used in pending.items()])
+                conn.commit()
+            finally:
+                conn.close()
+            with self._lock:
+                self.stats["flushes"] += 1
+                self.stats["rows_written"] += len(pending)
+            return len(pending)
+        except sqlite3.Error as e:
+            # تُعاد للدفعة التالية دون الكتابة فوق استخدام أحدث
+            with self._lock:
+                for token_id, used in pending.items():
+                    self._pending.setdefault(token_id, used)
+                self.stats["flush_errors"] += 1
+            logger.warning(f"Could not record API token usage: {e}")
+            return 0
+        finally:
+            with self._lock:
+                self._flushing = False
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending))
+
+
+token_cache = UserCache()
+token_usage = TokenUsage()
+
+
+def load_user_from_token(token: str) -> Optional[WebUser]:
+    """The user a bearer token acts as, or None (unknown, revoked, expired or owner deactivated)."""
+    if not token or not token.startswith(TOKEN_PREFIX):
+        return None
+    token_hash = hash_token(token)
+    config = current_app.config
+    size = int(config.get("USER_CACHE_SIZE", DEFAULT_USER_CACHE_SIZE))
+    versions = table_versions(*TOKEN_TABLES) if size > 0 else None
+
+    user = token_cache.lookup(token_hash, versions) if versions is not None else _MISS
+    if user is _MISS:
+        user, expires_at = _fetch_token_user(token_hash)
+        if versions is not None:
+            ttl = float(config.get("USER_CACHE_TTL_SECONDS", DEFAULT_USER_CACHE_TTL_SECONDS))
+            if expires_at:
+                # لا يبقى الرمز في التخزين بعد انتهاء صلاحيته
+                remaining = (datetime.strptime(expires_at, _TIMESTAMP) - datetime.utcnow()).total_seconds()
+                ttl = max(0.0, min(ttl, remaining))
+            token_cache.store(token_hash, versions, user, ttl, size)
+    if user is not None:
+        token_usage.touch(user.token_id, float(config.get("API_TOKEN_TOUCH_SECONDS", DEFAULT_TOUCH_SECONDS)))
+    return user
+
+
+def load_user_from_request(request) -> Optional[WebUser]:
+    """Flask-Login request_loader: ``Authorization: Bearer <token>``."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    return load_user_from_token(token.strip())
+
+
+def api_token_stats() -> Dict:
+    return {"cache": token_cache.get_stats(), "usage": token_usage.get_stats()}
+
+
+def init_api_tokens(app, login_manager):
+    login_manager.request_loader(load_user_from_request)
+
+    def flush_at_exit():
+        with app.app_context():
+            token_usage.flush()
+    atexit.register(flush_at_exit)
@@ -0,0 +1,2 @@
+# msd/dashboard/__init__.py
+"""Dashboard statistics for MSD Employee Management System"""
@@ -0,0 +1,73 @@
+# msd/dashboard/service.py
+"""
+Dashboard numbers from the trigger-maintained ``stats_counters`` table.
+
+One query over primary-key ranges returns every counter a dashboard needs (employees
+per department, pending requests per department and state, today's
+absences per department) instead of COUNT(*) queries over the base tables.
+"""
+
+from datetime import date
+from typing import Any, Dict, Optional
+
+from ..database.connection import get_conn
+from ..database.result_cache import cached_query
+
+PENDING_STATES = ('pending_dept', 'pending_manager')
+
+# كل فرع بادئة للمفتاح الأساسي (name, key, department_id)
+COUNTERS_QUERY = """
+    SELECT name, department_id, key, value FROM stats_counters
+    WHERE ((name = 'employees' AND key = '') OR name = 'pending'
+           OR (name = 'absences' AND key = ?))
+"""
+
+
+def _empty_department() -> Dict[str, int]:
+    return {'employees': 0, 'pending_dept': 0, 'pending_manager': 0, 'today_absences': 0}
+
+
+def dashboard_stats(department_id: Optional[int] = None, day: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Totals and per-department counters for ``day`` (default today).
+
+    Returns {'total_employees', 'pending_vacations', 'pending': {state: n},
+    'today_absences', 'departments': {department_id: {...}}}; with
+    ``department_id`` the totals cover that department only. The result
+    is shared through the result cache and must not be modified.
+    """
+    # اليوم جزء من مفتاح التخزين، فلا تُعاد أرقام الأمس بعد منتصف الليل
+    return _dashboard_stats(department_id, (day or date.today()).isoformat())
+
+
+@cached_query("employees", "vacations", "absences")
+def _dashboard_stats(department_id: Optional[int], day: str) -> Dict[str, Any]:
+    query, params = COUNTERS_QUERY, [day]
+    if department_id is not None:
+        query += " AND department_id = ?"
+        params.append(department_id)
+
+    conn = get_conn()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+    departments: Dict[int, Dict[str, int]] = {}
+    for name, dept, key, value in rows:
+        counters = departments.setdefault(dept, _empty_department())
+        if name == 'employees':
+            counters['employees'] += value
+        elif name == 'pending':
+            counters[key] += value
+        else:
+            counters['today_absences'] += value
+
+    pending = {state: sum(c[state] for c in departments.values()) for state in PENDING_STATES}
+    return {
+        'total_employees': sum(c['employees'] for c in departments.values()),
+        'pending_vacations': sum(pending.values()),
+        'pending': pending,
+        'today_absences': sum(c['today_absences'] for c in departments.values()),
+        'departments': departments,
+    }
@@ -1,2 +1,3 @@
-from .connection import get_conn
-"""Database package for MSD Employee Management System"""
\ No newline at end of file
+from .connection import get_conn, get_pool, pool_stats, close_pools
+from .result_cache import cached_query, result_cache_stats, table_versions
+"""Database package for MSD Employee Management System"""
@@ -3,10 +3,17 @@ Database connection and utilities for MSD Employee Management System
 """
 
 import os
+import atexit
 import sqlite3
-from contextlib import contextmanager
+import threading
 from flask import current_app
 
+from .storage import resolve_storage_profile, apply_storage_profile
+
+# الحد الافتراضي لعدد الاتصالات المحفوظة (اتصال واحد لكل خيط)
+DEFAULT_POOL_SIZE = 16
+
+
 def _ensure_parent_dir(path: str):
     try:
         parent = os.path.dirname(path)
@@ -19,18 +26,237 @@ def get_db_path() -> str:
     # DB_PATH مهيّأ في config.py
     return current_app.config.get("DB_PATH", os.path.join(current_app.root_path, "employees.db"))
 
-def _connect() -> sqlite3.Connection:
-    db_path = get_db_path()
+def _connect(db_path: str = None, pragmas: dict = None) -> sqlite3.Connection:
+    db_path = db_path or get_db_path()
     _ensure_parent_dir(db_path)
-    conn = sqlite3.connect(db_path)
+    # الاتصال مرتبط بخيط واحد عبر المجمّع، لكن الإغلاق عند الإيقاف قد يتم من خيط آخر
+    conn = sqlite3.connect(db_path, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON")
+    if pragmas:
+        apply_storage_profile(conn, pragmas)
     return conn
 
-@contextmanager
-def get_conn():
-    conn = _connect()
-    try:
-        yield conn
-    finally:
-        conn.close()
\ No newline at end of file
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled sqlite3 connection.
+
+    Behaves like the connection it wraps; ``close()`` (or leaving a ``with``
+    block) hands the connection back to the pool instead of closing it.
+    """
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection, owner=None):
+        self._pool = pool
+        self._conn = conn
+        # حالة الخيط المالك للاتصال المحفوظ (None للاتصالات المؤقتة)
+        self._owner = owner
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get("_conn")
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(conn, name)
+
+    @property
+    def raw(self) -> sqlite3.Connection:
+        """The wrapped sqlite3 connection (the same object for every checkout of it)."""
+        conn = self._conn
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return conn
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, self._owner)
+
+    def __del__(self):
+        # استدعاء نُسي فيه close(): نعيد الاتصال للمجمّع بدل تسريبه
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class ConnectionPool:
+    """
+    Bounded pool of thread-affine SQLite connections for one database file.
+
+    Each thread reuses its own connection between calls. At most ``max_size``
+    connections are kept open; nested or overflow checkouts get a short-lived
+    connection that is closed on release.
+    """
+
+    def __init__(self, db_path: str, max_size: int = DEFAULT_POOL_SIZE, pragmas: dict = None):
+        self.db_path = db_path
+        self.max_size = max_size
+        # ملف التخزين (WAL وغيره) يُطبق مرة واحدة عند فتح كل اتصال
+        self.pragmas = pragmas or {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # thread ident -> (thread, connection) للاتصالات المحفوظة
+        self._cached = {}
+        self._closed = False
+        self.stats = {"created": 0, "reused": 0, "overflow": 0, "discarded": 0}
+
+    def _new_connection(self) -> sqlite3.Connection:
+        conn = _connect(self.db_path, self.pragmas)
+        with self._lock:
+            self.stats["created"] += 1
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn: sqlite3.Connection):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self.stats["discarded"] += 1
+
+    def _prune_dead_threads(self):
+        """Close connections owned by threads that no longer exist (lock held)."""
+        for ident, (thread, conn) in list(self._cached.items()):
+            if not thread.is_alive():
+                del self._cached[ident]
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+                self.stats["discarded"] += 1
+
+    def acquire(self) -> PooledConnection:
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None and not getattr(local, "in_use", False):
+            if self._is_healthy(conn):
+                local.in_use = True
+                with self._lock:
+                    self.stats["reused"] += 1
+                return PooledConnection(self, conn, owner=local)
+            # اتصال تالف: نستبدله باتصال جديد
+            with self._lock:
+                self._cached.pop(threading.get_ident(), None)
+            local.conn = None
+            self._discard(conn)
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                self._prune_dead_threads()
+                has_room = len(self._cached) < self.max_size
+            if has_room:
+                conn = self._new_connection()
+                with self._lock:
+                    self._cached[threading.get_ident()] = (threading.current_thread(), conn)
+                local.conn = conn
+                local.in_use = True
+                return PooledConnection(self, conn, owner=local)
+
+        # استدعاء متداخل في نفس الخيط أو المجمّع ممتلئ
+        conn = self._new_connection()
+        with self._lock:
+            self.stats["overflow"] += 1
+        return PooledConnection(self, conn)
+
+    def release(self, conn: sqlite3.Connection, owner=None):
+        if owner is None or self._closed:
+            conn.close()
+            return
+        try:
+            # نفس سلوك close(): التغييرات غير المؤكدة لا تنتقل للاستخدام التالي
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            with self._lock:
+                for ident, (_thread, cached) in list(self._cached.items()):
+                    if cached is conn:
+                        del self._cached[ident]
+            owner.conn = None
+            self._discard(conn)
+        owner.in_use = False
+
+    def close(self):
+        """Close every cached connection; used on application shutdown."""
+        with self._lock:
+            self._closed = True
+            cached, self._cached = self._cached, {}
+        for _thread, conn in cached.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, open=len(self._cached), max_size=self.max_size)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str = None) -> ConnectionPool:
+    """Return the pool for the configured database, creating it on first use."""
+    db_path = db_path or get_db_path()
+    pool = _pools.get(db_path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(db_path)
+            if pool is None:
+                try:
+                    config = current_app.config
+                except RuntimeError:
+                    config = {}
+                max_size = int(config.get("DB_POOL_SIZE", DEFAULT_POOL_SIZE))
+                pool = ConnectionPool(db_path, max_size=max_size,
+                                      pragmas=resolve_storage_profile(config))
+                _pools[db_path] = pool
+    return pool
+
+
+def get_conn() -> PooledConnection:
+    """
+    Get a pooled connection to the configured database.
+
+    Usable either as ``conn = get_conn(); ...; conn.close()`` or as
+    ``with get_conn() as conn:``; both return the connection to the pool.
+    """
+    return get_pool().acquire()
+
+
+def pool_stats() -> dict:
+    """Reuse/creation counters for every open pool, keyed by database path."""
+    with _pools_lock:
+        pools = list(_pools.items())
+    return {path: pool.get_stats() for path, pool in pools}
+
+
+def close_pools():
+    """Close all pools (registered with atexit, safe to call repeatedly)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(close_pools)
@@ -0,0 +1,710 @@
+"""
+Versioned schema migrations.
+
+Every schema change is a numbered step in MIGRATIONS. The applied version is
+recorded in the ``schema_version`` table, so startup only has to read one
+integer when the database is already current. Old databases are upgraded one
+step at a time, each step in its own transaction.
+"""
+
+import time
+import logging
+import sqlite3
+from typing import Callable, List, NamedTuple, Optional
+
+from msd.database.connection import get_conn
+from msd.database.schema_init import create_base_schema, _seed_default_data
+from msd.utils.arabic import arabic_fold_sql
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """Register a migration step; versions must be added in increasing order."""
+    def decorator(fn):
+        if MIGRATIONS and version != MIGRATIONS[-1].version + 1:
+            raise ValueError(f"Migration {version} is out of sequence")
+        MIGRATIONS.append(Migration(version, name, fn))
+        return fn
+    return decorator
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_schema_version(conn) -> int:
+    """Return the applied schema version, 0 for a database without the table."""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def upgrade(conn, target: Optional[int] = None) -> List[int]:
+    """
+    Apply pending migrations up to ``target`` (default: latest).
+
+    Each step runs inside BEGIN IMMEDIATE, so concurrent workers serialize and
+    a step already applied by another process is skipped. Returns the list of
+    versions applied by this call.
+    """
+    target = latest_version() if target is None else target
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+    conn.commit()
+
+    applied = []
+    for step in MIGRATIONS:
+        if step.version > target:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= step.version:
+                conn.rollback()
+                continue
+            started = time.perf_counter()
+            step.apply(conn.cursor())
+            conn.execute(
+                "INSERT INTO schema_version (version, name, duration_ms) VALUES (?, ?, ?)",
+                (step.version, step.name, int((time.perf_counter() - started) * 1000))
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {step.version} ({step.name}) failed")
+            raise
+        applied.append(step.version)
+        logger.info(f"Applied migration {step.version}: {step.name}")
+    return applied
+
+
+def ensure_schema() -> List[int]:
+    """Startup entry point: one integer comparison when the schema is current."""
+    conn = get_conn()
+    try:
+        if get_schema_version(conn) >= latest_version():
+            return []
+        applied = upgrade(conn)
+        logger.info("تم تهيئة قاعدة البيانات بنجاح")
+        return applied
+    finally:
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Migration steps
+# ---------------------------------------------------------------------------
+
+@migration(1, "base schema and default data")
+def _m001_base_schema(cur):
+    create_base_schema(cur)
+    _seed_default_data(cur)
+
+
+@migration(2, "legacy v1 data to v2 layout")
+def _m002_legacy_data(cur):
+    """Formerly scripts/migrate_to_v2.py:migrate_legacy_data()."""
+    cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    tables = [row[0] for row in cur.fetchall()]
+
+    # Initialize employees.initial_vacation_balance if NULL
+    if 'employees' in tables:
+        cur.execute("""
+            UPDATE employees
+            SET initial_vacation_balance = vacation_balance
+            WHERE initial_vacation_balance IS NULL
+        """)
+        if cur.rowcount > 0:
+            logger.info(f"Initialized initial_vacation_balance for {cur.rowcount} employees")
+
+        # Migrate departments if we have legacy text department column
+        cur.execute("PRAGMA table_info(employees)")
+        columns = {row[1]: row[2] for row in cur.fetchall()}
+
+        if 'department' in columns and columns['department'].upper() == 'TEXT':
+            logger.info("Found legacy text department column, migrating...")
+            cur.execute("SELECT DISTINCT department FROM employees WHERE department IS NOT NULL AND department != ''")
+            legacy_departments = [row[0] for row in cur.fetchall()]
+
+            for dept_name in legacy_departments:
+                cur.execute("INSERT OR IGNORE INTO departments (name) VALUES (?)", (dept_name,))
+                cur.execute("SELECT id FROM departments WHERE name = ?", (dept_name,))
+                dept_id = cur.fetchone()[0]
+                cur.execute("""
+                    UPDATE employees
+                    SET department_id = ?
+                    WHERE department = ? AND (department_id IS NULL OR department_id = 0)
+                """, (dept_id, dept_name))
+
+            logger.info(f"Migrated {len(legacy_departments)} departments")
+
+    if 'vacations' in tables:
+        cur.execute("PRAGMA table_info(vacations)")
+        columns = [row[1] for row in cur.fetchall()]
+
+        # Migrate vacation workflow states if we have legacy columns
+        if 'status' in columns and 'dept_approval' in columns:
+            logger.info("Found legacy vacation approval columns, migrating workflow states...")
+            cur.execute("""
+                UPDATE vacations
+                SET workflow_state = 'pending_dept'
+                WHERE dept_approval = 'تحت الإجراء' OR dept_approval = 'pending'
+            """)
+            cur.execute("""
+                UPDATE vacations
+                SET workflow_state = 'pending_manager'
+                WHERE dept_approval = 'موافق' AND (status = 'تحت الإجراء' OR status = 'pending')
+            """)
+            cur.execute("""
+                UPDATE vacations
+                SET workflow_state = 'approved'
+                WHERE status IN ('موافق', 'approved')
+            """)
+            cur.execute("""
+                UPDATE vacations
+                SET workflow_state = 'rejected'
+                WHERE status IN ('مرفوض', 'rejected') OR dept_approval = 'مرفوض'
+            """)
+            logger.info("Migrated vacation workflow states")
+
+        # Map vacation types if we have legacy type text and type_code column exists
+        if 'type' in columns and 'type_code' in columns:
+            type_mappings = {
+                'سنوية': 'annual',
+                'طارئة': 'emergency',
+                'وضع': 'maternity_single',
+                'زواج': 'marriage',
+                'حج': 'hajj',
+                'وفاة': 'bereavement_d1',
+                'مرضية': 'sick'
+            }
+            for arabic_type, code in type_mappings.items():
+                cur.execute("""
+                    UPDATE vacations
+                    SET type_code = ?
+                    WHERE type = ? AND (type_code IS NULL OR type_code = '')
+                """, (code, arabic_type))
+
+
+@migration(3, "scheduler job leases and status")
+def _m003_scheduler_jobs(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS scheduler_jobs (
+        name TEXT PRIMARY KEY,
+        lease_owner TEXT,
+        lease_expires_at REAL,
+        next_run_at REAL,
+        last_status TEXT,
+        last_started_at TEXT,
+        last_finished_at TEXT,
+        last_duration_ms INTEGER,
+        last_result TEXT,
+        last_error TEXT,
+        run_count INTEGER DEFAULT 0
+    )
+    """)
+
+
+@migration(4, "accrual run summary columns")
+def _m004_accrual_summary(cur):
+    cur.execute("PRAGMA table_info(accrual_log)")
+    columns = [row[1] for row in cur.fetchall()]
+    for name, ddl in [
+        ("as_of_date", "TEXT"),
+        ("processed_count", "INTEGER"),
+        ("skipped_count", "INTEGER"),
+        ("total_days", "REAL"),
+        ("duration_ms", "INTEGER"),
+    ]:
+        if name not in columns:
+            cur.execute(f"ALTER TABLE accrual_log ADD COLUMN {name} {ddl}")
+
+
+@migration(5, "append-only vacation balance ledger with monthly snapshots")
+def _m005_balance_ledger(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS balance_ledger (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        balance_type TEXT NOT NULL CHECK(balance_type IN ('annual','emergency')),
+        entry_type TEXT NOT NULL CHECK(entry_type IN
+            ('opening','accrual','deduction','reset','adjustment')),
+        delta REAL NOT NULL,
+        reference TEXT,
+        user_id INTEGER,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees(id)
+    )
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS balance_snapshots (
+        employee_id INTEGER NOT NULL,
+        balance_type TEXT NOT NULL,
+        period TEXT NOT NULL,
+        balance REAL NOT NULL,
+        last_entry_id INTEGER NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (employee_id, balance_type, period)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_balance_ledger_employee ON balance_ledger(employee_id, balance_type, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_balance_snapshots_period ON balance_snapshots(period)")
+
+    # السجل للإضافة فقط
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_balance_ledger_no_update
+    BEFORE UPDATE ON balance_ledger
+    BEGIN
+        SELECT RAISE(ABORT, 'balance_ledger is append-only');
+    END
+    """)
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_balance_ledger_no_delete
+    BEFORE DELETE ON balance_ledger
+    BEGIN
+        SELECT RAISE(ABORT, 'balance_ledger is append-only');
+    END
+    """)
+
+    # رصيد افتتاحي لكل موظف جديد، أياً كان مسار الإضافة
+    cur.execute("""
+    CREATE TRIGGER IF NOT EXISTS trg_employees_opening_balance
+    AFTER INSERT ON employees
+    BEGIN
+        INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference)
+        VALUES (NEW.id, 'annual', 'opening', COALESCE(NEW.vacation_balance, 0), 'employee:new'),
+               (NEW.id, 'emergency', 'opening', COALESCE(NEW.emergency_vacation_balance, 0), 'employee:new');
+    END
+    """)
+
+    # الأرصدة الحالية للموظفين الموجودين تصبح القيد الافتتاحي
+    cur.execute("""
+        INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference)
+        SELECT id, 'annual', 'opening', COALESCE(vacation_balance, 0), 'migration' FROM employees
+    """)
+    cur.execute("""
+        INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference)
+        SELECT id, 'emergency', 'opening', COALESCE(emergency_vacation_balance, 0), 'migration' FROM employees
+    """)
+
+
+@migration(6, "background import jobs")
+def _m006_import_jobs(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS import_jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL DEFAULT 'employees',
+        state TEXT NOT NULL DEFAULT 'queued'
+            CHECK(state IN ('queued','running','succeeded','failed')),
+        dry_run INTEGER NOT NULL DEFAULT 0,
+        create_departments INTEGER NOT NULL DEFAULT 1,
+        filename TEXT,
+        source_job_id TEXT,
+        committed_by_job_id TEXT,
+        total_rows INTEGER,
+        processed_rows INTEGER DEFAULT 0,
+        inserted INTEGER DEFAULT 0,
+        updated INTEGER DEFAULT 0,
+        error_count INTEGER DEFAULT 0,
+        errors TEXT,
+        message TEXT,
+        worker TEXT,
+        created_by INTEGER,
+        created_at TEXT,
+        started_at TEXT,
+        finished_at TEXT
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_import_jobs_state ON import_jobs(state, finished_at)")
+
+
+@migration(7, "import row fingerprints and diff counters")
+def _m007_import_row_hash(cur):
+    cur.execute("PRAGMA table_info(employees)")
+    if "row_hash" not in [row[1] for row in cur.fetchall()]:
+        # بصمة آخر صف مستورد لكل موظف (NULL = لم يُستورد بعد)
+        cur.execute("ALTER TABLE employees ADD COLUMN row_hash TEXT")
+
+    cur.execute("PRAGMA table_info(import_jobs)")
+    columns = [row[1] for row in cur.fetchall()]
+    for name, ddl in [
+        ("diff", "INTEGER NOT NULL DEFAULT 0"),
+        ("unchanged", "INTEGER"),
+        ("missing", "INTEGER"),
+    ]:
+        if name not in columns:
+            cur.execute(f"ALTER TABLE import_jobs ADD COLUMN {name} {ddl}")
+
+
+@migration(8, "report date-range indexes")
+def _m008_report_date_indexes(cur):
+    # فلاتر التقارير نطاقات على العمود نفسه (date >= ? AND date < ?)، انظر report_filters
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_absences_date ON absences(date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_absences_type_date ON absences(type, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vacations_start_date ON vacations(start_date)")
+
+
+@migration(9, "department_id copied onto vacations and absences")
+def _m009_scoped_department_id(cur):
+    for table in ("vacations", "absences"):
+        cur.execute(f"PRAGMA table_info({table})")
+        if "department_id" not in [row[1] for row in cur.fetchall()]:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN department_id INTEGER REFERENCES departments(id)")
+        cur.execute(f"""
+            UPDATE {table}
+            SET department_id = (SELECT department_id FROM employees WHERE id = {table}.employee_id)
+        """)
+
+        # نسخة من قسم الموظف تُحدَّث بالمشغلات؛ الاستعلامات المقيدة بالقسم لا تحتاج ربطاً بالموظفين
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_department_insert
+            AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table}
+                SET department_id = (SELECT department_id FROM employees WHERE id = NEW.employee_id)
+                WHERE id = NEW.id;
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_department_employee
+            AFTER UPDATE OF employee_id ON {table}
+            WHEN OLD.employee_id IS NOT NEW.employee_id
+            BEGIN
+                UPDATE {table}
+                SET department_id = (SELECT department_id FROM employees WHERE id = NEW.employee_id)
+                WHERE id = NEW.id;
+            END
+        """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_employees_department_move
+        AFTER UPDATE OF department_id ON employees
+        WHEN OLD.department_id IS NOT NEW.department_id
+        BEGIN
+            UPDATE vacations SET department_id = NEW.department_id WHERE employee_id = NEW.id;
+            UPDATE absences SET department_id = NEW.department_id WHERE employee_id = NEW.id;
+        END
+    """)
+
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vacations_department_state
+        ON vacations(department_id, workflow_state, created_at)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_absences_department_date ON absences(department_id, date)")
+
+
+@migration(10, "pending approval queue and partial indexes")
+def _m010_approval_queue(cur):
+    # معظم الإجازات في حالة نهائية؛ الفهارس الجزئية تغطي المعلّقة فقط
+    # (لا يستخدمها SQLite إلا إذا كُتبت الحالة حرفياً في الاستعلام، لا كمعامل ?)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vacations_pending_dept
+        ON vacations(department_id, created_at) WHERE workflow_state = 'pending_dept'
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vacations_pending_manager
+        ON vacations(created_at) WHERE workflow_state = 'pending_manager'
+    """)
+    # فهرس الحالة الكامل يزاحم الجزئيين ثم يفرز؛ الحالات النهائية أغلب الجدول فلا نفع منه
+    cur.execute("DROP INDEX IF EXISTS idx_vacations_workflow_state")
+
+    # صف لكل طلب معلّق، يُحدَّث مع كل انتقال في سير العمل
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS approval_queue (
+        vacation_id INTEGER PRIMARY KEY REFERENCES vacations(id) ON DELETE CASCADE,
+        state TEXT NOT NULL CHECK(state IN ('pending_dept','pending_manager')),
+        department_id INTEGER,
+        employee_id INTEGER NOT NULL,
+        created_at TEXT
+    )
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_approval_queue_state
+        ON approval_queue(state, department_id, created_at)
+    """)
+    cur.execute("DELETE FROM approval_queue")
+    cur.execute("""
+        INSERT INTO approval_queue (vacation_id, state, department_id, employee_id, created_at)
+        SELECT id, workflow_state, department_id, employee_id, created_at
+        FROM vacations WHERE workflow_state IN ('pending_dept', 'pending_manager')
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_approval_queue_insert
+        AFTER INSERT ON vacations
+        WHEN NEW.workflow_state IN ('pending_dept', 'pending_manager')
+        BEGIN
+            INSERT OR REPLACE INTO approval_queue (vacation_id, state, department_id, employee_id, created_at)
+            VALUES (NEW.id, NEW.workflow_state,
+                    (SELECT department_id FROM employees WHERE id = NEW.employee_id),
+                    NEW.employee_id, NEW.created_at);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_approval_queue_transition
+        AFTER UPDATE OF workflow_state ON vacations
+        WHEN OLD.workflow_state IS NOT NEW.workflow_state
+        BEGIN
+            DELETE FROM approval_queue WHERE vacation_id = NEW.id;
+            INSERT INTO approval_queue (vacation_id, state, department_id, employee_id, created_at)
+            SELECT NEW.id, NEW.workflow_state, NEW.department_id, NEW.employee_id, NEW.created_at
+            WHERE NEW.workflow_state IN ('pending_dept', 'pending_manager');
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_approval_queue_reassign
+        AFTER UPDATE OF department_id, employee_id ON vacations
+        BEGIN
+            UPDATE approval_queue
+            SET department_id = NEW.department_id, employee_id = NEW.employee_id
+            WHERE vacation_id = NEW.id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_approval_queue_delete
+        AFTER DELETE ON vacations
+        BEGIN
+            DELETE FROM approval_queue WHERE vacation_id = OLD.id;
+        END
+    """)
+
+
+@migration(11, "dashboard counters maintained by triggers")
+def _m011_stats_counters(cur):
+    # عدادات اللوحات: employees لكل قسم، pending لكل قسم وحالة، absences لكل قسم ويوم
+    # (department_id = 0 لمن بلا قسم)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS stats_counters (
+        name TEXT NOT NULL,
+        department_id INTEGER NOT NULL DEFAULT 0,
+        key TEXT NOT NULL DEFAULT '',
+        value INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (name, key, department_id)
+    ) WITHOUT ROWID
+    """)
+    cur.execute("DELETE FROM stats_counters")
+    cur.execute("""
+        INSERT INTO stats_counters (name, department_id, key, value)
+        SELECT 'employees', COALESCE(department_id, 0), '', COUNT(*) FROM employees
+        GROUP BY COALESCE(department_id, 0)
+    """)
+    cur.execute("""
+        INSERT INTO stats_counters (name, department_id, key, value)
+        SELECT 'pending', COALESCE(department_id, 0), state, COUNT(*) FROM approval_queue
+        GROUP BY COALESCE(department_id, 0), state
+    """)
+    cur.execute("""
+        INSERT INTO stats_counters (name, department_id, key, value)
+        SELECT 'absences', COALESCE(department_id, 0), date, COUNT(*) FROM absences
+        GROUP BY COALESCE(department_id, 0), date
+    """)
+
+    def bump(name, department, key, delta):
+        return f"""
+            INSERT INTO stats_counters (name, department_id, key, value)
+            VALUES ('{name}', COALESCE({department}, 0), {key}, {delta})
+            ON CONFLICT (name, key, department_id) DO UPDATE SET value = value + ({delta});
+        """
+
+    triggers = {
+        "trg_stats_employees_insert": ("AFTER INSERT ON employees", "",
+                                       bump("employees", "NEW.department_id", "''", 1)),
+        "trg_stats_employees_delete": ("AFTER DELETE ON employees", "",
+                                       bump("employees", "OLD.department_id", "''", -1)),
+        "trg_stats_employees_move": ("AFTER UPDATE OF department_id ON employees",
+                                     "WHEN OLD.department_id IS NOT NEW.department_id",
+                                     bump("employees", "OLD.department_id", "''", -1)
+                                     + bump("employees", "NEW.department_id", "''", 1)),
+        # المعلّق يُعدّ من approval_queue التي تتبع كل انتقال في سير العمل
+        "trg_stats_pending_insert": ("AFTER INSERT ON approval_queue", "",
+                                     bump("pending", "NEW.department_id", "NEW.state", 1)),
+        "trg_stats_pending_delete": ("AFTER DELETE ON approval_queue", "",
+                                     bump("pending", "OLD.department_id", "OLD.state", -1)),
+        "trg_stats_pending_update": ("AFTER UPDATE OF department_id, state ON approval_queue",
+                                     "WHEN OLD.department_id IS NOT NEW.department_id OR OLD.state IS NOT NEW.state",
+                                     bump("pending", "OLD.department_id", "OLD.state", -1)
+                                     + bump("pending", "NEW.department_id", "NEW.state", 1)),
+        "trg_stats_absences_insert": ("AFTER INSERT ON absences", "",
+                                      bump("absences", "NEW.department_id", "NEW.date", 1)),
+        "trg_stats_absences_delete": ("AFTER DELETE ON absences", "",
+                                      bump("absences", "OLD.department_id", "OLD.date", -1)),
+        "trg_stats_absences_update": ("AFTER UPDATE OF department_id, date ON absences",
+                                      "WHEN OLD.department_id IS NOT NEW.department_id OR OLD.date IS NOT NEW.date",
+                                      bump("absences", "OLD.department_id", "OLD.date", -1)
+                                      + bump("absences", "NEW.department_id", "NEW.date", 1)),
+    }
+    for name, (event, condition, body) in triggers.items():
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} {condition} BEGIN {body} END")
+
+
+# الجداول التي تعتمد عليها نتائج result_cache
+VERSIONED_TABLES = ("employees", "departments", "vacations", "absences")
+
+
+@migration(12, "table version counters for the result cache")
+def _m012_table_versions(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS table_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    """)
+    for table in VERSIONED_TABLES:
+        _create_version_triggers(cur, table)
+
+
+def _create_version_triggers(cur, table):
+    """Register ``table`` in table_versions and bump its counter on every write."""
+    cur.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END
+        """)
+
+
+@migration(13, "keyset pagination indexes")
+def _m013_keyset_indexes(cur):
+    # الصفحات مرتبة بـ (name, id) و(created_at, id)؛ الفهرس يتضمن rowid ضمنياً
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_employees_name ON employees(name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_employees_department_name ON employees(department_id, name)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vacations_created ON vacations(created_at)")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vacations_department_created
+        ON vacations(department_id, created_at)
+    """)
+
+
+# الأعمدة المفهرسة في employees_fts بالترتيب (أوزان الترتيب في employees/search_service.py)
+EMPLOYEE_SEARCH_COLUMNS = ("name", "serial_number", "national_id", "job_grade")
+EMPLOYEE_FOLDED_COLUMNS = ("name", "job_grade")
+
+
+@migration(14, "employees full-text search")
+def _m014_employees_fts(cur):
+    columns = ", ".join(EMPLOYEE_SEARCH_COLUMNS)
+    cur.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS employees_fts USING fts5(
+            {columns},
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+
+    # النصوص العربية تُطوى (همزات، تاء مربوطة، تشكيل) قبل الفهرسة؛ الاستعلام يُطوى بـ normalize_arabic.
+    # الأرقام الآلية والوطنية رموز لا تحتاج الطي (والطي يضاعف كلفة المشغّل عند الاستيراد)
+    def folded(prefix):
+        return ", ".join(arabic_fold_sql(f"{prefix}.{column}") if column in EMPLOYEE_FOLDED_COLUMNS
+                         else f"{prefix}.{column}" for column in EMPLOYEE_SEARCH_COLUMNS)
+
+    insert_new = f"INSERT INTO employees_fts (rowid, {columns}) VALUES (NEW.id, {folded('NEW')});"
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_employees_fts_insert AFTER INSERT ON employees
+        BEGIN
+            {insert_new}
+        END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_employees_fts_update AFTER UPDATE OF id, {columns} ON employees
+        BEGIN
+            DELETE FROM employees_fts WHERE rowid = OLD.id;
+            {insert_new}
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_employees_fts_delete AFTER DELETE ON employees
+        BEGIN
+            DELETE FROM employees_fts WHERE rowid = OLD.id;
+        END
+    """)
+
+    cur.execute("DELETE FROM employees_fts")
+    cur.execute(f"INSERT INTO employees_fts (rowid, {columns}) SELECT id, {folded('employees')} FROM employees")
+    cur.execute("INSERT INTO employees_fts (employees_fts) VALUES ('optimize')")
+
+
+@migration(15, "web_users version counter for the user-loader cache")
+def _m015_web_users_version(cur):
+    # أي تعديل على web_users (ومنه is_active) يُسقط نسخ WebUser المخزنة
+    _create_version_triggers(cur, "web_users")
+
+
+@migration(16, "app settings shared by all processes")
+def _m016_app_settings(cur):
+    # قيم تشغيلية تحسبها العملية أو أمر CLI (مثل جولات bcrypt المعايرة)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS app_settings (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+    """)
+
+
+@migration(17, "API tokens for machine clients")
+def _m017_api_tokens(cur):
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS api_tokens (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        token_hash TEXT NOT NULL UNIQUE,
+        token_prefix TEXT NOT NULL,
+        role TEXT NOT NULL CHECK(role IN ('manager','dept_head','employee')),
+        department_id INTEGER NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        expires_at TEXT NULL,
+        last_used_at TEXT NULL,
+        revoked_at TEXT NULL,
+        FOREIGN KEY (user_id) REFERENCES web_users(id) ON DELETE CASCADE,
+        FOREIGN KEY (department_id) REFERENCES departments(id)
+    )
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens(user_id)")
+
+    # عداد الإصدار يتغير مع ما يؤثر في صلاحية الرمز فقط؛ تحديث last_used_at الدوري لا يُسقط التخزين
+    cur.execute("INSERT OR IGNORE INTO table_versions (name, version) VALUES ('api_tokens', 0)")
+    bump = "UPDATE table_versions SET version = version + 1 WHERE name = 'api_tokens';"
+    for name, event in (("insert", "INSERT"), ("delete", "DELETE"),
+                        ("update", "UPDATE OF user_id, token_hash, role, department_id, expires_at, revoked_at")):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_version_api_tokens_{name}
+            AFTER {event} ON api_tokens
+            BEGIN
+                {bump}
+            END
+        """)
+
+
+@migration(18, "balance ledger index by effective time")
+def _m018_ledger_effective_index(cur):
+    # اللقطة الشهرية تجمع القيود المؤرخة بأثر رجعي بنطاق created_at
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_balance_ledger_created ON balance_ledger(created_at)")
+
+
+@migration(19, "opt-in sheet-per-department imports")
+def _m019_import_sheet_departments(cur):
+    cur.execute("PRAGMA table_info(import_jobs)")
+    if "sheet_departments" not in [row[1] for row in cur.fetchall()]:
+        # 1 = كل ورقة في المصنف قسم مستقل؛ الافتراضي الورقة الأولى فقط
+        cur.execute("ALTER TABLE import_jobs ADD COLUMN sheet_departments INTEGER NOT NULL DEFAULT 0")
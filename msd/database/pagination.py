@@ -0,0 +1,90 @@
+"""
+Keyset (seek) pagination for list endpoints.
+
+A page is ``ORDER BY k1, k2 LIMIT n`` continued with the row value
+``(k1, k2) > (last_k1, last_k2)`` instead of OFFSET, so every page is an
+index range scan no matter how deep the client pages. The last key of a
+page is handed back as an opaque cursor string.
+"""
+
+import json
+import base64
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_limit(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Requested page size clamped to 1..MAX_PAGE_SIZE."""
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        raise ValueError(f"حجم الصفحة غير صالح: {value}")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List[Any]]:
+    """Key values from a cursor (None for the first page); ValueError if malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("مؤشر الصفحة غير صالح")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("مؤشر الصفحة غير صالح")
+    return values
+
+
+def keyset_query(
+    base_query: str,
+    params: Sequence[Any],
+    keys: Sequence[str],
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    descending: bool = False
+) -> Tuple[str, List[Any]]:
+    """SQL and parameters of one page (``limit + 1`` rows, the extra one tells whether more follow)."""
+    query, params = base_query, list(params)
+    after = decode_cursor(cursor, len(keys))
+    if after is not None:
+        placeholders = ", ".join("?" for _ in keys)
+        query += f" AND ({', '.join(keys)}) {'<' if descending else '>'} ({placeholders})"
+        params.extend(after)
+    direction = " DESC" if descending else ""
+    query += " ORDER BY " + ", ".join(key + direction for key in keys) + " LIMIT ?"
+    params.append(limit + 1)
+    return query, params
+
+
+def keyset_page(
+    cur,
+    base_query: str,
+    params: Sequence[Any],
+    keys: Sequence[str],
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    descending: bool = False
+) -> Dict[str, Any]:
+    """
+    Run one page of ``base_query`` (which must end in a WHERE clause).
+
+    ``keys`` are the ORDER BY columns, the last one unique (usually the id);
+    each must also be selected under its bare column name so the next
+    cursor can be read from the last row. Returns {'items', 'next_cursor'}.
+    """
+    cur.execute(*keyset_query(base_query, params, keys, cursor, limit, descending))
+    rows = [dict(row) for row in cur.fetchall()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[key.rsplit('.', 1)[-1]] for key in keys])
+    return {'items': rows, 'next_cursor': next_cursor}
@@ -0,0 +1,120 @@
+"""
+WHERE-clause builder for absence and vacation reports.
+
+Date filters are always emitted as half-open ranges on the bare column
+(``col >= ? AND col < ?``) so SQLite can seek an index on it; never wrap a
+filtered column in strftime()/date(). scripts/check_query_plans.py checks
+the resulting plans.
+"""
+
+from datetime import date, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+
+from ..utils.dates import month_range, year_range
+
+
+class ReportFilter:
+    """Accumulates AND-ed conditions and their parameters."""
+
+    def __init__(self):
+        self.clauses: List[str] = []
+        self.params: List[Any] = []
+
+    def equals(self, column: str, value) -> "ReportFilter":
+        """``column = value``; skipped when value is empty."""
+        if value not in (None, ''):
+            self.clauses.append(f"{column} = ?")
+            self.params.append(value)
+        return self
+
+    def search(self, text: Optional[str], contains: Sequence[str] = (), prefix: Sequence[str] = ()) -> "ReportFilter":
+        """Text found anywhere in a ``contains`` column or at the start of a ``prefix`` one."""
+        if not text or not text.strip():
+            return self
+        terms = [(column, like_pattern(text)) for column in contains]
+        terms += [(column, like_pattern(text, prefix=True)) for column in prefix]
+        self.clauses.append("(" + " OR ".join(f"{column} LIKE ? ESCAPE '\\'" for column, _ in terms) + ")")
+        self.params.extend(pattern for _, pattern in terms)
+        return self
+
+    def matching(self, column: str, fts_table: str, expression: Optional[str]) -> "ReportFilter":
+        """``column`` among the rowids of ``fts_table`` rows matching an FTS5 expression; skipped when None."""
+        if expression:
+            self.clauses.append(f"{column} IN (SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?)")
+            self.params.append(expression)
+        return self
+
+    def date_range(self, column: str, start: Optional[str], end: Optional[str]) -> "ReportFilter":
+        """``start <= column < end``; either bound may be None."""
+        if start:
+            self.clauses.append(f"{column} >= ?")
+            self.params.append(start)
+        if end:
+            self.clauses.append(f"{column} < ?")
+            self.params.append(end)
+        return self
+
+    def period(self, column: str, month: Optional[str] = None, year=None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None) -> "ReportFilter":
+        """
+        Month (YYYY-MM), year and/or inclusive date_from/date_to on a date column.
+
+        Raises ValueError on malformed input.
+        """
+        start, end = period_bounds(month, year, date_from, date_to)
+        return self.date_range(column, start, end)
+
+    def overlapping(self, start_column: str, end_column: str, month: Optional[str] = None, year=None,
+                    date_from: Optional[str] = None, date_to: Optional[str] = None) -> "ReportFilter":
+        """Rows whose [start_column, end_column] span touches the period (vacations)."""
+        start, end = period_bounds(month, year, date_from, date_to)
+        if end:
+            self.clauses.append(f"{start_column} < ?")
+            self.params.append(end)
+        if start:
+            self.clauses.append(f"{end_column} >= ?")
+            self.params.append(start)
+        return self
+
+    def sql(self) -> str:
+        """The conditions as `` AND ...`` to append after ``WHERE 1=1``."""
+        return "".join(f" AND {clause}" for clause in self.clauses)
+
+    def build(self, base_query: str, order_by: Optional[str] = None) -> Tuple[str, List[Any]]:
+        query = base_query + self.sql()
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        return query, list(self.params)
+
+
+def like_pattern(text: str, prefix: bool = False) -> str:
+    """LIKE pattern (ESCAPE '\\') matching ``text`` anywhere, or at the start with ``prefix``."""
+    escaped = text.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%' if prefix else f"%{escaped}%"
+
+
+def period_bounds(month: Optional[str] = None, year=None, date_from: Optional[str] = None,
+                  date_to: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Intersect the given filters into one half-open (start, end) range."""
+    starts, ends = [], []
+    if month:
+        start, end = month_range(month)
+        starts.append(start)
+        ends.append(end)
+    if year:
+        start, end = year_range(year)
+        starts.append(start)
+        ends.append(end)
+    if date_from:
+        starts.append(_parse_date(date_from).isoformat())
+    if date_to:
+        # date_to شامل، فالحد الأعلى هو اليوم التالي
+        ends.append((_parse_date(date_to) + timedelta(days=1)).isoformat())
+    return (max(starts) if starts else None), (min(ends) if ends else None)
+
+
+def _parse_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date format. Expected YYYY-MM-DD: {value}")
@@ -0,0 +1,125 @@
+"""
+Process-local LRU cache for service-layer read functions.
+
+Entries are keyed on the function, its arguments, the database path and
+the versions of the tables it reads. ``table_versions`` holds one counter
+per table, bumped by triggers on every insert/update/delete (migration 12),
+so any write - from this process or another - yields new keys and stale
+entries simply age out of the LRU.
+
+Reading the counters is skipped while nothing can have changed: per
+connection we remember ``PRAGMA data_version`` (changes when another
+connection commits) and ``total_changes`` (writes on this connection);
+when both are unchanged the last versions read are still current.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+from flask import current_app
+
+from .connection import get_conn, get_db_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE = 256
+
+
+class ResultCache:
+    """Thread-safe LRU of function results with hit/miss counters."""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bypassed": 0,
+                      "version_checks": 0, "version_reads": 0}
+
+    def cached(self, *tables: str):
+        """Decorator: cache the function's result until one of ``tables`` changes."""
+        def decorator(fn):
+            name = f"{fn.__module__}.{fn.__qualname__}"
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                size = int(current_app.config.get("RESULT_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+                versions = self.versions(tables) if size > 0 else None
+                if versions is None:
+                    self._count("bypassed")
+                    return fn(*args, **kwargs)
+
+                key = (name, get_db_path(), args, tuple(sorted(kwargs.items())), versions)
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                        self.stats["hits"] += 1
+                        return self._entries[key]
+                    self.stats["misses"] += 1
+
+                # الدالة تفتح اتصالها الخاص؛ الإصدارات قُرئت قبلها فلا تُخزَّن نتيجة أقدم من مفتاحها
+                result = fn(*args, **kwargs)
+                with self._lock:
+                    self._entries[key] = result
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > size:
+                        self._entries.popitem(last=False)
+                        self.stats["evictions"] += 1
+                return result
+
+            wrapper.uncached = fn
+            return wrapper
+        return decorator
+
+    def versions(self, tables) -> Optional[Tuple]:
+        """Current versions of ``tables``, or None when the result must not be cached."""
+        conn = get_conn()
+        try:
+            # داخل معاملة مفتوحة قد تُلغى التغييرات فيعود رقم الإصدار نفسه لبيانات مختلفة
+            if conn.in_transaction:
+                return None
+            raw = conn.raw
+            data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            marker = (data_version, conn.total_changes)
+            self._count("version_checks")
+
+            last = getattr(self._local, "last", None)
+            if last is not None and last[0] is raw and last[1] == marker:
+                current = last[2]
+            else:
+                current = dict(conn.execute("SELECT name, version FROM table_versions").fetchall())
+                self._local.last = (raw, marker, current)
+                self._count("version_reads")
+            return tuple(current.get(table, 0) for table in tables)
+        finally:
+            conn.close()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return dict(self.stats, size=len(self._entries),
+                        hit_ratio=round(self.stats["hits"] / lookups, 3) if lookups else None)
+
+
+result_cache = ResultCache()
+cached_query = result_cache.cached
+
+
+def result_cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction counters of the shared result cache."""
+    return result_cache.get_stats()
+
+
+def table_versions(*tables: str) -> Optional[Tuple]:
+    """Current version counters of ``tables`` (None inside an open transaction)."""
+    return result_cache.versions(tables)
@@ -1,20 +1,23 @@
 """Database schema initialization with new comprehensive schema."""
-import sqlite3
 import logging
-from passlib.hash import bcrypt
-from msd.database.connection import get_conn
+from msd.auth.password_policy import hash_password
 
 logger = logging.getLogger(__name__)
 
 
 def init_database():
-    """Initialize database with new comprehensive schema (idempotent)."""
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    # Enable foreign keys
-    cur.execute("PRAGMA foreign_keys = ON")
-    
+    """
+    Bring the database schema up to date (idempotent).
+
+    Returns immediately when the stored schema version is current; otherwise
+    applies the pending migrations from msd.database.migrations in order.
+    """
+    from msd.database.migrations import ensure_schema
+    return ensure_schema()
+
+
+def create_base_schema(cur):
+    """Create the v1 schema: tables, late-added columns and indexes."""
     # Create web_users table
     cur.execute("""
     CREATE TABLE IF NOT EXISTS web_users (
@@ -206,13 +209,6 @@ def init_database():
             cur.execute(index_sql)
         except Exception as e:
             logger.warning(f"Could not create index: {e}")
-    
-    # Seed default data
-    _seed_default_data(cur)
-    
-    conn.commit()
-    conn.close()
-    logger.info("تم تهيئة قاعدة البيانات بنجاح")
 
 
 def _seed_default_data(cur):
@@ -231,7 +227,7 @@ def _seed_default_data(cur):
     # Seed default admin user if no manager exists
     cur.execute("SELECT COUNT(*) FROM web_users WHERE role = 'manager'")
     if cur.fetchone()[0] == 0:
-        admin_password_hash = bcrypt.hash("admin123")
+        admin_password_hash = hash_password("admin123")
         cur.execute("""
             INSERT INTO web_users (username, password_hash, role, is_active)
             VALUES (?, ?, 'manager', 1)
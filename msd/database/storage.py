@@ -0,0 +1,88 @@
+"""
+SQLite storage profiles (journal mode, sync level, cache sizing)
+
+A profile is a set of PRAGMAs applied once to every pooled connection when it
+is opened. The active profile is chosen with ``SQLITE_STORAGE_PROFILE`` in
+config.Config; single settings can be overridden with ``SQLITE_PRAGMAS``.
+"""
+
+import logging
+import sqlite3
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE = "balanced"
+
+STORAGE_PROFILES: Dict[str, Dict[str, Any]] = {
+    # إعدادات SQLite الافتراضية (سجل التراجع) — للمقارنة فقط
+    "legacy": {},
+    # القراءة لا تُحجب أثناء الكتابة، مع مزامنة مناسبة لوضع WAL
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,        # ~16MB
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    # مثل balanced لكن مع fsync عند كل commit
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 10000,
+    },
+}
+
+# القيم المسموح بها لكل PRAGMA (تُقرأ من الإعدادات وتدخل نص SQL مباشرة)
+_ENUM_PRAGMAS = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+_INT_PRAGMAS = {"cache_size", "mmap_size", "busy_timeout"}
+
+# ترتيب التطبيق: busy_timeout أولاً حتى لا يفشل تغيير journal_mode تحت الضغط
+_APPLY_ORDER = ["busy_timeout", "journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store"]
+
+
+def resolve_storage_profile(config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Build the PRAGMA settings for the configured profile plus overrides."""
+    config = config or {}
+    name = config.get("SQLITE_STORAGE_PROFILE", DEFAULT_PROFILE) or "legacy"
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown SQLite storage profile: {name}")
+
+    pragmas = dict(STORAGE_PROFILES[name])
+    pragmas.update(config.get("SQLITE_PRAGMAS") or {})
+    return _validate(pragmas)
+
+
+def _validate(pragmas: Dict[str, Any]) -> Dict[str, Any]:
+    validated = {}
+    for key, value in pragmas.items():
+        if key in _ENUM_PRAGMAS:
+            value = str(value).upper()
+            if value not in _ENUM_PRAGMAS[key]:
+                raise ValueError(f"Invalid value for PRAGMA {key}: {value}")
+        elif key in _INT_PRAGMAS:
+            value = int(value)
+        else:
+            raise ValueError(f"Unsupported PRAGMA in storage profile: {key}")
+        validated[key] = value
+    return validated
+
+
+def apply_storage_profile(conn: sqlite3.Connection, pragmas: Dict[str, Any]):
+    """Apply validated PRAGMA settings to a freshly opened connection."""
+    for key in _APPLY_ORDER:
+        if key not in pragmas:
+            continue
+        value = pragmas[key]
+        row = conn.execute(f"PRAGMA {key} = {value}").fetchone()
+        if key == "journal_mode" and row and str(row[0]).upper() != value:
+            # مثلاً قاعدة بيانات في الذاكرة لا تدعم WAL
+            logger.warning(f"journal_mode={value} not applied, SQLite kept {row[0]}")
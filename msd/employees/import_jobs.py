@@ -0,0 +1,342 @@
+"""
+Background employee import jobs.
+
+Uploads (Excel, CSV or Parquet, one or several files) are staged to disk
+and a row in ``import_jobs`` is queued; a thread pool runs the import off
+the request path and records the counters, errors
+and final state on that row. A job first parses and validates its files
+into a cache file and only then takes the SQLite write lock for the
+upsert. A dry run keeps that file, so confirming it (commit_import_job)
+upserts the parsed data without reading the workbook again.
+
+Live progress is kept in memory by the process running the job and written
+to the row when the job starts and finishes.
+"""
+
+import os
+import glob
+import json
+import atexit
+import socket
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from flask import current_app
+
+from msd.database.connection import get_conn
+from msd.utils.ingest import detect_format, estimate_rows, list_sources, read_spooled_chunks, stage_chunks
+from .import_service import parse_sources, write_employee_chunks
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_CACHE_TTL_SECONDS = 3600
+DEFAULT_STALE_SECONDS = 6 * 3600
+# الأخطاء المخزنة في صف المهمة (العدد الكامل في error_count)
+MAX_STORED_ERRORS = 1000
+
+_progress: Dict[str, Dict[str, int]] = {}
+_progress_lock = threading.Lock()
+
+
+def _timestamp(moment: Optional[datetime] = None) -> str:
+    return (moment or datetime.now()).isoformat(sep=" ", timespec="seconds")
+
+
+def _staging_dir() -> str:
+    path = current_app.config.get("IMPORT_STAGING_DIR") or os.path.join(current_app.root_path, "imports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _upload_path(job_id: str, index: int, filename: str) -> str:
+    # الامتداد يحدد الصيغة؛ نحتفظ بالاسم الأصلي دون أي مسار
+    name = os.path.basename(filename.replace("\\", "/"))
+    return os.path.join(_staging_dir(), f"{job_id}-{index}-{name}")
+
+
+def _uploads(job_id: str) -> List[tuple]:
+    """(path, original filename) of a job's staged files, in upload order."""
+    prefix = os.path.join(_staging_dir(), f"{job_id}-")
+    paths = sorted(glob.glob(glob.escape(prefix) + "*"),
+                   key=lambda path: int(path[len(prefix):].split("-", 1)[0]))
+    return [(path, path[len(prefix):].split("-", 1)[1]) for path in paths]
+
+
+def _cache_path(job_id: str) -> str:
+    return os.path.join(_staging_dir(), f"{job_id}.parsed.jsonl")
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Job rows
+# ---------------------------------------------------------------------------
+
+def _insert_job(job_id: str, dry_run: bool, create_departments: bool, diff: bool, filename: str,
+                user_id: Optional[int], source_job_id: Optional[str] = None, sheet_departments: bool = False):
+    conn = get_conn()
+    try:
+        conn.execute("""
+            INSERT INTO import_jobs (id, dry_run, create_departments, diff, sheet_departments, filename,
+                                     source_job_id, created_by, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (job_id, int(dry_run), int(create_departments), int(diff), int(sheet_departments), filename,
+              source_job_id, user_id, _timestamp()))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _update_job(job_id: str, **fields):
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    conn = get_conn()
+    try:
+        conn.execute(f"UPDATE import_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def get_import_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Job row as a dict with decoded errors; live counters while it runs here."""
+    conn = get_conn()
+    try:
+        row = conn.execute("SELECT * FROM import_jobs WHERE id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+
+    job = dict(row)
+    job["dry_run"] = bool(job["dry_run"])
+    job["create_departments"] = bool(job["create_departments"])
+    job["diff"] = bool(job["diff"])
+    job["sheet_departments"] = bool(job["sheet_departments"])
+    job["errors"] = json.loads(job["errors"]) if job["errors"] else []
+    if job["state"] == "running":
+        with _progress_lock:
+            job.update(_progress.get(job_id, {}))
+    if job["dry_run"] and job["state"] == "succeeded":
+        job["can_commit"] = not job["committed_by_job_id"] and os.path.exists(_cache_path(job_id))
+    return job
+
+
+# ---------------------------------------------------------------------------
+# Creating jobs
+# ---------------------------------------------------------------------------
+
+def create_import_job(files, dry_run: bool = False, create_departments: bool = True,
+                      user_id: Optional[int] = None, diff: bool = False,
+                      sheet_departments: bool = False) -> str:
+    """
+    Stage uploaded files (Excel, CSV or Parquet; one or several) and queue
+    their import as one job; returns the job id. Workbooks are read from
+    their first sheet unless ``sheet_departments`` (see list_sources).
+    """
+    if not isinstance(files, (list, tuple)):
+        files = [files]
+    for file_storage in files:
+        detect_format(file_storage.filename)
+
+    job_id = uuid.uuid4().hex
+    for index, file_storage in enumerate(files):
+        file_storage.save(_upload_path(job_id, index, file_storage.filename))
+    _insert_job(job_id, dry_run, create_departments, diff,
+                ", ".join(file_storage.filename for file_storage in files), user_id,
+                sheet_departments=sheet_departments)
+    _runner().submit(job_id)
+    logger.info(f"Import job {job_id} queued ({'dry run' if dry_run else 'import'})")
+    return job_id
+
+
+def commit_import_job(dry_run_job_id: str, user_id: Optional[int] = None) -> str:
+    """Queue the real import of a finished dry run, reusing its parsed data."""
+    source = get_import_job(dry_run_job_id)
+    if source is None:
+        raise LookupError("مهمة الاستيراد غير موجودة")
+    if not source["dry_run"] or source["state"] != "succeeded":
+        raise ValueError("يمكن تأكيد معاينة ناجحة فقط")
+    if not os.path.exists(_cache_path(dry_run_job_id)):
+        raise ValueError("انتهت صلاحية المعاينة، يرجى رفع الملف مرة أخرى")
+
+    job_id = uuid.uuid4().hex
+    conn = get_conn()
+    try:
+        # تأكيد واحد فقط لكل معاينة
+        cur = conn.execute("""
+            UPDATE import_jobs SET committed_by_job_id = ?
+            WHERE id = ? AND committed_by_job_id IS NULL
+        """, (job_id, dry_run_job_id))
+        conn.commit()
+        claimed = cur.rowcount == 1
+    finally:
+        conn.close()
+    if not claimed:
+        raise ValueError("تم تأكيد هذه المعاينة مسبقاً")
+
+    _insert_job(job_id, False, source["create_departments"], source["diff"], source["filename"],
+                user_id, source_job_id=dry_run_job_id, sheet_departments=source["sheet_departments"])
+    _runner().submit(job_id)
+    logger.info(f"Import job {job_id} queued from dry run {dry_run_job_id}")
+    return job_id
+
+
+# ---------------------------------------------------------------------------
+# Running jobs
+# ---------------------------------------------------------------------------
+
+def _remove_uploads(job_id: str):
+    for path, _ in _uploads(job_id):
+        _remove(path)
+
+
+def run_import_job(job_id: str):
+    """Execute a queued job; must run inside an app context."""
+    job = get_import_job(job_id)
+    if job is None or job["state"] != "queued":
+        return
+
+    source_id = job["source_job_id"]
+    _update_job(job_id, state="running", started_at=_timestamp(),
+                worker=f"{socket.gethostname()}:{os.getpid()}")
+
+    def progress(counters):
+        with _progress_lock:
+            _progress[job_id] = counters
+
+    try:
+        if source_id:
+            chunks = read_spooled_chunks(_cache_path(source_id))
+        else:
+            aliases = current_app.config.get("IMPORT_COLUMN_ALIASES")
+            sources = [source for path, filename in _uploads(job_id)
+                       for source in list_sources(path, filename, job["sheet_departments"], aliases)]
+            estimates = [estimate_rows(source) for source in sources]
+            if None not in estimates:
+                _update_job(job_id, total_rows=sum(estimates))
+            # التحليل كاملاً قبل قفل الكتابة؛ ملف المعاينة يُحفظ للتأكيد
+            stage_chunks(parse_sources(sources, spool_dir=_staging_dir()), _cache_path(job_id))
+            chunks = read_spooled_chunks(_cache_path(job_id))
+        report = write_employee_chunks(chunks, dry_run=job["dry_run"],
+                                       create_departments=job["create_departments"],
+                                       progress=progress, diff=job["diff"])
+    except Exception as e:
+        logger.exception(f"Import job {job_id} failed")
+        with _progress_lock:
+            counters = _progress.get(job_id, {})
+        # المعاملة تراجعت: لا يبقى من العدادات إلا الصفوف المقروءة وأخطاؤها
+        _update_job(job_id, state="failed", message=str(e), finished_at=_timestamp(),
+                    processed_rows=counters.get("processed_rows", 0),
+                    error_count=counters.get("error_count", 0),
+                    inserted=0, updated=0, unchanged=None, missing=None)
+        if source_id:
+            # يمكن إعادة محاولة التأكيد
+            _update_job(source_id, committed_by_job_id=None)
+        else:
+            _remove(_cache_path(job_id))
+            _remove_uploads(job_id)
+        return
+    finally:
+        with _progress_lock:
+            counters = _progress.pop(job_id, {})
+
+    errors = report["errors"]
+    _update_job(job_id, state="succeeded", finished_at=_timestamp(),
+                processed_rows=counters.get("processed_rows", 0),
+                inserted=report["inserted"], updated=report["updated"],
+                unchanged=report.get("unchanged"), missing=report.get("missing"),
+                error_count=len(errors),
+                errors=json.dumps(errors[:MAX_STORED_ERRORS], ensure_ascii=False))
+
+    # ملف المعاينة يبقى حتى التأكيد أو انتهاء الصلاحية
+    if source_id:
+        _remove(_cache_path(source_id))
+        _remove_uploads(source_id)
+    elif not job["dry_run"]:
+        _remove(_cache_path(job_id))
+        _remove_uploads(job_id)
+    logger.info(f"Import job {job_id} finished: {report['inserted']} inserted, "
+                f"{report['updated']} updated, {len(errors)} errors")
+
+
+def cleanup_import_jobs() -> Dict[str, int]:
+    """Drop expired dry-run caches and fail jobs left running by a dead worker."""
+    config = current_app.config
+    now = datetime.now()
+    expired_before = _timestamp(now - timedelta(
+        seconds=int(config.get("IMPORT_CACHE_TTL_SECONDS", DEFAULT_CACHE_TTL_SECONDS))))
+    stale_before = _timestamp(now - timedelta(
+        seconds=int(config.get("IMPORT_JOB_STALE_SECONDS", DEFAULT_STALE_SECONDS))))
+
+    conn = get_conn()
+    try:
+        expired = [row["id"] for row in conn.execute("""
+            SELECT id FROM import_jobs
+            WHERE dry_run = 1 AND committed_by_job_id IS NULL
+              AND state IN ('succeeded', 'failed') AND finished_at < ?
+        """, (expired_before,))]
+        cur = conn.execute("""
+            UPDATE import_jobs SET state = 'failed', finished_at = ?,
+                   message = 'توقفت المهمة قبل اكتمالها'
+            WHERE state IN ('queued', 'running') AND created_at < ?
+        """, (_timestamp(now), stale_before))
+        conn.commit()
+        stale = cur.rowcount
+    finally:
+        conn.close()
+
+    removed = 0
+    for job_id in expired:
+        for path in [_cache_path(job_id)] + [path for path, _ in _uploads(job_id)]:
+            if os.path.exists(path):
+                _remove(path)
+                removed += 1
+    return {"expired_files": removed, "stale_jobs": stale}
+
+
+# ---------------------------------------------------------------------------
+# Executor
+# ---------------------------------------------------------------------------
+
+class ImportJobRunner:
+    """Runs import jobs on a small thread pool, each inside an app context."""
+
+    def __init__(self, app):
+        self.app = app
+        self.executor = ThreadPoolExecutor(
+            max_workers=int(app.config.get("IMPORT_WORKERS", DEFAULT_WORKERS)),
+            thread_name_prefix="msd-import")
+
+    def submit(self, job_id: str):
+        return self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id: str):
+        with self.app.app_context():
+            try:
+                run_import_job(job_id)
+            except Exception:
+                logger.exception(f"Import job {job_id} crashed")
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait)
+
+
+def _runner() -> ImportJobRunner:
+    return current_app.extensions["msd_import_jobs"]
+
+
+def init_import_jobs(app) -> ImportJobRunner:
+    runner = ImportJobRunner(app)
+    app.extensions["msd_import_jobs"] = runner
+    atexit.register(runner.shutdown, wait=False)
+    return runner
@@ -3,278 +3,434 @@
 Enhanced Excel import service for employees
 """
 
-import pandas as pd
+import os
+import sqlite3
+import hashlib
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import logging
-from typing import Dict, Any, List, BinaryIO
+from flask import current_app
+from config import Config
+from typing import Dict, Any, List, BinaryIO, Callable, Iterable, Iterator, Optional, Tuple
 
 from ..database.connection import get_conn
-from ..utils.excel import (
-    normalize_column_names, safe_extract_value, normalize_date,
-    validate_national_id, safe_int, safe_float
+from ..utils.ingest import (
+    Source, iter_employee_chunks, parse_source_to_spool, read_spooled_chunks, stage_chunks
 )
-from .service import get_or_create_department, get_employee_by_national_id, update_employee
+from ..utils.excel import REQUIRED_COLUMNS, DEFAULT_VACATION_BALANCE
 
 
 logger = logging.getLogger(__name__)
 
-# Default configuration
+# Default configuration (outside an app context); import limits come from Config so they cannot drift
 DEFAULT_CONFIG = {
-    'MAX_IMPORT_ROWS': 1000,
-    'REQUIRED_COLUMNS': ['name', 'national_id'],
-    'DEFAULT_VACATION_BALANCE': 30.0
+    'MAX_IMPORT_ROWS': Config.MAX_IMPORT_ROWS,
+    'IMPORT_CHUNK_SIZE': Config.IMPORT_CHUNK_SIZE,
+    'IMPORT_PARSE_PROCESSES': Config.IMPORT_PARSE_PROCESSES,
+    'IMPORT_COLUMN_ALIASES': {},
+    'REQUIRED_COLUMNS': list(REQUIRED_COLUMNS),
+    'DEFAULT_VACATION_BALANCE': DEFAULT_VACATION_BALANCE
 }
 
+# Below this input size worker start-up costs more than parallel parsing saves
+PARALLEL_PARSE_MIN_BYTES = 1024 * 1024
+
+# Rows per executemany/savepoint in the bulk upsert
+UPSERT_CHUNK_SIZE = 500
+
+# Normalized fields fingerprinted into employees.row_hash (national_id is the key)
+ROW_HASH_FIELDS = ('serial_number', 'name', 'department', 'job_grade', 'hiring_date',
+                   'grade_date', 'bonus', 'vacation_balance', 'work_days')
+
+# Insert-or-update keyed on the unique national_id column
+UPSERT_EMPLOYEE_SQL = """
+    INSERT INTO employees (serial_number, name, national_id, department_id, job_grade,
+                           hiring_date, grade_date, bonus, vacation_balance,
+                           initial_vacation_balance, work_pattern, row_hash)
+    VALUES (:serial_number, :name, :national_id, :department_id, :job_grade,
+            :hiring_date, :grade_date, :bonus, :vacation_balance,
+            :vacation_balance, :work_days, :row_hash)
+    ON CONFLICT(national_id) DO UPDATE SET
+        serial_number = excluded.serial_number,
+        name = excluded.name,
+        department_id = excluded.department_id,
+        job_grade = excluded.job_grade,
+        hiring_date = excluded.hiring_date,
+        grade_date = excluded.grade_date,
+        bonus = excluded.bonus,
+        vacation_balance = excluded.vacation_balance,
+        work_pattern = excluded.work_pattern,
+        row_hash = excluded.row_hash,
+        initial_vacation_balance = COALESCE(employees.initial_vacation_balance,
+                                            excluded.initial_vacation_balance),
+        updated_at = CURRENT_TIMESTAMP
+"""
+
 
 def import_employees_from_excel(
-    file_stream: BinaryIO, 
+    file_stream: BinaryIO,
     dry_run: bool = False,
     create_departments: bool = True,
-    max_rows: int = None
+    max_rows: int = None,
+    chunk_size: int = None,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    diff: bool = False
 ) -> Dict[str, Any]:
     """
     Import employees from Excel file with enhanced validation and reporting
-    
+
+    The workbook is streamed in chunks and each validated chunk is spooled to
+    a temporary file; only then is the write lock taken and the spool
+    upserted in a single transaction. A dry run performs the same writes and
+    rolls them back, so its report matches what a real import would do.
+
     Args:
         file_stream: Excel file stream
         dry_run: If True, validate but don't commit changes
         create_departments: If True, create departments that don't exist
-        max_rows: Maximum rows to process (defaults to config)
-    
+        max_rows: Maximum rows allowed in the file (defaults to config, 0 = no limit)
+        chunk_size: Rows read and written per chunk (defaults to config)
+        progress: Called after every chunk with the running counters
+        diff: If True, skip rows whose fingerprint matches the last import
+            and also report unchanged and missing-from-file counts
+
     Returns:
-        Dict with keys: inserted, updated, errors
+        Dict with keys: inserted, updated, errors (+ unchanged, missing in diff mode)
+    """
+    with tempfile.TemporaryDirectory(prefix="msd_import_") as spool:
+        path = os.path.join(spool, "parsed.jsonl")
+        stage_chunks(parse_employee_chunks(file_stream, max_rows=max_rows, chunk_size=chunk_size), path)
+        return write_employee_chunks(read_spooled_chunks(path), dry_run=dry_run,
+                                     create_departments=create_departments, progress=progress,
+                                     diff=diff)
+
+
+def parse_employee_chunks(
+    file_stream: BinaryIO,
+    max_rows: int = None,
+    chunk_size: int = None,
+    fmt: str = 'excel',
+    sheet: Optional[str] = None,
+    department: Optional[str] = None,
+    label: Optional[str] = None,
+    aliases: Optional[Dict[str, List[str]]] = None
+) -> Iterator[Tuple[List[tuple], List[Dict[str, Any]]]]:
+    """
+    Stream a sheet or file as validated (valid_rows, errors) chunks
+    (ingest.iter_employee_chunks) with the limits and IMPORT_COLUMN_ALIASES
+    from the config unless given.
+    """
+    max_rows = _import_setting('MAX_IMPORT_ROWS', max_rows)
+    chunk_size = _import_setting('IMPORT_CHUNK_SIZE', chunk_size)
+    aliases = _import_setting('IMPORT_COLUMN_ALIASES', aliases)
+
+    return iter_employee_chunks(file_stream, fmt, chunk_size=chunk_size, max_rows=max_rows, sheet=sheet,
+                                department=department, label=label, aliases=aliases)
+
+
+def parse_sources(
+    sources: List[Source],
+    max_rows: int = None,
+    chunk_size: int = None,
+    processes: int = None,
+    spool_dir: Optional[str] = None
+) -> Iterator[Tuple[List[tuple], List[Dict[str, Any]]]]:
+    """
+    Validated chunks of several sheets/files, in source order.
+
+    Several sources totalling at least PARALLEL_PARSE_MIN_BYTES are parsed
+    in parallel by a process pool; each worker spools its validated chunks
+    to a JSON-lines file that is replayed here while later sources are
+    still being parsed. Otherwise the sources are streamed in-process.
+    MAX_IMPORT_ROWS applies to the total.
+    """
+    max_rows = _import_setting('MAX_IMPORT_ROWS', max_rows)
+    chunk_size = _import_setting('IMPORT_CHUNK_SIZE', chunk_size)
+    # العمليات الفرعية بلا سياق تطبيق، فتُمرَّر الأسماء البديلة صراحة
+    aliases = _import_setting('IMPORT_COLUMN_ALIASES', None)
+
+    processes = min(_import_setting('IMPORT_PARSE_PROCESSES', processes), len(sources),
+                    os.cpu_count() or 1)
+    input_bytes = sum(os.path.getsize(path) for path in {source.path for source in sources})
+    if processes <= 1 or input_bytes < PARALLEL_PARSE_MIN_BYTES:
+        # بدء عمليات جديدة أبطأ من تحليل ملفات صغيرة مباشرة
+        yield from _parse_sequentially(sources, max_rows, chunk_size, aliases)
+        return
+
+    # spawn: لا نرث خيوط الخادم وأقفالها في العمليات الفرعية؛ العامل (parse_source_to_spool)
+    # من msd.utils فلا يستورد التطبيق ولا قاعدة البيانات
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory(prefix="msd_import_", dir=spool_dir) as spool, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        futures = [
+            pool.submit(parse_source_to_spool, source, os.path.join(spool, f"{index}.jsonl"),
+                        max_rows, chunk_size, aliases)
+            for index, source in enumerate(sources)
+        ]
+        try:
+            total = 0
+            for index, future in enumerate(futures):
+                total += future.result()
+                if max_rows and total > max_rows:
+                    raise ValueError(f"عدد الصفوف في الملف يتجاوز الحد المسموح ({max_rows})")
+                yield from read_spooled_chunks(os.path.join(spool, f"{index}.jsonl"))
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _parse_sequentially(sources: List[Source], max_rows: int, chunk_size: int, aliases: Dict[str, List[str]]):
+    label_errors = len(sources) > 1
+    total = 0
+    for source in sources:
+        with open(source.path, 'rb') as stream:
+            for valid_rows, errors in parse_employee_chunks(
+                    stream, max_rows, chunk_size, source.fmt, source.sheet, source.department,
+                    source.label if label_errors else None, aliases):
+                total += len(valid_rows) + len(errors)
+                if max_rows and total > max_rows:
+                    raise ValueError(f"عدد الصفوف في الملف يتجاوز الحد المسموح ({max_rows})")
+                yield valid_rows, errors
+
+
+def write_employee_chunks(
+    parsed_chunks: Iterable[Tuple[List[tuple], List[Dict[str, Any]]]],
+    dry_run: bool = False,
+    create_departments: bool = True,
+    progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    diff: bool = False
+) -> Dict[str, Any]:
+    """
+    Upsert already validated chunks in one transaction (rolled back on dry run).
+
+    ``parsed_chunks`` should replay already parsed data (read_spooled_chunks()
+    over a file written by stage_chunks(), e.g. a cached dry run; see
+    import_jobs): the write lock is held while it is iterated, so parsing a
+    workbook here would block every other writer. In diff mode the national
+    IDs seen are kept in a temp table to count the employees missing from
+    the file.
     """
-    if max_rows is None:
-        max_rows = DEFAULT_CONFIG['MAX_IMPORT_ROWS']
-    
-    # Read Excel file
-    try:
-        df = pd.read_excel(file_stream, nrows=max_rows)
-    except Exception as e:
-        raise ValueError(f"خطأ في قراءة ملف Excel: {str(e)}")
-    
-    if df.empty:
-        raise ValueError("ملف Excel فارغ")
-    
-    # Normalize column names
-    column_mapping = normalize_column_names(df)
-    
-    if not column_mapping:
-        raise ValueError("لم يتم العثور على أعمدة صالحة في الملف")
-    
-    # Check required columns
-    missing_required = []
-    for required_col in DEFAULT_CONFIG['REQUIRED_COLUMNS']:
-        if required_col not in column_mapping:
-            missing_required.append(required_col)
-    
-    if missing_required:
-        raise ValueError(f"أعمدة مطلوبة مفقودة: {', '.join(missing_required)}")
-    
-    logger.info(f"الأعمدة المطابقة: {column_mapping}")
-    
-    # Initialize counters and error list
-    inserted_count = 0
-    updated_count = 0
-    errors = []
-    
-    # Get database connection
     conn = get_conn()
     cur = conn.cursor()
-    
+    counters = {'processed_rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'error_count': 0}
+    errors = []
+    missing = None
     try:
-        # Process each row
-        for index, row in df.iterrows():
-            try:
-                # Extract and validate data
-                result = _process_employee_row(
-                    row, column_mapping, index + 1, create_departments, cur
-                )
-                
-                if result['error']:
-                    errors.append({
-                        'row': index + 1,
-                        'reason': result['error']
-                    })
-                    continue
-                
-                employee_data = result['data']
-                
-                # Check if employee exists (by national_id)
-                existing_employee = get_employee_by_national_id(employee_data['national_id'])
-                
-                if not dry_run:
-                    if existing_employee:
-                        # Update existing employee
-                        _update_existing_employee(existing_employee, employee_data, cur)
-                        updated_count += 1
-                    else:
-                        # Insert new employee
-                        _insert_new_employee(employee_data, cur)
-                        inserted_count += 1
-                else:
-                    # Dry run - just count
-                    if existing_employee:
-                        updated_count += 1
-                    else:
-                        inserted_count += 1
-                        
-            except Exception as e:
-                errors.append({
-                    'row': index + 1,
-                    'reason': f"خطأ في معالجة الصف: {str(e)}"
-                })
-                logger.exception(f"خطأ في الصف {index + 1}")
-        
+        cur.execute("BEGIN IMMEDIATE")
+        if diff:
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS import_seen (national_id TEXT PRIMARY KEY)")
+            cur.execute("DELETE FROM temp.import_seen")
+
+        cur.execute("SELECT id, name FROM departments")
+        departments = {row["name"]: row["id"] for row in cur.fetchall()}
+        for valid_rows, chunk_errors in parsed_chunks:
+            report = _bulk_upsert(cur, departments, valid_rows, create_departments, diff)
+            if diff:
+                cur.executemany("INSERT OR IGNORE INTO temp.import_seen VALUES (?)",
+                                [(data['national_id'],) for _, data in valid_rows])
+            errors.extend(chunk_errors)
+            errors.extend(report['errors'])
+            counters['processed_rows'] += len(valid_rows) + len(chunk_errors)
+            counters['inserted'] += report['inserted']
+            counters['updated'] += report['updated']
+            counters['unchanged'] += report['unchanged']
+            counters['error_count'] = len(errors)
+            if progress:
+                progress(dict(counters))
+
+        if diff:
+            cur.execute("""
+                SELECT COUNT(*) FROM employees
+                WHERE national_id IS NOT NULL
+                  AND national_id NOT IN (SELECT national_id FROM temp.import_seen)
+            """)
+            missing = cur.fetchone()[0]
+            cur.execute("DROP TABLE temp.import_seen")
+
         # Commit changes if not dry run
-        if not dry_run:
+        if dry_run:
+            conn.rollback()
+        else:
             conn.commit()
-        
+
+    except Exception:
+        conn.rollback()
+        raise
     finally:
         conn.close()
-    
-    return {
-        'inserted': inserted_count,
-        'updated': updated_count,
+
+    errors.sort(key=lambda error: (error.get('sheet') or '', error['row']))
+    result = {
+        'inserted': counters['inserted'],
+        'updated': counters['updated'],
         'errors': errors
     }
+    if diff:
+        result['unchanged'] = counters['unchanged']
+        result['missing'] = missing
+    return result
 
 
-def _process_employee_row(
-    row: pd.Series, 
-    column_mapping: Dict[str, str], 
-    row_number: int,
-    create_departments: bool,
-    cursor
-) -> Dict[str, Any]:
-    """
-    Process a single employee row and validate data
-    
-    Returns:
-        Dict with keys: data (employee data dict), error (error message or None)
-    """
+def _import_setting(name: str, value: Optional[int]) -> int:
+    """Explicit argument, else the app config, else DEFAULT_CONFIG."""
+    if value is not None:
+        return value
     try:
-        # Extract basic data
-        name = safe_extract_value(row, column_mapping.get('name', ''), '').strip()
-        if not name:
-            return {'error': 'الاسم مطلوب', 'data': None}
-        
-        # Validate national ID
-        national_id_raw = safe_extract_value(row, column_mapping.get('national_id', ''), '')
-        is_valid, national_id = validate_national_id(national_id_raw)
-        if not is_valid:
-            return {'error': f'الرقم الوطني غير صالح: {national_id_raw}', 'data': None}
-        
-        # Extract other fields
-        serial_number = str(safe_extract_value(row, column_mapping.get('serial_number', ''), '')).strip()
-        job_grade = str(safe_extract_value(row, column_mapping.get('job_grade', ''), '')).strip()
-        
-        # Process dates
-        hiring_date = normalize_date(safe_extract_value(row, column_mapping.get('hiring_date', ''), ''))
-        grade_date = normalize_date(safe_extract_value(row, column_mapping.get('grade_date', ''), ''))
-        
-        # Process numeric fields
-        bonus = safe_int(safe_extract_value(row, column_mapping.get('bonus', ''), 0))
-        vacation_balance = safe_float(
-            safe_extract_value(row, column_mapping.get('vacation_balance', ''), 
-                             DEFAULT_CONFIG['DEFAULT_VACATION_BALANCE'])
-        )
-        
-        # Process work pattern
-        work_pattern = str(safe_extract_value(row, column_mapping.get('work_days', ''), '')).strip()
-        
-        # Handle department
-        department_id = None
-        department_name = str(safe_extract_value(row, column_mapping.get('department', ''), '')).strip()
-        if department_name:
-            if create_departments:
-                department_id = get_or_create_department(department_name)
-            else:
-                # Find existing department
-                cursor.execute("SELECT id FROM departments WHERE name = ?", (department_name,))
-                dept_row = cursor.fetchone()
-                if dept_row:
-                    department_id = dept_row["id"]
-                else:
-                    return {'error': f'القسم غير موجود: {department_name}', 'data': None}
-        
-        # Build employee data
-        employee_data = {
-            'serial_number': serial_number,
-            'name': name,
-            'national_id': national_id,
-            'department_id': department_id,
-            'job_grade': job_grade,
-            'hiring_date': hiring_date,
-            'grade_date': grade_date,
-            'bonus': bonus,
-            'vacation_balance': vacation_balance,
-            'work_days': work_pattern  # Note: using work_days to match database schema
-        }
-        
-        return {'error': None, 'data': employee_data}
-        
-    except Exception as e:
-        return {'error': f'خطأ في معالجة البيانات: {str(e)}', 'data': None}
-
-
-def _update_existing_employee(existing_employee, new_data: Dict[str, Any], cursor):
+        return current_app.config.get(name, DEFAULT_CONFIG[name])
+    except RuntimeError:
+        return DEFAULT_CONFIG[name]
+
+
+def _row_hash(data: Dict[str, Any]) -> str:
+    """Fingerprint of the normalized imported fields of one row."""
+    text = "\x1f".join("" if data[field] is None else str(data[field]) for field in ROW_HASH_FIELDS)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _lookup_existing(cur, rows):
     """
-    Update existing employee with new data
-    
-    Note: Always allow updating vacation_balance per user instruction
+    (vacation_balance, row_hash) by national_id and owner by serial number,
+    for the keys in ``rows`` only. Earlier chunks are already written in the
+    transaction.
     """
-    # Prepare update data, preserving initial_vacation_balance if it exists
-    update_data = new_data.copy()
-    
-    # Handle initial_vacation_balance logic
-    if existing_employee['initial_vacation_balance'] is None:
-        # First time setting initial vacation balance
-        update_data['initial_vacation_balance'] = new_data['vacation_balance']
-    
-    cursor.execute("""
-        UPDATE employees 
-        SET serial_number=?, name=?, national_id=?, department_id=?, job_grade=?, 
-            hiring_date=?, grade_date=?, bonus=?, vacation_balance=?, work_days=?,
-            initial_vacation_balance=COALESCE(?, initial_vacation_balance),
-            updated_at=CURRENT_TIMESTAMP
-        WHERE id=?
-    """, (
-        update_data['serial_number'],
-        update_data['name'],
-        update_data['national_id'],
-        update_data['department_id'],
-        update_data['job_grade'],
-        update_data['hiring_date'],
-        update_data['grade_date'],
-        update_data['bonus'],
-        update_data['vacation_balance'],
-        update_data['work_days'],
-        update_data.get('initial_vacation_balance'),
-        existing_employee['id']
-    ))
-
-
-def _insert_new_employee(employee_data: Dict[str, Any], cursor):
+    national_ids = list({data['national_id'] for _, data in rows})
+    serials = list({data['serial_number'] for _, data in rows if data['serial_number']})
+
+    employees = {}
+    for part in _slices(national_ids):
+        cur.execute(f"""SELECT national_id, vacation_balance, row_hash FROM employees
+                        WHERE national_id IN ({','.join('?' * len(part))})""", part)
+        employees.update((row["national_id"], (row["vacation_balance"], row["row_hash"]))
+                         for row in cur.fetchall())
+
+    serial_owners = {}
+    for part in _slices(serials):
+        cur.execute(f"""SELECT serial_number, national_id FROM employees
+                        WHERE serial_number IN ({','.join('?' * len(part))})""", part)
+        serial_owners.update((row["serial_number"], row["national_id"]) for row in cur.fetchall())
+    return employees, serial_owners
+
+
+def _slices(values, size: int = 500):
+    """Keep IN (...) lists well under SQLite's bound-parameter limit."""
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _resolve_departments(cur, valid_rows, departments, create_departments):
+    """Create missing departments in one statement; returns (rows, errors)."""
+    errors = []
+    missing = sorted({data['department'] for _, data in valid_rows
+                      if data['department'] and data['department'] not in departments})
+
+    if missing and create_departments:
+        cur.executemany("INSERT OR IGNORE INTO departments (name) VALUES (?)", [(name,) for name in missing])
+        placeholders = ",".join("?" * len(missing))
+        cur.execute(f"SELECT id, name FROM departments WHERE name IN ({placeholders})", missing)
+        departments.update({row["name"]: row["id"] for row in cur.fetchall()})
+
+    resolved = []
+    for row_number, data in valid_rows:
+        name = data['department']
+        if name:
+            if name in departments:
+                data['department_id'] = departments[name]
+            elif not create_departments:
+                errors.append({'row': row_number, 'reason': f'القسم غير موجود: {name}'})
+                continue
+        resolved.append((row_number, data))
+    return resolved, errors
+
+
+def _bulk_upsert(cur, departments, valid_rows, create_departments: bool, diff: bool = False) -> Dict[str, Any]:
     """
-    Insert new employee record
+    Classify one chunk against the existing rows and write it with executemany.
+    In diff mode rows whose row_hash is unchanged are not written at all.
     """
-    # Set initial_vacation_balance to vacation_balance for new employees
-    employee_data['initial_vacation_balance'] = employee_data['vacation_balance']
-    
-    cursor.execute("""
-        INSERT INTO employees (serial_number, name, national_id, department_id, job_grade, 
-                             hiring_date, grade_date, bonus, vacation_balance, initial_vacation_balance, work_days)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, (
-        employee_data['serial_number'],
-        employee_data['name'],
-        employee_data['national_id'],
-        employee_data['department_id'],
-        employee_data['job_grade'],
-        employee_data['hiring_date'],
-        employee_data['grade_date'],
-        employee_data['bonus'],
-        employee_data['vacation_balance'],
-        employee_data['initial_vacation_balance'],
-        employee_data['work_days']
-    ))
\ No newline at end of file
+    rows, errors = _resolve_departments(cur, valid_rows, departments, create_departments)
+    employees, serial_owners = _lookup_existing(cur, rows)
+
+    batch = []
+    unchanged = 0
+    for row_number, data in rows:
+        national_id = data['national_id']
+        serial = data['serial_number']
+        if serial and serial_owners.get(serial, national_id) != national_id:
+            errors.append({'row': row_number, 'reason': f'الرقم الآلي مستخدم لموظف آخر: {serial}'})
+            continue
+
+        data['row_hash'] = _row_hash(data)
+        if national_id in employees:
+            balance, row_hash = employees[national_id]
+            if diff and row_hash == data['row_hash']:
+                unchanged += 1
+                continue
+            adjustment = (national_id, balance, data['vacation_balance'])
+        else:
+            adjustment = None
+        # صفوف مكررة داخل الملف نفسه تُعامل كتحديث للصف السابق
+        employees[national_id] = (data['vacation_balance'], data['row_hash'])
+        if serial:
+            serial_owners[serial] = national_id
+        batch.append((row_number, data, adjustment))
+
+    inserted = updated = 0
+    adjustments = []
+    # savepoint لكل دفعة صغيرة: savepoint واحد فوق آلاف الصفوف أبطأ بعشرات المرات
+    for start in range(0, len(batch), UPSERT_CHUNK_SIZE):
+        chunk = batch[start:start + UPSERT_CHUNK_SIZE]
+        try:
+            cur.execute("SAVEPOINT bulk_upsert")
+            cur.executemany(UPSERT_EMPLOYEE_SQL, [data for _, data, _ in chunk])
+            cur.execute("RELEASE bulk_upsert")
+        except sqlite3.IntegrityError:
+            # تعارض لم يُكشف مسبقاً (مثل تبادل أرقام آلية): نعيد الدفعة صفاً صفاً
+            cur.execute("ROLLBACK TO bulk_upsert")
+            cur.execute("RELEASE bulk_upsert")
+            result = _upsert_rows_individually(cur, [(n, data) for n, data, _ in chunk], errors)
+            inserted += result['inserted']
+            updated += result['updated']
+            continue
+
+        chunk_adjustments = [adjustment for _, _, adjustment in chunk if adjustment]
+        adjustments.extend(chunk_adjustments)
+        updated += len(chunk_adjustments)
+        inserted += len(chunk) - len(chunk_adjustments)
+
+    _record_adjustments(cur, adjustments)
+    return {'inserted': inserted, 'updated': updated, 'unchanged': unchanged, 'errors': errors}
+
+
+def _upsert_rows_individually(cur, batch, errors) -> Dict[str, Any]:
+    """Fallback: per-row upsert under savepoints so one bad row does not abort the import."""
+    inserted = updated = 0
+    for row_number, data in batch:
+        cur.execute("SELECT id, vacation_balance FROM employees WHERE national_id = ?", (data['national_id'],))
+        existing = cur.fetchone()
+        try:
+            cur.execute("SAVEPOINT import_row")
+            cur.execute(UPSERT_EMPLOYEE_SQL, data)
+            cur.execute("RELEASE import_row")
+        except sqlite3.Error as e:
+            cur.execute("ROLLBACK TO import_row")
+            cur.execute("RELEASE import_row")
+            errors.append({'row': row_number, 'reason': f"خطأ في معالجة الصف: {str(e)}"})
+            continue
+        if existing:
+            updated += 1
+            _record_adjustments(cur, [(data['national_id'], existing['vacation_balance'], data['vacation_balance'])])
+        else:
+            inserted += 1
+    return {'inserted': inserted, 'updated': updated, 'errors': errors}
+
+
+def _record_adjustments(cur, adjustments: List[tuple]):
+    """Ledger entries for balances changed by the import (inserts get opening entries by trigger)."""
+    entries = [(new - (old or 0), national_id) for national_id, old, new in adjustments
+               if new - (old or 0) != 0]
+    if entries:
+        cur.executemany("""
+            INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference)
+            SELECT id, 'annual', 'adjustment', ?, 'import' FROM employees WHERE national_id = ?
+        """, entries)
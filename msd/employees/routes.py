@@ -6,8 +6,11 @@ Employees routes blueprint
 from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
 from flask_login import login_required, current_user
 
-from .service import get_all_employees, get_departments, create_employee
-from .import_service import import_employees_from_excel
+from .service import get_departments, create_employee, list_employees_page
+from .search_service import search_employees, DEFAULT_SEARCH_LIMIT
+from .import_jobs import create_import_job, commit_import_job, get_import_job
+from ..database.pagination import page_limit
+from ..dashboard.service import dashboard_stats
 
 
 employees_bp = Blueprint("employees", __name__, url_prefix="")
@@ -31,14 +34,54 @@ def require_manager(f):
     return decorated_function
 
 
+def scoped_department_id():
+    """Department filter for list/report endpoints: only managers choose; everyone else sees their own."""
+    if getattr(current_user, "role", None) == "manager":
+        return request.args.get('department', type=int)
+    # كما في vacations_list القديمة: غير المدير مقيد بقسمه (-1 = لا شيء إن لم يكن له قسم)
+    return getattr(current_user, "dept_id", None) or -1
+
+
 @employees_bp.route("/employees")
 @login_required
 @require_manager
 def employees_list():
-    """GET /employees: manager-only, fetch all employees joined with departments"""
-    employees = get_all_employees()
+    """GET /employees: manager-only page; rows are loaded page by page from /api/employees"""
     departments = get_departments()
-    return render_template("employees.html", employees=employees, departments=departments)
+    return render_template("employees.html", departments=departments,
+                           total_employees=dashboard_stats()['total_employees'])
+
+
+@employees_bp.route("/api/employees")
+@login_required
+@require_manager
+def employees_page():
+    """GET /api/employees: keyset page of employees, filtered by department, status and text"""
+    try:
+        page = list_employees_page(
+            cursor=request.args.get('cursor'),
+            limit=page_limit(request.args.get('limit')),
+            department_id=request.args.get('department', type=int),
+            status=request.args.get('status') or None,
+            q=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, **page})
+
+
+@employees_bp.route("/employees/search")
+@login_required
+@require_manager
+def employees_search():
+    """GET /employees/search?q=...: manager-only ranked prefix search (Arabic-folded) over name, serial, national id and grade"""
+    try:
+        limit = page_limit(request.args.get('limit'), default=DEFAULT_SEARCH_LIMIT)
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    results = search_employees(request.args.get('q'), limit=limit,
+                               department_id=request.args.get('department', type=int))
+    return jsonify({"success": True, "results": results})
 
 
 @employees_bp.route("/employees/add", methods=["POST"])
@@ -82,14 +125,9 @@ def add_employee():
 @require_manager
 def import_employees():
     """POST /import/employees: Enhanced Excel import with dry-run support"""
-    if 'file' not in request.files:
-        if request.is_json:
-            return jsonify({"success": False, "message": "لم يتم اختيار ملف"}), 400
-        flash("لم يتم اختيار ملف", "danger")
-        return redirect(url_for("employees.employees_list"))
-    
-    file = request.files['file']
-    if file.filename == '':
+    # ملف واحد أو عدة ملفات (Excel / CSV / Parquet)
+    files = [file for file in request.files.getlist('file') if file.filename]
+    if not files:
         if request.is_json:
             return jsonify({"success": False, "message": "لم يتم اختيار ملف"}), 400
         flash("لم يتم اختيار ملف", "danger")
@@ -98,31 +136,76 @@ def import_employees():
     # Check for dry run
     dry_run = request.args.get('dry_run') == '1' or request.form.get('dry_run') == '1'
     create_departments = request.args.get('create_departments', 'true').lower() == 'true'
+    # diff=1: تخطي الصفوف التي لم تتغير منذ آخر استيراد
+    diff = request.args.get('diff') == '1' or request.form.get('diff') == '1'
+    # sheet_departments=1: كل ورقة في المصنف قسم (اسم الورقة)؛ وإلا الورقة الأولى فقط
+    sheet_departments = (request.args.get('sheet_departments') == '1'
+                         or request.form.get('sheet_departments') == '1')
     
     try:
-        # Import employees from Excel
-        result = import_employees_from_excel(
-            file.stream, 
+        # الاستيراد يعمل في الخلفية؛ التقدم عبر GET /import/jobs/<id>
+        job_id = create_import_job(
+            files,
             dry_run=dry_run,
-            create_departments=create_departments
+            create_departments=create_departments,
+            user_id=current_user.id,
+            diff=diff,
+            sheet_departments=sheet_departments
         )
-        
+
         if request.is_json:
             return jsonify({
                 "success": True,
                 "dry_run": dry_run,
-                **result
-            })
+                "diff": diff,
+                "sheet_departments": sheet_departments,
+                "job_id": job_id,
+                "status_url": url_for("employees.import_job_status", job_id=job_id)
+            }), 202
         else:
             if dry_run:
-                flash(f"معاينة الاستيراد: {result['inserted']} موظف جديد، {result['updated']} موظف محدث، {len(result['errors'])} خطأ", "info")
+                flash(f"بدأت معاينة الاستيراد في الخلفية (رقم المهمة: {job_id})", "info")
             else:
-                flash(f"تم استيراد {result['inserted']} موظف جديد وتحديث {result['updated']} موظف. عدد الأخطاء: {len(result['errors'])}", "success")
-            
+                flash(f"بدأ الاستيراد في الخلفية (رقم المهمة: {job_id})", "success")
+
             return redirect(url_for("employees.employees_list"))
-            
+
+    except ValueError as e:
+        if request.is_json:
+            return jsonify({"success": False, "message": str(e)}), 400
+        flash(str(e), "danger")
+        return redirect(url_for("employees.employees_list"))
     except Exception as e:
         if request.is_json:
             return jsonify({"success": False, "message": f"خطأ في الاستيراد: {str(e)}"}), 500
         flash(f"خطأ في الاستيراد: {str(e)}", "danger")
-        return redirect(url_for("employees.employees_list"))
\ No newline at end of file
+        return redirect(url_for("employees.employees_list"))
+
+
+@employees_bp.route("/import/jobs/<job_id>")
+@login_required
+@require_manager
+def import_job_status(job_id):
+    """GET /import/jobs/<id>: state, row counters and errors of an import job"""
+    job = get_import_job(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "مهمة الاستيراد غير موجودة"}), 404
+    return jsonify({"success": True, "job": job})
+
+
+@employees_bp.route("/import/jobs/<job_id>/commit", methods=["POST"])
+@login_required
+@require_manager
+def commit_import(job_id):
+    """POST /import/jobs/<id>/commit: run the real import of a dry run from its parsed data"""
+    try:
+        new_job_id = commit_import_job(job_id, user_id=current_user.id)
+    except LookupError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 409
+    return jsonify({
+        "success": True,
+        "job_id": new_job_id,
+        "status_url": url_for("employees.import_job_status", job_id=new_job_id)
+    }), 202
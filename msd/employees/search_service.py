@@ -0,0 +1,61 @@
+# msd/employees/search_service.py
+"""
+Employee search over the ``employees_fts`` full-text index (migration 14).
+
+Indexed values are folded by triggers (alef/hamza forms, taa marbuta, yaa,
+diacritics); the query goes through the same fold with normalize_arabic, so
+"احمد" finds "أحمد" and "فاطمه" finds "فاطمة". Every word of the query is
+matched as a prefix and results are ranked with bm25.
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from ..database.connection import get_conn
+from ..utils.arabic import normalize_arabic
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# أوزان bm25 بترتيب أعمدة employees_fts: الاسم، الرقم الآلي، الرقم الوطني، الدرجة
+RANK_WEIGHTS = (10.0, 5.0, 5.0, 1.0)
+
+# ما يعدّه المقسّم unicode61 فاصلاً (غير الحروف والأرقام)
+_NON_TOKEN = re.compile(r'[^\w]+|_')
+
+
+def match_expression(text: Optional[str]) -> Optional[str]:
+    """FTS5 MATCH expression for free text (each word a prefix, all required); None if nothing to search."""
+    tokens = [token for token in _NON_TOKEN.split(normalize_arabic(text)) if token]
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_employees(q: Optional[str], limit: int = DEFAULT_SEARCH_LIMIT,
+                     department_id: Optional[int] = None) -> List[Dict]:
+    """Best matches for ``q`` by name, serial number, national id or grade, best first."""
+    expression = match_expression(q)
+    if expression is None:
+        return []
+    weights = ", ".join(str(weight) for weight in RANK_WEIGHTS)
+    query = """
+        SELECT e.id, e.name, e.serial_number, e.national_id, e.department_id, d.name as dept_name,
+               e.job_grade, e.status
+        FROM employees_fts
+        JOIN employees e ON e.id = employees_fts.rowid
+        LEFT JOIN departments d ON e.department_id = d.id
+        WHERE employees_fts MATCH ?
+    """
+    params = [expression]
+    if department_id is not None:
+        query += " AND e.department_id = ?"
+        params.append(department_id)
+    query += f" ORDER BY bm25(employees_fts, {weights}), e.name LIMIT ?"
+    params.append(max(1, min(limit, MAX_SEARCH_LIMIT)))
+
+    conn = get_conn()
+    try:
+        return [dict(row) for row in conn.execute(query, params).fetchall()]
+    finally:
+        conn.close()
@@ -4,10 +4,16 @@ Employee service layer for database operations
 """
 
 from ..database.connection import get_conn
+from ..database.result_cache import cached_query
+from ..database.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from ..database.report_filters import ReportFilter
+from .search_service import match_expression
+from ..vacations.ledger_service import record_balance_change
 
 
+@cached_query("employees", "departments")
 def get_all_employees():
-    """Get all employees joined with departments"""
+    """Get all employees joined with departments (cached; do not modify the result)"""
     conn = get_conn()
     cur = conn.cursor()
     
@@ -22,8 +28,34 @@ def get_all_employees():
     return employees
 
 
+PAGE_QUERY = """
+    SELECT e.id, e.name, e.serial_number, e.national_id, e.department_id, d.name as dept_name,
+           e.job_grade, e.hiring_date, e.bonus, e.vacation_balance, e.status
+    FROM employees e
+    LEFT JOIN departments d ON e.department_id = d.id
+    WHERE 1=1
+"""
+PAGE_KEYS = ("e.name", "e.id")
+
+
+def list_employees_page(cursor=None, limit=DEFAULT_PAGE_SIZE, department_id=None, status=None, q=None):
+    """One page of employees ordered by (name, id); see msd.database.pagination"""
+    filters = (ReportFilter()
+               .equals("e.department_id", department_id)
+               .equals("e.status", status)
+               .matching("e.id", "employees_fts", match_expression(q)))
+
+    conn = get_conn()
+    try:
+        return keyset_page(conn.cursor(), PAGE_QUERY + filters.sql(), filters.params, PAGE_KEYS,
+                           cursor=cursor, limit=limit)
+    finally:
+        conn.close()
+
+
+@cached_query("departments")
 def get_departments():
-    """Get all departments"""
+    """Get all departments (cached; do not modify the result)"""
     conn = get_conn()
     cur = conn.cursor()
     cur.execute("SELECT id, name FROM departments ORDER BY name")
@@ -92,6 +124,9 @@ def update_employee(employee_id, employee_data):
     cur = conn.cursor()
     
     try:
+        cur.execute("SELECT vacation_balance FROM employees WHERE id = ?", (employee_id,))
+        existing = cur.fetchone()
+
         cur.execute("""
             UPDATE employees 
             SET serial_number=?, name=?, national_id=?, department_id=?, job_grade=?, 
@@ -111,6 +146,9 @@ def update_employee(employee_id, employee_data):
             employee_data.get('work_days'),
             employee_id
         ))
+        if existing:
+            record_balance_change(cur, employee_id, 'annual', existing['vacation_balance'],
+                                  employee_data.get('vacation_balance', 30), reference='manual')
         
         conn.commit()
         conn.close()
@@ -0,0 +1 @@
+# Scheduler package
@@ -0,0 +1,21 @@
+"""Scheduler status routes."""
+from flask import Blueprint, jsonify, current_app
+from flask_login import login_required
+
+from ..employees.routes import require_manager
+
+scheduler_bp = Blueprint("scheduler", __name__)
+
+
+@scheduler_bp.route("/scheduler/status")
+@login_required
+@require_manager
+def scheduler_status():
+    """GET /scheduler/status: manager-only, last run/duration of background jobs"""
+    scheduler = current_app.extensions.get("msd_scheduler")
+    if scheduler is None:
+        return jsonify({"enabled": False, "jobs": []})
+    return jsonify({
+        "enabled": scheduler._thread is not None and scheduler._thread.is_alive(),
+        "jobs": scheduler.status()
+    })
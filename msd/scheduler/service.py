@@ -0,0 +1,248 @@
+"""
+In-process background scheduler for periodic maintenance jobs.
+
+Jobs run on a daemon thread off the request path. Before running, a job
+takes a time-limited lease row in ``scheduler_jobs`` so that with several
+worker processes only one of them executes it per interval; the same row
+records the next due time and the last status, result and duration.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import atexit
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple
+
+from msd.database.connection import get_conn
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_SECONDS = 60
+DEFAULT_LEASE_SECONDS = 600
+
+
+class Job(NamedTuple):
+    name: str
+    interval_seconds: int
+    run: Callable
+
+
+JOBS: List[Job] = []
+
+
+def register_job(name: str, interval_seconds: int):
+    """Register a periodic job; the function's return value is stored as its result."""
+    def decorator(fn):
+        JOBS.append(Job(name, interval_seconds, fn))
+        return fn
+    return decorator
+
+
+# ---------------------------------------------------------------------------
+# Jobs
+# ---------------------------------------------------------------------------
+
+@register_job("monthly_accrual", interval_seconds=3600)
+def monthly_accrual_job():
+    """Run the accrual for every month missed since the last logged run."""
+    from msd.vacations.accrual_service import pending_accrual_periods, run_monthly_accrual
+
+    conn = get_conn()
+    try:
+        periods = pending_accrual_periods(conn.cursor())
+    finally:
+        conn.close()
+
+    processed = {}
+    for year, month in periods:
+        processed[f"{year}-{month:02d}"] = run_monthly_accrual(year, month)
+    return {"periods": processed}
+
+
+@register_job("emergency_reset", interval_seconds=3600)
+def emergency_reset_job():
+    """Reset emergency balances on January 1st, or catch up a missed reset."""
+    from msd.vacations.emergency_reset_service import is_reset_due, run_emergency_reset
+
+    conn = get_conn()
+    try:
+        due = is_reset_due(conn.cursor())
+    finally:
+        conn.close()
+
+    if not due:
+        return {"reset": 0}
+    return {"reset": run_emergency_reset(datetime.now().year)}
+
+
+@register_job("balance_snapshot", interval_seconds=3600)
+def balance_snapshot_job():
+    """Write month-end balance snapshots for every completed month without one."""
+    from msd.vacations.ledger_service import pending_snapshot_periods, take_monthly_snapshot
+
+    conn = get_conn()
+    try:
+        periods = pending_snapshot_periods(conn.cursor())
+    finally:
+        conn.close()
+
+    written = {}
+    for year, month in periods:
+        written[f"{year}-{month:02d}"] = take_monthly_snapshot(year, month)
+    return {"periods": written}
+
+
+@register_job("import_cleanup", interval_seconds=900)
+def import_cleanup_job():
+    """Remove expired dry-run import caches and fail abandoned import jobs."""
+    from msd.employees.import_jobs import cleanup_import_jobs
+    return cleanup_import_jobs()
+
+
+@register_job("export_cleanup", interval_seconds=900)
+def export_cleanup_job():
+    """Remove report files left in the export temp area past their TTL."""
+    from msd.utils.export import cleanup_exports
+    return cleanup_exports()
+
+
+# ---------------------------------------------------------------------------
+# Scheduler
+# ---------------------------------------------------------------------------
+
+class Scheduler:
+    """Polls the registered jobs and runs the due ones under a DB lease."""
+
+    def __init__(self, app, jobs: List[Job] = None):
+        self.app = app
+        self.jobs = list(JOBS if jobs is None else jobs)
+        self.poll_seconds = int(app.config.get("SCHEDULER_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+        self.lease_seconds = int(app.config.get("SCHEDULER_LEASE_SECONDS", DEFAULT_LEASE_SECONDS))
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="msd-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Scheduler started ({self.owner})")
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception:
+                logger.exception("Scheduler iteration failed")
+            self._stop.wait(self.poll_seconds)
+
+    def run_pending(self):
+        """Run every job that is due and not leased elsewhere; returns the names that ran."""
+        ran = []
+        for job in self.jobs:
+            with self.app.app_context():
+                if self._run_job(job):
+                    ran.append(job.name)
+        return ran
+
+    def _acquire_lease(self, name: str) -> bool:
+        """Take the job's lease if it is due and no live lease is held by another process."""
+        now = time.time()
+        conn = get_conn()
+        try:
+            conn.execute("INSERT OR IGNORE INTO scheduler_jobs (name) VALUES (?)", (name,))
+            cur = conn.execute("""
+                UPDATE scheduler_jobs
+                SET lease_owner = ?, lease_expires_at = ?, last_status = 'running',
+                    last_started_at = ?
+                WHERE name = ? AND (next_run_at IS NULL OR next_run_at <= ?)
+                  AND (lease_owner IS NULL OR lease_expires_at < ? OR lease_owner = ?)
+            """, (self.owner, now + self.lease_seconds, _timestamp(), name, now, now, self.owner))
+            conn.commit()
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def _finish(self, job: Job, status: str, duration_ms: int, result=None, error=None):
+        conn = get_conn()
+        try:
+            conn.execute("""
+                UPDATE scheduler_jobs
+                SET lease_owner = NULL, lease_expires_at = NULL, next_run_at = ?,
+                    last_status = ?, last_finished_at = ?, last_duration_ms = ?,
+                    last_result = ?, last_error = ?, run_count = run_count + 1
+                WHERE name = ? AND lease_owner = ?
+            """, (time.time() + job.interval_seconds, status, _timestamp(), duration_ms,
+                  json.dumps(result, ensure_ascii=False) if result is not None else None,
+                  error, job.name, self.owner))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _run_job(self, job: Job) -> bool:
+        if not self._acquire_lease(job.name):
+            logger.debug(f"Job {job.name} is not due or is leased by another process")
+            return False
+
+        started = time.perf_counter()
+        try:
+            result = job.run()
+        except Exception as e:
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            logger.exception(f"Scheduled job {job.name} failed")
+            self._finish(job, "error", duration_ms, error=str(e))
+            return True
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        self._finish(job, "ok", duration_ms, result=result)
+        logger.info(f"Scheduled job {job.name} finished in {duration_ms} ms")
+        return True
+
+    def status(self) -> List[Dict]:
+        """Job status as recorded in the shared scheduler_jobs table."""
+        conn = get_conn()
+        try:
+            rows = {row["name"]: dict(row) for row in conn.execute("SELECT * FROM scheduler_jobs")}
+        finally:
+            conn.close()
+
+        jobs = []
+        for job in self.jobs:
+            row = rows.get(job.name, {"name": job.name})
+            if row.get("last_result"):
+                row["last_result"] = json.loads(row["last_result"])
+            if row.get("next_run_at"):
+                row["next_run_at"] = datetime.fromtimestamp(row["next_run_at"]).isoformat(sep=" ", timespec="seconds")
+            row["interval_seconds"] = job.interval_seconds
+            jobs.append(row)
+        return jobs
+
+
+def _timestamp() -> str:
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def init_scheduler(app) -> Scheduler:
+    """Create the app's scheduler and start it unless SCHEDULER_ENABLED is off."""
+    scheduler = Scheduler(app)
+    app.extensions["msd_scheduler"] = scheduler
+    # عمليات التحليل الفرعية (spawn) تعيد استيراد app.py؛ لا مجدول فيها
+    if multiprocessing.parent_process() is not None:
+        return scheduler
+    if app.config.get("SCHEDULER_ENABLED", True) and not app.config.get("TESTING"):
+        scheduler.start()
+        atexit.register(scheduler.stop)
+    return scheduler
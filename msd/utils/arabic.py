@@ -0,0 +1,51 @@
+"""Arabic text normalization for matching (headers, search)."""
+import re
+import unicodedata
+
+# التشكيل وعلامات القرآن والتطويل تُحذف
+_DIACRITIC_RANGES = [(0x0610, 0x061a), (0x064b, 0x065f), (0x0670, 0x0670), (0x06d6, 0x06ed), (0x0640, 0x0640)]
+_SEPARATOR_RANGES = [(0x200c, 0x200f), (0x061c, 0x061c)]
+
+_DIACRITICS = re.compile('[' + ''.join(f'\\u{lo:04x}-\\u{hi:04x}' for lo, hi in _DIACRITIC_RANGES) + ']')
+_SEPARATORS = re.compile(r'[\s_\-' + ''.join(f'\\u{lo:04x}-\\u{hi:04x}' for lo, hi in _SEPARATOR_RANGES) + ']+')
+
+_FOLD_MAP = {
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي', 'ؤ': 'و', 'ة': 'ه',
+    'ک': 'ك', 'ی': 'ي',
+}
+_FOLD = str.maketrans(_FOLD_MAP)
+
+# الحركات (فتحتان..سكون) والألف الخنجرية والتطويل؛ المجموعة التي يطبقها arabic_fold_sql
+_SQL_DIACRITICS = list(range(0x064b, 0x0653)) + [0x0670, 0x0640]
+
+
+def normalize_arabic(text) -> str:
+    """
+    Fold a string to a comparison key.
+
+    Drops diacritics and tatweel, unifies alef/hamza, yaa and taa marbuta
+    variants, treats runs of whitespace, '_' and '-' as one space and
+    lower-cases Latin letters. Not meant for display.
+    """
+    if text is None:
+        return ''
+    text = unicodedata.normalize('NFKC', str(text))
+    text = _DIACRITICS.sub('', text).translate(_FOLD)
+    return _SEPARATORS.sub(' ', text).strip().casefold()
+
+
+def arabic_fold_sql(expr: str) -> str:
+    """
+    SQL expression applying the Arabic part of normalize_arabic() to ``expr``.
+
+    Plain nested replace() calls, so it can run inside triggers on any
+    connection (no Python function has to be registered). SQLite's parser
+    stack allows only ~20 levels, so just the common harakat, superscript
+    alef and tatweel are dropped; the FTS5 tokenizer already splits on the
+    rarer marks, and handles case folding and punctuation.
+    """
+    pairs = [(code, '') for code in _SQL_DIACRITICS] + [(ord(src), dst) for src, dst in _FOLD_MAP.items()]
+    for code, replacement in pairs:
+        expr = f"replace({expr}, char({code}), '{replacement}')"
+    return expr
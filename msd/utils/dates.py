@@ -41,4 +41,38 @@ def is_valid_date_range(start_date_str, end_date_str):
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
         return start_date <= end_date
     except ValueError:
-        return False
\ No newline at end of file
+        return False
+
+def month_range(month_str):
+    """
+    Half-open date range covering a month.
+    
+    Args:
+        month_str: Month in YYYY-MM format
+        
+    Returns:
+        tuple: (first day, first day of next month) as YYYY-MM-DD strings
+    """
+    try:
+        first = datetime.strptime(month_str, "%Y-%m").date()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid month format. Expected YYYY-MM: {month_str}")
+    following = date(first.year + 1, 1, 1) if first.month == 12 else date(first.year, first.month + 1, 1)
+    return first.isoformat(), following.isoformat()
+
+
+def year_range(year):
+    """
+    Half-open date range covering a year.
+    
+    Args:
+        year: Year as int or string
+        
+    Returns:
+        tuple: (January 1st, January 1st of next year) as YYYY-MM-DD strings
+    """
+    try:
+        year = int(year)
+        return date(year, 1, 1).isoformat(), date(year + 1, 1, 1).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid year: {year}")
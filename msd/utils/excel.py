@@ -3,8 +3,15 @@
 Excel utilities for column normalization and data extraction
 """
 
+import logging
 import pandas as pd
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from openpyxl import load_workbook
+from typing import Dict, Any, BinaryIO, Iterable, Iterator, List, Optional, Tuple
+
+from .arabic import normalize_arabic
+
+logger = logging.getLogger(__name__)
 
 
 # Arabic to English column mapping
@@ -36,28 +43,155 @@ ARABIC_COLUMN_MAP = {
 }
 
 
-def normalize_column_names(df: pd.DataFrame) -> Dict[str, str]:
+# أسماء بديلة من صيغة الاستيراد القديمة (app_original.import_employees)
+LEGACY_COLUMN_ALIASES = {
+    'serial_number': ['رقم'],
+    'name': ['اسم'],
+    'national_id': ['رقم وطني'],
+    'hiring_date': ['تعيين'],
+    'job_grade': ['grade'],
+    'bonus': ['مكافأة'],
+    'grade_date': ['ترقية'],
+    'vacation_balance': ['إجازات'],
+    'department': ['dept'],
+    'work_days': ['أيام'],
+}
+
+
+class HeaderResolver:
+    """
+    Maps file headers to field names through a prebuilt index of folded names.
+
+    Every known name (ARABIC_COLUMN_MAP keys, field names and aliases) is
+    folded with normalize_arabic() once; a header then costs one fold and
+    one dict lookup. Results are cached per distinct header tuple.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, Iterable[str]]] = None):
+        self.index: Dict[str, str] = {}
+        for name, field in ARABIC_COLUMN_MAP.items():
+            self.index.setdefault(normalize_arabic(name), field)
+            self.index.setdefault(normalize_arabic(field), field)
+        for source in (LEGACY_COLUMN_ALIASES, aliases or {}):
+            for field, names in source.items():
+                for name in names:
+                    self.index.setdefault(normalize_arabic(name), field)
+        self._resolve = lru_cache(maxsize=256)(self._build_mapping)
+
+    def resolve(self, headers: Iterable[Any]) -> Dict[str, str]:
+        """Mapping of field name to the original header; the first match wins."""
+        return dict(self._resolve(tuple(headers)))
+
+    def _build_mapping(self, headers: tuple) -> Dict[str, str]:
+        mapping = {}
+        for header in headers:
+            field = self.index.get(normalize_arabic(header))
+            if field and field not in mapping:
+                mapping[field] = header
+        return mapping
+
+
+@lru_cache(maxsize=8)
+def _resolver(aliases: tuple) -> HeaderResolver:
+    return HeaderResolver({field: names for field, names in aliases})
+
+
+def header_resolver(aliases: Optional[Dict[str, Iterable[str]]] = None) -> HeaderResolver:
+    """Shared resolver for the built-in and legacy names plus ``aliases`` (field -> names)."""
+    key = tuple(sorted(
+        (field, (names,) if isinstance(names, str) else tuple(names))
+        for field, names in (aliases or {}).items()
+    ))
+    return _resolver(key)
+
+
+def normalize_column_names(df: pd.DataFrame, aliases: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, str]:
     """
     Normalize column names from Arabic/English to standard English names
-    Returns a mapping of actual column names to normalized names
+    Returns a mapping of normalized names to the DataFrame's column labels
     """
-    actual_columns = {}
-    df_columns = [str(col).strip() for col in df.columns]
-    
-    for actual_col in df_columns:
-        # Try direct match first
-        if actual_col in ARABIC_COLUMN_MAP:
-            normalized = ARABIC_COLUMN_MAP[actual_col]
-            actual_columns[normalized] = actual_col
-            continue
-        
-        # Try case-insensitive match
-        for arabic_col, eng_col in ARABIC_COLUMN_MAP.items():
-            if actual_col.lower() == arabic_col.lower() or actual_col.lower() == eng_col.lower():
-                actual_columns[eng_col] = actual_col
-                break
-    
-    return actual_columns
+    return header_resolver(aliases).resolve(df.columns)
+
+
+def excel_sheet_previews(file_stream: BinaryIO) -> List[Tuple[str, list, bool]]:
+    """(title, header row, has data rows) of every worksheet, in workbook order."""
+    try:
+        workbook = load_workbook(file_stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"خطأ في قراءة ملف Excel: {str(e)}")
+    try:
+        previews = []
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(values_only=True)
+            header = ['' if cell is None else str(cell).strip() for cell in next(rows, None) or ()]
+            has_rows = any(any(cell is not None and cell != '' for cell in row) for row in rows)
+            previews.append((worksheet.title, header, has_rows))
+        return previews
+    finally:
+        workbook.close()
+
+
+def iter_excel_chunks(
+    file_stream: BinaryIO,
+    chunk_size: int = 1000,
+    max_rows: Optional[int] = None,
+    sheet: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a worksheet (default: the first) as DataFrames of at most ``chunk_size`` rows
+
+    The workbook is opened read-only, so only the current chunk is held in
+    memory. The header row gives the column names; blank rows are skipped
+    but keep their position in the index (index + 1 = data row number).
+    Raises ValueError once more than ``max_rows`` data rows have been read.
+    """
+    try:
+        workbook = load_workbook(file_stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"خطأ في قراءة ملف Excel: {str(e)}")
+
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = worksheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ['' if cell is None else str(cell).strip() for cell in header]
+        width = len(columns)
+
+        index, values, read = [], [], 0
+        for position, row in enumerate(rows):
+            row = row[:width]
+            if all(cell is None or cell == '' for cell in row):
+                continue
+            read += 1
+            if max_rows and read > max_rows:
+                raise ValueError(f"عدد الصفوف في الملف يتجاوز الحد المسموح ({max_rows})")
+            index.append(position)
+            values.append(row + (None,) * (width - len(row)))
+            if len(values) >= chunk_size:
+                yield pd.DataFrame(values, columns=columns, index=index)
+                index, values = [], []
+        if values:
+            yield pd.DataFrame(values, columns=columns, index=index)
+    finally:
+        workbook.close()
+
+
+def estimate_excel_rows(file_stream: BinaryIO, sheet: Optional[str] = None) -> Optional[int]:
+    """
+    Data rows declared by the worksheet's dimension, without reading the
+    cells. None when the writer did not record a dimension.
+    """
+    try:
+        workbook = load_workbook(file_stream, read_only=True, data_only=True)
+    except Exception:
+        return None
+    try:
+        max_row = (workbook[sheet] if sheet else workbook.worksheets[0]).max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
 
 
 def safe_extract_value(row: pd.Series, column: str, default: Any = '') -> Any:
@@ -166,4 +300,171 @@ def safe_float(value: Any, default: float = 0.0) -> float:
     try:
         return float(value)
     except (ValueError, TypeError):
-        return default
\ No newline at end of file
+        return default
+
+# ---------------------------------------------------------------------------
+# Column-wise (vectorized) equivalents of the helpers above.
+# Each validator returns (values, invalid_mask) aligned with the input index.
+# ---------------------------------------------------------------------------
+
+# DD/MM vs MM/DD: نفس ترتيب normalize_date (الشهر أولاً مع /)
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%d-%m-%Y')
+
+
+def empty_series(index, default: Any = '') -> pd.Series:
+    """Series standing in for a column that is not in the file."""
+    return pd.Series(default, index=index, dtype=object)
+
+
+def text_series(series: pd.Series, default: str = '') -> pd.Series:
+    """
+    Stripped text of every cell; missing cells become ``default``.
+    Whole floats (an integer column with blanks) lose their ``.0``.
+    """
+    missing = series.isna()
+    if pd.api.types.is_float_dtype(series):
+        whole = ~missing & (series == series.round())
+        text = series.astype(object).astype(str)
+        text[whole] = series[whole].astype('int64').astype(str)
+    else:
+        text = series.astype(object).where(~missing, '').astype(str)
+    return text.str.strip().where(~missing, default).astype(object)
+
+
+def validate_national_id_series(series: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Digits-only national IDs and a mask of the ones that are not 12 digits."""
+    digits = text_series(series).str.replace(r'\D', '', regex=True)
+    return digits, digits.str.len() != 12
+
+
+def normalize_date_series(series: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """YYYY-MM-DD strings ('' when empty) and a mask of unparseable dates."""
+    text = text_series(series).str.split(' ', n=1).str[0]
+    present = text != ''
+    parsed = pd.to_datetime(text.where(present), format=DATE_FORMATS[0], errors='coerce')
+    for fmt in DATE_FORMATS[1:]:
+        pending = present & parsed.isna()
+        if not pending.any():
+            break
+        parsed[pending] = pd.to_datetime(text[pending], format=fmt, errors='coerce')
+
+    normalized = parsed.dt.strftime('%Y-%m-%d').astype(object).where(parsed.notna(), '')
+    return normalized, present & parsed.isna()
+
+
+def _numeric_series(series: pd.Series, strip_pattern: Optional[str]) -> tuple[pd.Series, pd.Series]:
+    text = text_series(series)
+    values = pd.to_numeric(text.where(text != ''), errors='coerce')
+    if strip_pattern:
+        # "5 أيام" -> 5 كما في safe_int
+        retry = (text != '') & values.isna()
+        if retry.any():
+            values[retry] = pd.to_numeric(text[retry].str.replace(strip_pattern, '', regex=True),
+                                          errors='coerce')
+    return values, (text != '') & values.isna()
+
+
+def to_int_series(series: pd.Series, default: int = 0) -> tuple[pd.Series, pd.Series]:
+    """Integers (truncated, ``default`` when empty) and a mask of non-numeric cells."""
+    values, invalid = _numeric_series(series, r'[^\d\-]')
+    return values.fillna(default).astype('int64'), invalid
+
+
+def to_float_series(series: pd.Series, default: float = 0.0) -> tuple[pd.Series, pd.Series]:
+    """Floats (``default`` when empty) and a mask of non-numeric cells."""
+    values, invalid = _numeric_series(series, None)
+    return values.fillna(default).astype('float64'), invalid
+
+
+# ---------------------------------------------------------------------------
+# Employee rows: header mapping and validation of one chunk. Pure pandas, so
+# import workers use them without the app or the database.
+# ---------------------------------------------------------------------------
+
+REQUIRED_COLUMNS = ('name', 'national_id')
+DEFAULT_VACATION_BALANCE = 30.0
+
+
+def map_employee_columns(df: pd.DataFrame, aliases: Optional[Dict[str, Iterable[str]]] = None) -> Dict[str, str]:
+    """Map the file's headers to field names and check the required ones."""
+    column_mapping = normalize_column_names(df, aliases)
+
+    if not column_mapping:
+        raise ValueError("لم يتم العثور على أعمدة صالحة في الملف")
+
+    # Check required columns
+    missing_required = []
+    for required_col in REQUIRED_COLUMNS:
+        if required_col not in column_mapping:
+            missing_required.append(required_col)
+
+    if missing_required:
+        raise ValueError(f"أعمدة مطلوبة مفقودة: {', '.join(missing_required)}")
+
+    logger.info(f"الأعمدة المطابقة: {column_mapping}")
+    return column_mapping
+
+
+def has_employee_columns(headers: Iterable[Any], aliases: Optional[Dict[str, Iterable[str]]] = None) -> bool:
+    """True when the headers map every required column."""
+    mapping = header_resolver(aliases).resolve(headers)
+    return all(field in mapping for field in REQUIRED_COLUMNS)
+
+
+def validate_employee_frame(df: pd.DataFrame, column_mapping: Dict[str, str], default_department: Optional[str] = None):
+    """
+    Validate and normalize the whole frame column by column.
+
+    Returns (valid_rows, errors) where valid_rows is a list of
+    (row_number, employee_data) with 1-based row numbers.
+    """
+    def column(key):
+        name = column_mapping.get(key)
+        return df[name] if name in df.columns else empty_series(df.index, pd.NA)
+
+    name = text_series(column('name'))
+    department = text_series(column('department'))
+    if default_department:
+        department = department.where(department != '', default_department)
+    national_id, bad_national_id = validate_national_id_series(column('national_id'))
+    hiring_date, bad_hiring_date = normalize_date_series(column('hiring_date'))
+    grade_date, bad_grade_date = normalize_date_series(column('grade_date'))
+    bonus, bad_bonus = to_int_series(column('bonus'))
+    vacation_balance, bad_balance = to_float_series(
+        column('vacation_balance'), DEFAULT_VACATION_BALANCE)
+    serial_number = text_series(column('serial_number'))
+
+    # أول خطأ في كل صف حسب الأولوية (الاسم ثم الرقم الوطني ثم بقية الحقول)
+    checks = [
+        (name == '', 'الاسم مطلوب'),
+        (bad_national_id, 'الرقم الوطني غير صالح: ' + text_series(column('national_id'))),
+        (bad_hiring_date, 'تاريخ التعيين غير صالح: ' + text_series(column('hiring_date'))),
+        (bad_grade_date, 'تاريخ الدرجة غير صالح: ' + text_series(column('grade_date'))),
+        (bad_bonus, 'العلاوة غير صالحة: ' + text_series(column('bonus'))),
+        (bad_balance, 'رصيد الإجازات غير صالح: ' + text_series(column('vacation_balance'))),
+    ]
+    reason = empty_series(df.index, None)
+    for mask, message in reversed(checks):
+        reason = reason.mask(mask, message)
+
+    failed = reason.notna()
+    row_numbers = df.index + 1
+    errors = [{'row': int(row), 'reason': text}
+              for row, text in zip(row_numbers[failed], reason[failed])]
+
+    valid = pd.DataFrame({
+        # فارغ = NULL حتى لا يتعارض قيد UNIQUE بين موظفين بلا رقم آلي
+        'serial_number': serial_number.where(serial_number != '', None),
+        'name': name,
+        'national_id': national_id,
+        'department': department,
+        'department_id': None,
+        'job_grade': text_series(column('job_grade')),
+        'hiring_date': hiring_date,
+        'grade_date': grade_date,
+        'bonus': bonus,
+        'vacation_balance': vacation_balance,
+        'work_days': text_series(column('work_days')),  # stored in employees.work_pattern
+    })[~failed]
+    valid_rows = list(zip((int(row) for row in row_numbers[~failed]), valid.to_dict('records')))
+    return valid_rows, errors
@@ -0,0 +1,119 @@
+"""
+Streaming report export (CSV / XLSX) from database cursors.
+
+Rows are pulled from the cursor with fetchmany(), so a report never holds
+the full result set in memory. CSV is written straight into the response;
+XLSX goes through openpyxl's write-only mode into a file in the export
+temp area, which is streamed out and deleted once sent and swept by the export_cleanup job
+if a request dies half way.
+"""
+
+import os
+import io
+import csv
+import time
+import uuid
+import logging
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+from flask import current_app
+from openpyxl import Workbook
+
+logger = logging.getLogger(__name__)
+
+FETCH_SIZE = 500
+DEFAULT_EXPORT_TTL_SECONDS = 3600
+EXPORT_FORMATS = ('xlsx', 'csv')
+MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',  # Flask يضيف charset=utf-8 لأنواع text/*
+}
+
+
+def iter_cursor(cur, size: int = FETCH_SIZE) -> Iterator[tuple]:
+    """Yield the cursor's rows, fetching ``size`` at a time."""
+    while True:
+        rows = cur.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+
+def iter_csv(headers: Sequence[str], rows: Iterable[Sequence[Any]], batch: int = FETCH_SIZE) -> Iterator[bytes]:
+    """
+    Encode rows as CSV, one bytes block per ``batch`` rows.
+
+    Starts with a UTF-8 BOM so that Excel opens Arabic text correctly.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(headers)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % batch == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def write_xlsx(path: str, headers: Sequence[str], rows: Iterable[Sequence[Any]], title: str = None) -> int:
+    """Write rows to ``path`` with openpyxl's write-only workbook; returns the row count."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title)
+    sheet.sheet_view.rightToLeft = True
+    sheet.append(list(headers))
+    count = 0
+    for row in rows:
+        sheet.append(list(row))
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def iter_file_then_remove(path: str, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Stream a temp export file and delete it once sent (or the client goes away)."""
+    try:
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                yield block
+    finally:
+        remove_export(path)
+
+
+def export_temp_dir() -> str:
+    path = current_app.config.get("EXPORT_TEMP_DIR") or os.path.join(current_app.root_path, "exports")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def export_temp_path(suffix: str) -> str:
+    """A fresh file name in the export temp area."""
+    return os.path.join(export_temp_dir(), f"{uuid.uuid4().hex}.{suffix}")
+
+
+def remove_export(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        # ويندوز: قد يبقى الملف مفتوحاً؛ تحذفه مهمة التنظيف لاحقاً
+        logger.warning(f"Could not remove export file {path}: {e}")
+
+
+def cleanup_exports() -> Dict[str, int]:
+    """Delete export temp files older than EXPORT_TTL_SECONDS."""
+    ttl = int(current_app.config.get("EXPORT_TTL_SECONDS", DEFAULT_EXPORT_TTL_SECONDS))
+    directory = export_temp_dir()
+    expired_before = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.stat().st_mtime < expired_before:
+            remove_export(entry.path)
+            removed += 1
+    return {"expired_files": removed}
@@ -0,0 +1,233 @@
+"""
+Format dispatch for tabular imports (Excel, CSV, Parquet)
+
+Every reader yields DataFrames of at most ``chunk_size`` rows whose
+index + 1 is the data row number within the sheet or file, so all formats
+share the same column mapping and validation pipeline.
+
+Parsing a source into validated chunks and spooling them to JSON lines
+needs neither the app nor the database, so process-pool workers run
+parse_source_to_spool() from here.
+"""
+
+import os
+import json
+import logging
+import itertools
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import pandas as pd
+
+from .excel import (
+    iter_excel_chunks, excel_sheet_previews, estimate_excel_rows, has_employee_columns, map_employee_columns,
+    validate_employee_frame
+)
+
+logger = logging.getLogger(__name__)
+
+
+SUPPORTED_EXTENSIONS = {
+    '.xlsx': 'excel',
+    '.xlsm': 'excel',
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+}
+
+FileLike = Union[str, BinaryIO]
+# (valid_rows, errors): valid_rows = [(row_number, employee_data)]
+ParsedChunk = Tuple[List[tuple], List[Dict[str, Any]]]
+
+
+class Source(NamedTuple):
+    """One sheet or file to import."""
+    path: str
+    fmt: str
+    sheet: Optional[str] = None
+    # اسم يظهر في الأخطاء (اسم الملف أو الورقة)
+    label: Optional[str] = None
+    # قسم افتراضي للصفوف التي لا تحدد قسماً (ورقة لكل قسم)
+    department: Optional[str] = None
+
+
+def detect_format(filename: str) -> str:
+    ext = os.path.splitext(filename or '')[1].lower()
+    if ext not in SUPPORTED_EXTENSIONS:
+        raise ValueError(f"صيغة الملف غير مدعومة: {ext or filename} "
+                         f"(المدعوم: {', '.join(SUPPORTED_EXTENSIONS)})")
+    return SUPPORTED_EXTENSIONS[ext]
+
+
+def list_sources(path: str, filename: str, sheet_departments: bool = False,
+                 aliases: Optional[Dict[str, Iterable[str]]] = None) -> List[Source]:
+    """
+    Sources in a stored upload: the file, or for a workbook its first sheet.
+
+    With ``sheet_departments`` every sheet of a workbook is a source and its
+    title is the department of rows without one; sheets with no data rows or
+    without the required headers (a blank "Sheet2", instructions) are skipped.
+    """
+    fmt = detect_format(filename)
+    if fmt != 'excel' or not sheet_departments:
+        return [Source(path, fmt, label=filename)]
+
+    sources = []
+    for name, header, has_rows in excel_sheet_previews(path):
+        if not has_rows or not has_employee_columns(header, aliases):
+            logger.info(f"Skipping sheet {name!r} of {filename}: no employee rows")
+            continue
+        sources.append(Source(path, fmt, sheet=name, label=f"{filename} / {name}", department=name))
+    if not sources:
+        raise ValueError("لا توجد في الملف ورقة تحتوي على بيانات موظفين")
+    return sources
+
+
+def iter_table_chunks(
+    file: FileLike,
+    fmt: str,
+    chunk_size: int = 1000,
+    max_rows: Optional[int] = None,
+    sheet: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    if fmt == 'excel':
+        return iter_excel_chunks(file, chunk_size=chunk_size, max_rows=max_rows, sheet=sheet)
+    if fmt == 'csv':
+        return iter_csv_chunks(file, chunk_size=chunk_size, max_rows=max_rows)
+    if fmt == 'parquet':
+        return iter_parquet_chunks(file, chunk_size=chunk_size, max_rows=max_rows)
+    raise ValueError(f"صيغة الملف غير مدعومة: {fmt}")
+
+
+def iter_employee_chunks(
+    file: FileLike,
+    fmt: str,
+    chunk_size: int = 1000,
+    max_rows: Optional[int] = None,
+    sheet: Optional[str] = None,
+    department: Optional[str] = None,
+    label: Optional[str] = None,
+    aliases: Optional[Dict[str, Iterable[str]]] = None
+) -> Iterator[ParsedChunk]:
+    """
+    Stream a sheet or file as validated (valid_rows, errors) chunks.
+
+    ``department`` fills rows without one (sheet-per-department workbooks);
+    ``label`` is added to each error as 'sheet' when several sources are imported.
+    """
+    chunks = iter_table_chunks(file, fmt, chunk_size=chunk_size, max_rows=max_rows, sheet=sheet)
+    try:
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            raise ValueError("ملف Excel فارغ" if fmt == 'excel' else "الملف فارغ")
+        column_mapping = map_employee_columns(first_chunk, aliases)
+
+        for chunk in itertools.chain([first_chunk], chunks):
+            valid_rows, errors = validate_employee_frame(chunk, column_mapping, department)
+            if label:
+                for error in errors:
+                    error['sheet'] = label
+            yield valid_rows, errors
+    finally:
+        chunks.close()
+
+
+def spool_chunks(chunks: Iterable[ParsedChunk], path: str) -> Iterator[ParsedChunk]:
+    """Pass validated chunks through while writing them to a JSON-lines file."""
+    with open(path, "w", encoding="utf-8") as spool:
+        for valid_rows, errors in chunks:
+            spool.write(json.dumps({"rows": valid_rows, "errors": errors}, ensure_ascii=False))
+            spool.write("\n")
+            yield valid_rows, errors
+
+
+def stage_chunks(chunks: Iterable[ParsedChunk], path: str) -> int:
+    """Consume every chunk into a spool file (before any database work); returns the row count."""
+    rows = 0
+    for valid_rows, errors in spool_chunks(chunks, path):
+        rows += len(valid_rows) + len(errors)
+    return rows
+
+
+def read_spooled_chunks(path: str) -> Iterator[ParsedChunk]:
+    """Replay chunks written by spool_chunks()."""
+    with open(path, encoding="utf-8") as spool:
+        for line in spool:
+            chunk = json.loads(line)
+            yield [tuple(item) for item in chunk["rows"]], chunk["errors"]
+
+
+def parse_source_to_spool(source: Source, path: str, max_rows: Optional[int], chunk_size: int,
+                          aliases: Optional[Dict[str, Iterable[str]]]) -> int:
+    """Process-pool worker: parse one source into a spool file; returns its row count."""
+    with open(source.path, 'rb') as stream:
+        return stage_chunks(iter_employee_chunks(stream, source.fmt, chunk_size, max_rows, source.sheet,
+                                                 source.department, source.label, aliases), path)
+
+
+def _check_limit(read: int, max_rows: Optional[int]):
+    if max_rows and read > max_rows:
+        raise ValueError(f"عدد الصفوف في الملف يتجاوز الحد المسموح ({max_rows})")
+
+
+def iter_csv_chunks(
+    file: FileLike,
+    chunk_size: int = 1000,
+    max_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a UTF-8 CSV (BOM from Excel exports accepted). Cells are read as
+    text, so leading zeros in national IDs survive.
+    """
+    try:
+        reader = pd.read_csv(file, dtype=str, encoding='utf-8-sig', chunksize=chunk_size)
+    except Exception as e:
+        raise ValueError(f"خطأ في قراءة ملف CSV: {str(e)}")
+
+    read = 0
+    with reader:
+        for chunk in reader:
+            read += len(chunk)
+            _check_limit(read, max_rows)
+            chunk.columns = [str(col).strip() for col in chunk.columns]
+            yield chunk
+
+
+def iter_parquet_chunks(
+    file: FileLike,
+    chunk_size: int = 1000,
+    max_rows: Optional[int] = None
+) -> Iterator[pd.DataFrame]:
+    """Stream a Parquet file one record batch at a time (requires pyarrow)."""
+    pq = _pyarrow_parquet()
+    try:
+        parquet = pq.ParquetFile(file)
+    except Exception as e:
+        raise ValueError(f"خطأ في قراءة ملف Parquet: {str(e)}")
+
+    _check_limit(parquet.metadata.num_rows, max_rows)
+    offset = 0
+    for batch in parquet.iter_batches(batch_size=chunk_size):
+        chunk = batch.to_pandas()
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        chunk.columns = [str(col).strip() for col in chunk.columns]
+        offset += len(chunk)
+        yield chunk
+
+
+def estimate_rows(source: Source) -> Optional[int]:
+    """Row count known without reading the data (None for CSV)."""
+    if source.fmt == 'excel':
+        return estimate_excel_rows(source.path, sheet=source.sheet)
+    if source.fmt == 'parquet':
+        try:
+            return _pyarrow_parquet().ParquetFile(source.path).metadata.num_rows
+        except Exception:
+            return None
+    return None
+
+
+def _pyarrow_parquet() -> Any:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("قراءة ملفات Parquet تتطلب تثبيت مكتبة pyarrow")
+    return pq
@@ -1,4 +1,5 @@
 """Monthly vacation accrual service."""
+import time
 import logging
 from datetime import datetime, date
 from msd.database.connection import get_conn
@@ -6,80 +7,164 @@ from msd.database.connection import get_conn
 logger = logging.getLogger(__name__)
 
 
-def run_monthly_accrual():
-    """Run monthly vacation accrual for all active employees (idempotent)."""
-    current_date = date.today()
-    year = current_date.year
-    month = current_date.month
-    
+def pending_accrual_periods(cur, today=None):
+    """
+    Months that still need an accrual run, oldest first.
+
+    Everything after the last logged month up to the current one; just the
+    current month when accrual has never run.
+    """
+    today = today or date.today()
+    cur.execute("SELECT year, month FROM accrual_log ORDER BY year DESC, month DESC LIMIT 1")
+    last = cur.fetchone()
+    if not last:
+        return [(today.year, today.month)]
+
+    periods = []
+    year, month = last[0], last[1]
+    while (year, month) < (today.year, today.month):
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        periods.append((year, month))
+    return periods
+
+
+# حصة سنوية 30 يوماً، و45 يوماً بعد 25 سنة خدمة؛ الاستحقاق الشهري = الحصة / 12
+SERVICE_YEARS_THRESHOLD = 25
+ANNUAL_QUOTA = 30
+SENIOR_ANNUAL_QUOTA = 45
+
+# تواريخ التعيين بصيغة YYYY-MM-DD القياسية تُعالج بجملة UPDATE واحدة
+_CANONICAL_HIRING_DATE = """
+    status = 'active' AND hiring_date IS NOT NULL AND hiring_date != ''
+    AND date(hiring_date) = hiring_date
+"""
+
+_MONTHLY_ACCRUAL_SQL = f"""
+    CASE WHEN (julianday(:as_of) - julianday(hiring_date)) / 365.25 < {SERVICE_YEARS_THRESHOLD}
+         THEN {ANNUAL_QUOTA} / 12.0
+         ELSE {SENIOR_ANNUAL_QUOTA} / 12.0
+    END
+"""
+
+
+def _monthly_accrual(hiring_date, current_date):
+    """Per-employee accrual, used for hiring dates SQLite cannot parse as ISO."""
+    years_of_service = (current_date - hiring_date).days / 365.25
+    if years_of_service < SERVICE_YEARS_THRESHOLD:
+        annual_quota = ANNUAL_QUOTA
+    else:
+        annual_quota = SENIOR_ANNUAL_QUOTA
+    return annual_quota / 12.0
+
+
+def run_monthly_accrual(year=None, month=None):
+    """
+    Run monthly vacation accrual for all active employees (idempotent).
+
+    Defaults to the current month. Catch-up runs for a past month compute
+    years of service as of the first day of that month, and their ledger
+    entries take effect on that day so they land in that month's snapshot.
+
+    Employees with an ISO hiring date are accrued by a single set-based
+    UPDATE; the few remaining non-canonical dates go through strptime as
+    before. Each accrual is also appended to balance_ledger, and a summary
+    row is written to accrual_log.
+    """
+    today = date.today()
+    year = year or today.year
+    month = month or today.month
+    if (year, month) == (today.year, today.month):
+        current_date = today
+        effective_at = None
+    else:
+        current_date = date(year, month, 1)
+        effective_at = f"{current_date.isoformat()} 00:00:00"
+    started = time.perf_counter()
+    params = {"as_of": current_date.isoformat(), "effective_at": effective_at}
+
     conn = get_conn()
     cur = conn.cursor()
-    
+
     try:
+        cur.execute("BEGIN IMMEDIATE")
+
         # Check if accrual already ran for this month
         cur.execute("SELECT 1 FROM accrual_log WHERE year = ? AND month = ?", (year, month))
         if cur.fetchone():
+            conn.rollback()
             logger.info(f"Monthly accrual already processed for {year}-{month:02d}")
-            return
-        
-        # Get all active employees with hiring dates
+            return 0
+
+        params["reference"] = f"accrual:{year}-{month:02d}"
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM balance_ledger")
+        first_entry_id = cur.fetchone()[0]
+
+        # قيود السجل أولاً ثم تحديث الرصيد المخزن في جدول الموظفين
+        cur.execute(f"""
+            INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference, created_at)
+            SELECT id, 'annual', 'accrual', {_MONTHLY_ACCRUAL_SQL}, :reference,
+                   COALESCE(:effective_at, CURRENT_TIMESTAMP)
+            FROM employees
+            WHERE {_CANONICAL_HIRING_DATE}
+        """, params)
+        cur.execute(f"""
+            UPDATE employees
+            SET vacation_balance = COALESCE(vacation_balance, 0) + {_MONTHLY_ACCRUAL_SQL},
+                updated_at = CURRENT_TIMESTAMP
+            WHERE {_CANONICAL_HIRING_DATE}
+        """, params)
+        accrued_count = cur.rowcount
+
+        cur.execute("SELECT COALESCE(SUM(delta), 0) FROM balance_ledger WHERE id > ?", (first_entry_id,))
+        total_days = cur.fetchone()[0]
+
+        # Non-ISO hiring dates (e.g. 2020-1-5): parsed in Python as before
         cur.execute("""
             SELECT id, name, hiring_date, vacation_balance
-            FROM employees 
+            FROM employees
             WHERE status = 'active' AND hiring_date IS NOT NULL AND hiring_date != ''
+              AND (date(hiring_date) IS NULL OR date(hiring_date) != hiring_date)
         """)
-        employees = cur.fetchall()
-        
-        accrued_count = 0
-        
-        for employee in employees:
-            employee_id = employee["id"]
-            name = employee["name"]
-            hiring_date_str = employee["hiring_date"]
-            current_balance = employee["vacation_balance"] or 0
-            
+        updates = []
+        skipped_count = 0
+        for employee in cur.fetchall():
             try:
-                # Parse hiring date
-                hiring_date = datetime.strptime(hiring_date_str, "%Y-%m-%d").date()
-                
-                # Calculate years of service
-                years_of_service = (current_date - hiring_date).days / 365.25
-                
-                # Determine annual vacation quota based on years of service
-                if years_of_service < 25:
-                    annual_quota = 30
-                else:
-                    annual_quota = 45
-                
-                # Monthly accrual = annual quota / 12
-                monthly_accrual = annual_quota / 12.0
-                
-                # Update vacation balance
-                new_balance = current_balance + monthly_accrual
-                
-                cur.execute("""
-                    UPDATE employees 
-                    SET vacation_balance = ?, updated_at = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                """, (new_balance, employee_id))
-                
-                accrued_count += 1
-                logger.debug(f"Accrued {monthly_accrual:.2f} days for {name} (ID: {employee_id})")
-                
-            except ValueError as e:
-                logger.warning(f"Invalid hiring date for employee {name} (ID: {employee_id}): {e}")
-            except Exception as e:
-                logger.error(f"Error processing accrual for employee {name} (ID: {employee_id}): {e}")
-        
-        # Log the accrual run
-        cur.execute("INSERT INTO accrual_log (year, month) VALUES (?, ?)", (year, month))
-        
+                hiring_date = datetime.strptime(employee["hiring_date"], "%Y-%m-%d").date()
+            except (ValueError, TypeError) as e:
+                skipped_count += 1
+                logger.warning(f"Invalid hiring date for employee {employee['name']} (ID: {employee['id']}): {e}")
+                continue
+            monthly_accrual = _monthly_accrual(hiring_date, current_date)
+            updates.append((employee["id"], monthly_accrual, (employee["vacation_balance"] or 0) + monthly_accrual))
+            total_days += monthly_accrual
+
+        if updates:
+            cur.executemany("""
+                INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference, created_at)
+                VALUES (?, 'annual', 'accrual', ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            """, [(employee_id, delta, params["reference"], effective_at) for employee_id, delta, _ in updates])
+            cur.executemany("""
+                UPDATE employees
+                SET vacation_balance = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, [(balance, employee_id) for employee_id, _, balance in updates])
+            accrued_count += len(updates)
+
+        # Log the accrual run (one summary row per month)
+        cur.execute("""
+            INSERT INTO accrual_log (year, month, as_of_date, processed_count, skipped_count,
+                                     total_days, duration_ms)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (year, month, current_date.isoformat(), accrued_count, skipped_count, total_days,
+              int((time.perf_counter() - started) * 1000)))
+
         conn.commit()
         logger.info(f"Monthly accrual completed for {year}-{month:02d}. Processed {accrued_count} employees.")
-        
+        return accrued_count
+
     except Exception as e:
         conn.rollback()
         logger.error(f"Error running monthly accrual: {e}")
         raise
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
@@ -0,0 +1,65 @@
+"""
+Pending vacation approvals.
+
+``approval_queue`` holds one row per vacation waiting for a decision and
+is maintained by triggers on ``vacations`` (insert, workflow transition,
+reassignment, delete), so these reads cost in proportion to the queue,
+not to the whole vacation history.
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from msd.database.connection import get_conn
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATES = ('pending_dept', 'pending_manager')
+
+
+def pending_counts(department_id: Optional[int] = None) -> Dict[str, int]:
+    """Number of pending requests per state, optionally for one department."""
+    query = "SELECT state, COUNT(*) FROM approval_queue"
+    params = []
+    if department_id is not None:
+        query += " WHERE department_id = ?"
+        params.append(department_id)
+    query += " GROUP BY state"
+
+    conn = get_conn()
+    try:
+        counts = dict.fromkeys(PENDING_STATES, 0)
+        counts.update({row[0]: row[1] for row in conn.execute(query, params)})
+        return counts
+    finally:
+        conn.close()
+
+
+def pending_approvals(state: str, department_id: Optional[int] = None, limit: int = 100) -> List[Dict]:
+    """Oldest pending requests in ``state`` first, with employee and type details."""
+    if state not in PENDING_STATES:
+        raise ValueError(f"Unknown pending state: {state}")
+
+    query = """
+        SELECT v.id, v.employee_id, e.name AS employee_name, v.department_id, d.name AS dept_name,
+               v.type_code, vt.name_ar AS type_name, v.start_date, v.end_date, v.duration,
+               v.notes, v.workflow_state, v.created_at
+        FROM approval_queue q
+        JOIN vacations v ON v.id = q.vacation_id
+        JOIN employees e ON e.id = q.employee_id
+        LEFT JOIN departments d ON d.id = q.department_id
+        LEFT JOIN vacation_types vt ON vt.code = v.type_code
+        WHERE q.state = ?
+    """
+    params = [state]
+    if department_id is not None:
+        query += " AND q.department_id = ?"
+        params.append(department_id)
+    query += " ORDER BY q.created_at, q.vacation_id LIMIT ?"
+    params.append(limit)
+
+    conn = get_conn()
+    try:
+        return [dict(row) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
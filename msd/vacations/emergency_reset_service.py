@@ -6,14 +6,36 @@ from msd.database.connection import get_conn
 logger = logging.getLogger(__name__)
 
 
-def run_emergency_reset():
-    """Reset emergency vacation balance on January 1st (idempotent)."""
+def is_reset_due(cur, today=None):
+    """
+    Whether this year's reset still has to run.
+
+    Always on January 1st; on later days only as a catch-up when an earlier
+    year was reset (so a fresh install mid-year does not wipe balances).
+    """
+    today = today or date.today()
+    cur.execute("SELECT MAX(year) FROM emergency_reset_log")
+    last_year = cur.fetchone()[0]
+    if last_year is not None and last_year >= today.year:
+        return False
+    if today.month == 1 and today.day == 1:
+        return True
+    return last_year is not None
+
+
+def run_emergency_reset(year=None):
+    """
+    Reset emergency vacation balance for the year (idempotent).
+
+    Without an explicit year it only runs on January 1st; the scheduler passes
+    the year when catching up a missed reset.
+    """
     current_date = date.today()
-    year = current_date.year
-    
-    # Only run on January 1st
-    if current_date.month != 1 or current_date.day != 1:
-        return
+    if year is None:
+        # Only run on January 1st
+        if current_date.month != 1 or current_date.day != 1:
+            return 0
+        year = current_date.year
     
     conn = get_conn()
     cur = conn.cursor()
@@ -23,8 +45,17 @@ def run_emergency_reset():
         cur.execute("SELECT 1 FROM emergency_reset_log WHERE year = ?", (year,))
         if cur.fetchone():
             logger.info(f"Emergency reset already processed for year {year}")
-            return
+            return 0
         
+        # Ledger entry: the delta that brings each balance back to 12, dated when the reset runs.
+        # الرصيد الحالي يشمل خصومات ما بعد 1 يناير، فتأريخ القيد بيوم 1 يناير يضخّم الأرصدة التاريخية
+        cur.execute("""
+            INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference)
+            SELECT id, 'emergency', 'reset', 12 - COALESCE(emergency_vacation_balance, 0), ?
+            FROM employees
+            WHERE status = 'active' AND COALESCE(emergency_vacation_balance, 0) != 12
+        """, (f"reset:{year}",))
+
         # Reset emergency vacation balance for all active employees
         cur.execute("""
             UPDATE employees 
@@ -39,6 +70,7 @@ def run_emergency_reset():
         
         conn.commit()
         logger.info(f"Emergency vacation reset completed for year {year}. Reset {reset_count} employees.")
+        return reset_count
         
     except Exception as e:
         conn.rollback()
@@ -0,0 +1,209 @@
+"""
+Vacation balance ledger service.
+
+Every change to an employee's annual or emergency balance is appended to
+``balance_ledger``; ``balance_snapshots`` stores the balance of every
+employee at the end of each month. A balance (current or historical) is the
+latest snapshot before the requested date plus the few entries after it.
+``created_at`` is the entry's effective time: catch-up accrual runs back-date their
+entries to the period they cover, so a snapshot is built from the entries
+added since the previous one that fall in or before its month, plus older
+entries that only now reach it. The ``vacation_balance`` / ``emergency_vacation_balance`` columns on
+``employees`` remain as a cache kept in step with the ledger.
+"""
+
+import logging
+from datetime import date, timedelta
+from typing import Optional, List, Tuple
+
+from msd.database.connection import get_conn
+
+logger = logging.getLogger(__name__)
+
+BALANCE_COLUMNS = {
+    'annual': 'vacation_balance',
+    'emergency': 'emergency_vacation_balance',
+}
+
+
+def post_entry(cur, employee_id, balance_type, entry_type, delta, reference=None, user_id=None,
+               effective_at=None):
+    """Append a ledger entry and apply the same delta to the cached column."""
+    column = BALANCE_COLUMNS[balance_type]
+    _insert_entry(cur, employee_id, balance_type, entry_type, delta, reference, user_id, effective_at)
+    cur.execute(f"""
+        UPDATE employees
+        SET {column} = COALESCE({column}, 0) + ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (delta, employee_id))
+
+
+def record_balance_change(cur, employee_id, balance_type, old_balance, new_balance,
+                          entry_type='adjustment', reference=None, user_id=None, effective_at=None):
+    """
+    Record that a balance was set to ``new_balance`` by a caller that already
+    wrote the cached column (imports, manual edits). No entry when unchanged.
+    """
+    delta = (new_balance or 0) - (old_balance or 0)
+    if delta == 0:
+        return
+    _insert_entry(cur, employee_id, balance_type, entry_type, delta, reference, user_id, effective_at)
+
+
+def _insert_entry(cur, employee_id, balance_type, entry_type, delta, reference, user_id, effective_at):
+    # effective_at (YYYY-MM-DD HH:MM:SS) للقيود المتأخرة عن فترتها؛ الافتراضي وقت الإدخال
+    cur.execute("""
+        INSERT INTO balance_ledger (employee_id, balance_type, entry_type, delta, reference, user_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+    """, (employee_id, balance_type, entry_type, delta, reference, user_id, effective_at))
+
+
+def _month_start(year: int, month: int) -> str:
+    return f"{year:04d}-{month:02d}-01 00:00:00"
+
+
+def _next_month(year: int, month: int) -> Tuple[int, int]:
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def take_monthly_snapshot(year: int, month: int, cur=None) -> int:
+    """
+    Snapshot every balance as of the end of ``year-month`` (idempotent).
+
+    Built incrementally from the previous snapshot: entries added since it
+    that are effective before the end of the month, plus entries it already
+    saw that are effective during the month. ``last_entry_id`` is the newest
+    entry seen, so entries back-dated after a snapshot is taken reach the
+    next one. Returns the number of snapshot rows written.
+    """
+    own_conn = cur is None
+    if own_conn:
+        conn = get_conn()
+        cur = conn.cursor()
+
+    period = f"{year:04d}-{month:02d}"
+    period_end = _month_start(*_next_month(year, month))
+    try:
+        cur.execute("SELECT 1 FROM balance_snapshots WHERE period = ? LIMIT 1", (period,))
+        if cur.fetchone():
+            return 0
+
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM balance_ledger")
+        cutoff = cur.fetchone()[0]
+
+        cur.execute("""
+            SELECT period, MAX(last_entry_id) FROM balance_snapshots
+            WHERE period < ? GROUP BY period ORDER BY period DESC LIMIT 1
+        """, (period,))
+        previous = cur.fetchone()
+        prev_period, prev_cutoff = (previous[0], previous[1]) if previous else (None, 0)
+        prev_end = _period_end(prev_period)
+
+        cur.execute("""
+            INSERT INTO balance_snapshots (employee_id, balance_type, period, balance, last_entry_id)
+            SELECT employee_id, balance_type, ?, SUM(amount), ?
+            FROM (
+                SELECT employee_id, balance_type, balance AS amount
+                FROM balance_snapshots WHERE period = ?
+                UNION ALL
+                SELECT employee_id, balance_type, delta
+                FROM balance_ledger WHERE id > ? AND id <= ? AND created_at < ?
+                UNION ALL
+                SELECT employee_id, balance_type, delta
+                FROM balance_ledger WHERE created_at >= ? AND created_at < ? AND id <= ?
+            )
+            GROUP BY employee_id, balance_type
+        """, (period, cutoff, prev_period, prev_cutoff, cutoff, period_end, prev_end, period_end, prev_cutoff))
+        written = cur.rowcount
+
+        if own_conn:
+            conn.commit()
+        logger.info(f"Balance snapshot for {period}: {written} rows (ledger cut-off {cutoff})")
+        return written
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def _period_end(period: Optional[str]) -> str:
+    """Effective-time end of a ``YYYY-MM`` snapshot period (the epoch before any)."""
+    if not period:
+        return "0000-00-00 00:00:00"
+    return _month_start(*_next_month(int(period[:4]), int(period[5:7])))
+
+
+def pending_snapshot_periods(cur, today: Optional[date] = None) -> List[Tuple[int, int]]:
+    """Completed months without a snapshot, from the first ledger month up to last month."""
+    today = today or date.today()
+    cur.execute("SELECT MAX(period) FROM balance_snapshots")
+    last = cur.fetchone()[0]
+    if last:
+        year, month = _next_month(int(last[:4]), int(last[5:7]))
+    else:
+        cur.execute("SELECT MIN(created_at) FROM balance_ledger")
+        first = cur.fetchone()[0]
+        if not first:
+            return []
+        year, month = int(first[:4]), int(first[5:7])
+
+    periods = []
+    while (year, month) < (today.year, today.month):
+        periods.append((year, month))
+        year, month = _next_month(year, month)
+    return periods
+
+
+def get_balance(employee_id: int, balance_type: str = 'annual', as_of: Optional[date] = None) -> float:
+    """
+    Balance from the ledger: latest snapshot before ``as_of`` plus later entries.
+
+    ``as_of`` is inclusive (end of that day); None means the current balance.
+    """
+    if balance_type not in BALANCE_COLUMNS:
+        raise ValueError(f"Unknown balance type: {balance_type}")
+
+    if as_of is None:
+        snapshot_period, entries_before = "9999-12", "9999-12-31 23:59:59"
+    else:
+        # لقطة شهر as_of تغطي نهاية الشهر، لذا نأخذ لقطة الشهر السابق
+        first_of_month = as_of.replace(day=1)
+        snapshot_period = (first_of_month - timedelta(days=1)).strftime("%Y-%m")
+        entries_before = (as_of + timedelta(days=1)).strftime("%Y-%m-%d 00:00:00")
+
+    conn = get_conn()
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT period, balance, last_entry_id FROM balance_snapshots
+            WHERE employee_id = ? AND balance_type = ? AND period <= ?
+            ORDER BY period DESC LIMIT 1
+        """, (employee_id, balance_type, snapshot_period))
+        snapshot = cur.fetchone()
+        period, balance, last_entry_id = tuple(snapshot) if snapshot else (None, 0.0, 0)
+
+        # ما بعد اللقطة: قيود أُضيفت بعدها، أو رأتها اللقطة لكنها تسري بعد شهرها
+        cur.execute("""
+            SELECT COALESCE(SUM(delta), 0) FROM balance_ledger
+            WHERE employee_id = ? AND balance_type = ? AND created_at < ?
+              AND (id > ? OR created_at >= ?)
+        """, (employee_id, balance_type, entries_before, last_entry_id, _period_end(period)))
+        return balance + cur.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def get_ledger(employee_id: int, balance_type: Optional[str] = None, limit: int = 100):
+    """Latest ledger entries for an employee, newest first."""
+    conn = get_conn()
+    cur = conn.cursor()
+    query = "SELECT * FROM balance_ledger WHERE employee_id = ?"
+    params = [employee_id]
+    if balance_type:
+        query += " AND balance_type = ?"
+        params.append(balance_type)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    cur.execute(query, params)
+    entries = cur.fetchall()
+    conn.close()
+    return entries
@@ -0,0 +1,39 @@
+# msd/vacations/routes.py
+"""
+Vacations routes blueprint
+"""
+
+from flask import Blueprint, render_template, request, jsonify
+from flask_login import login_required
+
+from ..database.pagination import page_limit
+from ..employees.routes import scoped_department_id
+from .service import list_vacations_page, vacation_types
+
+vacations_bp = Blueprint("vacations", __name__, url_prefix="")
+
+
+@vacations_bp.route("/vacations")
+@login_required
+def vacations_list():
+    """GET /vacations: vacations page; rows are loaded page by page from /api/vacations"""
+    return render_template("vacations.html", vacation_types=vacation_types())
+
+
+@vacations_bp.route("/api/vacations")
+@login_required
+def vacations_page():
+    """GET /api/vacations: keyset page of vacation requests, newest first, scoped to the user's department"""
+    try:
+        page = list_vacations_page(
+            cursor=request.args.get('cursor'),
+            limit=page_limit(request.args.get('limit')),
+            department_id=scoped_department_id(),
+            state=request.args.get('state') or None,
+            type_code=request.args.get('type') or None,
+            month=request.args.get('month') or None,
+            q=request.args.get('q')
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    return jsonify({"success": True, **page})
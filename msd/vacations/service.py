@@ -0,0 +1,56 @@
+"""Vacation list queries."""
+from typing import Dict, List, Optional
+
+from ..database.connection import get_conn
+from ..database.pagination import keyset_page, DEFAULT_PAGE_SIZE
+from ..database.report_filters import ReportFilter
+
+WORKFLOW_STATES = ('pending_dept', 'pending_manager', 'approved', 'rejected', 'cancelled')
+
+PAGE_QUERY = """
+    SELECT v.id, v.employee_id, e.name AS employee_name, v.department_id, d.name AS dept_name,
+           v.type_code, vt.name_ar AS type_name, v.start_date, v.end_date, v.duration,
+           v.workflow_state, v.notes, v.created_at
+    FROM vacations v
+    JOIN employees e ON v.employee_id = e.id
+    LEFT JOIN departments d ON v.department_id = d.id
+    LEFT JOIN vacation_types vt ON vt.code = v.type_code
+    WHERE 1=1
+"""
+PAGE_KEYS = ("v.created_at", "v.id")
+
+
+def vacation_types() -> List[Dict]:
+    """Vacation type codes and Arabic names for the list filters."""
+    conn = get_conn()
+    try:
+        return [dict(row) for row in conn.execute("SELECT code, name_ar FROM vacation_types ORDER BY name_ar").fetchall()]
+    finally:
+        conn.close()
+
+
+def list_vacations_page(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    department_id: Optional[int] = None,
+    state: Optional[str] = None,
+    type_code: Optional[str] = None,
+    month: Optional[str] = None,
+    q: Optional[str] = None
+) -> Dict:
+    """One page of vacation requests, newest first, ordered by (created_at, id)."""
+    if state and state not in WORKFLOW_STATES:
+        raise ValueError(f"حالة غير معروفة: {state}")
+    filters = (ReportFilter()
+               .equals("v.department_id", department_id)
+               .equals("v.workflow_state", state)
+               .equals("v.type_code", type_code)
+               .overlapping("v.start_date", "v.end_date", month=month)
+               .search(q, contains=["e.name"]))
+
+    conn = get_conn()
+    try:
+        return keyset_page(conn.cursor(), PAGE_QUERY + filters.sql(), filters.params, PAGE_KEYS,
+                           cursor=cursor, limit=limit, descending=True)
+    finally:
+        conn.close()
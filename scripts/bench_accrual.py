@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark the set-based monthly accrual against the old per-employee loop.
+
+Both implementations run on identical copies of a generated database and the
+resulting balances are compared row by row.
+
+Usage:
+    python scripts/bench_accrual.py [--employees 100000]
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from msd import create_app
+from msd.database.connection import get_conn, close_pools
+from msd.vacations.accrual_service import run_monthly_accrual
+
+
+def legacy_accrual(db_path: str, current_date: date):
+    """The previous implementation: strptime + one UPDATE per employee."""
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id, name, hiring_date, vacation_balance
+        FROM employees
+        WHERE status = 'active' AND hiring_date IS NOT NULL AND hiring_date != ''
+    """)
+    for employee in cur.fetchall():
+        try:
+            hiring_date = datetime.strptime(employee["hiring_date"], "%Y-%m-%d").date()
+        except ValueError:
+            continue
+        years_of_service = (current_date - hiring_date).days / 365.25
+        annual_quota = 30 if years_of_service < 25 else 45
+        new_balance = (employee["vacation_balance"] or 0) + annual_quota / 12.0
+        cur.execute("""
+            UPDATE employees
+            SET vacation_balance = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (new_balance, employee["id"]))
+    conn.commit()
+    conn.close()
+
+
+def generate(employees: int):
+    start = date(1985, 1, 1)
+    rows = []
+    for i in range(1, employees + 1):
+        hiring = start + timedelta(days=random.randint(0, 40 * 365))
+        if i % 1000 == 0:
+            hiring_text = f"{hiring.year}-{hiring.month}-{hiring.day}"   # non-padded
+        elif i % 1500 == 0:
+            hiring_text = "غير معروف"
+        else:
+            hiring_text = hiring.isoformat()
+        rows.append((f"موظف {i}", f"{i:012d}", hiring_text,
+                     random.choice([None, 0, 12.5, 30]),
+                     "inactive" if i % 50 == 0 else "active"))
+    conn = get_conn()
+    conn.executemany("""
+        INSERT INTO employees (name, national_id, hiring_date, vacation_balance, status)
+        VALUES (?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+
+
+def balances(db_path: str):
+    conn = sqlite3.connect(db_path)
+    result = conn.execute("SELECT id, vacation_balance FROM employees ORDER BY id").fetchall()
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--employees", type=int, default=100000)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="msd_accrual_")
+    db_path = os.path.join(tmp_dir, "new.db")
+    legacy_path = os.path.join(tmp_dir, "legacy.db")
+
+    class BenchConfig(Config):
+        DB_PATH = db_path
+        SCHEDULER_ENABLED = False
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        generate(args.employees)
+        close_pools()
+        shutil.copy(db_path, legacy_path)
+
+        today = date.today()
+        started = time.perf_counter()
+        legacy_accrual(legacy_path, today)
+        legacy_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        run_monthly_accrual(today.year, today.month)
+        set_based_s = time.perf_counter() - started
+        close_pools()
+
+    identical = balances(db_path) == balances(legacy_path)
+    print(f"employees:    {args.employees}")
+    print(f"legacy loop:  {legacy_s:.3f} s")
+    print(f"set-based:    {set_based_s:.3f} s")
+    print(f"speedup:      {legacy_s / set_based_s:.1f}x")
+    print(f"identical:    {identical}")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(0 if identical else 1)
+
+
+if __name__ == "__main__":
+    main()
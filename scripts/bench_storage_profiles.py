@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark SQLite storage profiles under concurrent read/write load.
+
+Readers run the query behind GET /vacations (manager view), writers run the
+duplicate check + insert behind POST /absences/add. Each profile gets a fresh
+temporary database with the same seed data.
+
+Usage:
+    python scripts/bench_storage_profiles.py [--seconds 5] [--readers 8] [--writers 2]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from msd import create_app
+from msd.database.connection import get_conn, close_pools
+from msd.database.storage import STORAGE_PROFILES
+
+VACATIONS_QUERY = """
+    SELECT v.*, e.name as employee_name, d.name as dept_name
+    FROM vacations v
+    JOIN employees e ON v.employee_id = e.id
+    LEFT JOIN departments d ON e.department_id = d.id
+    ORDER BY v.created_at DESC
+"""
+
+
+def seed(employees: int, vacations: int):
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT id FROM departments")
+    dept_ids = [row["id"] for row in cur.fetchall()]
+    cur.executemany(
+        "INSERT INTO employees (name, national_id, department_id, hiring_date) VALUES (?, ?, ?, ?)",
+        [(f"موظف {i}", f"{i:012d}", random.choice(dept_ids), "2015-01-01") for i in range(1, employees + 1)]
+    )
+    cur.executemany(
+        """INSERT INTO vacations (employee_id, type_code, start_date, end_date, duration)
+           VALUES (?, 'annual', '2025-01-01', '2025-01-05', 5)""",
+        [(random.randint(1, employees),) for _ in range(vacations)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def run_profile(profile: str, args) -> dict:
+    tmp_dir = tempfile.mkdtemp(prefix="msd_bench_")
+
+    class BenchConfig(Config):
+        DB_PATH = os.path.join(tmp_dir, "bench.db")
+        SQLITE_STORAGE_PROFILE = profile
+        SCHEDULER_ENABLED = False
+
+    app = create_app(BenchConfig)
+    counters = {"reads": 0, "writes": 0, "busy": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    with app.app_context():
+        seed(args.employees, args.vacations)
+
+    def reader():
+        with app.app_context():
+            while not stop.is_set():
+                conn = get_conn()
+                try:
+                    conn.execute(VACATIONS_QUERY).fetchall()
+                    with lock:
+                        counters["reads"] += 1
+                except sqlite3.OperationalError:
+                    with lock:
+                        counters["busy"] += 1
+                finally:
+                    conn.close()
+
+    def writer(seed_offset: int):
+        day = date(2000, 1, 1) + timedelta(days=seed_offset * 100000)
+        with app.app_context():
+            while not stop.is_set():
+                employee_id = random.randint(1, args.employees)
+                day += timedelta(days=1)
+                conn = get_conn()
+                try:
+                    cur = conn.cursor()
+                    cur.execute("SELECT id FROM absences WHERE employee_id = ? AND date = ?",
+                                (employee_id, day.isoformat()))
+                    if not cur.fetchone():
+                        cur.execute("""
+                            INSERT INTO absences (employee_id, date, type, duration, notes)
+                            VALUES (?, ?, 'غياب', 1, '')
+                        """, (employee_id, day.isoformat()))
+                    conn.commit()
+                    with lock:
+                        counters["writes"] += 1
+                except sqlite3.OperationalError:
+                    with lock:
+                        counters["busy"] += 1
+                finally:
+                    conn.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    close_pools()
+
+    return {
+        "profile": profile,
+        "reads_per_s": counters["reads"] / elapsed,
+        "writes_per_s": counters["writes"] / elapsed,
+        "busy_errors": counters["busy"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--employees", type=int, default=2000)
+    parser.add_argument("--vacations", type=int, default=5000)
+    parser.add_argument("--profiles", nargs="*", default=list(STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    print(f"{'profile':<10} {'reads/s':>10} {'writes/s':>10} {'busy':>6}")
+    for profile in args.profiles:
+        result = run_profile(profile, args)
+        print(f"{result['profile']:<10} {result['reads_per_s']:>10.1f} "
+              f"{result['writes_per_s']:>10.1f} {result['busy_errors']:>6}")
+
+
+if __name__ == "__main__":
+    main()
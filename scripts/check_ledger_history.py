@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Check historical ledger balances across a late emergency reset.
+
+Replays a year of emergency deductions for one employee on a fresh temporary
+database, runs that year's reset late (as the scheduler's catch-up does after
+downtime) and compares get_balance(as_of=...) on dates before and after the
+reset with the balance the employee actually had, first from the raw ledger
+and again after the monthly snapshots are taken. Exits non-zero on a mismatch
+(e.g. a reset back-dated to January 1st inflating the balances before it ran).
+
+Usage:
+    python scripts/check_ledger_history.py
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from msd import create_app
+from msd.database.connection import get_conn, close_pools
+from msd.vacations.ledger_service import post_entry, get_balance, pending_snapshot_periods, take_monthly_snapshot
+from msd.vacations.emergency_reset_service import run_emergency_reset
+
+# The reset of last year runs today, so every replayed entry is in the past
+YEAR = date.today().year - 1
+
+# (effective day, delta, balance after it)
+TIMELINE = [
+    (date(YEAR - 1, 6, 1), 12, 12),
+    (date(YEAR - 1, 11, 10), -3, 9),
+    (date(YEAR, 3, 5), -2, 7),
+    (date(YEAR, 8, 20), -1, 6),
+]
+
+# (as_of, balance the employee had that day); the reset only lands today
+EXPECTED = [
+    (date(YEAR - 1, 5, 31), 0),
+    (date(YEAR - 1, 6, 1), 12),
+    (date(YEAR - 1, 12, 31), 9),
+    (date(YEAR, 1, 1), 9),
+    (date(YEAR, 3, 5), 7),
+    (date(YEAR, 8, 31), 6),
+    (date(YEAR, 12, 31), 6),
+    (None, 12),
+]
+
+
+def compare(employee_id, label):
+    """Print one line per expected balance; returns the number of mismatches."""
+    failures = 0
+    for as_of, expected in EXPECTED:
+        actual = get_balance(employee_id, 'emergency', as_of=as_of)
+        ok = actual == expected
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {label}: {as_of or 'current'} = {actual:g}"
+              + ("" if ok else f" (expected {expected:g})"))
+    return failures
+
+
+def main():
+    tmp_dir = tempfile.mkdtemp(prefix="msd_ledger_")
+
+    class LedgerConfig(Config):
+        DB_PATH = os.path.join(tmp_dir, "ledger.db")
+        SCHEDULER_ENABLED = False
+
+    app = create_app(LedgerConfig)
+    with app.app_context():
+        conn = get_conn()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO employees (name, national_id, vacation_balance, emergency_vacation_balance)
+            VALUES ('موظف اختبار', 'ledger-check', 0, 0)
+        """)
+        employee_id = cur.lastrowid
+        # قيود متأخرة بتاريخ سريانها، كما تكتبها الخصومات المعتمدة
+        for day, delta, _ in TIMELINE:
+            post_entry(cur, employee_id, 'emergency', 'adjustment' if delta > 0 else 'deduction', delta,
+                       reference='ledger-check', effective_at=f"{day.isoformat()} 00:00:00")
+        conn.commit()
+        conn.close()
+
+        run_emergency_reset(YEAR)
+
+        failures = compare(employee_id, "ledger")
+        conn = get_conn()
+        cur = conn.cursor()
+        for year, month in pending_snapshot_periods(cur):
+            take_monthly_snapshot(year, month, cur)
+        conn.commit()
+        cur.execute("SELECT emergency_vacation_balance FROM employees WHERE id = ?", (employee_id,))
+        cached = cur.fetchone()[0]
+        conn.close()
+        failures += compare(employee_id, "snapshots")
+
+        ok = cached == get_balance(employee_id, 'emergency')
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} cached column = {cached:g}")
+    close_pools()
+
+    if failures:
+        print(f"{failures} balance(s) differ from the replayed history")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Check that report queries use their indexes (EXPLAIN QUERY PLAN).
+
+Builds the absence export, vacation report and keyset list-page queries
+through msd.database.report_filters on a fresh temporary database with the full
+schema and asserts how each table is accessed. Exits non-zero when a query
+falls back to a full scan or a temp sort, so a regression (e.g. a filter
+wrapped in strftime(), or a dropped index) is caught.
+
+Usage:
+    python scripts/check_query_plans.py [--verbose]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from msd import create_app
+from msd.database.connection import get_conn, close_pools
+from msd.database.report_filters import ReportFilter
+from msd.database.pagination import keyset_query, encode_cursor
+from msd.absences.service import absence_export_query
+from msd.absences import service as absences_service
+from msd.employees import service as employees_service
+from msd.vacations import service as vacations_service
+from msd.dashboard.service import COUNTERS_QUERY
+
+VACATIONS_QUERY = """
+    SELECT v.*, e.name as employee_name
+    FROM vacations v
+    JOIN employees e ON v.employee_id = e.id
+    WHERE 1=1
+"""
+
+
+def page(service, filters, cursor=None, descending=False):
+    """SQL of a keyset page of a list endpoint (cursor = key values of the previous page's last row)."""
+    return keyset_query(service.PAGE_QUERY + filters.sql(), filters.params, service.PAGE_KEYS,
+                        cursor=encode_cursor(cursor) if cursor else None, descending=descending)
+
+
+# (name, query, params, table alias, accepted indexes or "PRIMARY KEY")
+# None = a full scan in index order is fine (no filter); the plan must still avoid a temp sort
+CASES = [
+    ("absences: month", *absence_export_query(month="2025-03"), "a", {"idx_absences_date"}),
+    ("absences: year", *absence_export_query(year="2025"), "a", {"idx_absences_date"}),
+    ("absences: from/to", *absence_export_query(date_from="2025-03-01", date_to="2025-03-15"), "a",
+     {"idx_absences_date"}),
+    ("absences: type + month", *absence_export_query(month="2025-03", abs_type="غياب"), "a",
+     {"idx_absences_type_date"}),
+    ("absences: employee + month", *absence_export_query(month="2025-03", employee_id="1"), "a",
+     {"idx_absences_employee_date", "sqlite_autoindex_absences_1"}),
+    ("absences: department + month", *absence_export_query(month="2025-03", department_id=1), "a",
+     {"idx_absences_department_date"}),
+    ("absences: no filter", *absence_export_query(), "a", None),
+    ("vacations: month", *ReportFilter().overlapping("v.start_date", "v.end_date", month="2025-03")
+     .build(VACATIONS_QUERY, order_by="v.start_date DESC"), "v", {"idx_vacations_start_date"}),
+    ("vacations: department queue", *ReportFilter().equals("v.department_id", 1)
+     .equals("v.workflow_state", "pending_dept").build(VACATIONS_QUERY, order_by="v.created_at DESC"), "v",
+     {"idx_vacations_department_state", "idx_vacations_pending_dept"}),
+    # الفهرس الجزئي يُستخدم فقط حين تُكتب الحالة حرفياً لا كمعامل
+    ("vacations: manager queue", VACATIONS_QUERY + " AND v.workflow_state = 'pending_manager'"
+     " ORDER BY v.created_at", [], "v", {"idx_vacations_pending_manager"}),
+    ("approval_queue: department", "SELECT * FROM approval_queue q WHERE q.state = ? AND q.department_id = ?"
+     " ORDER BY q.created_at", ["pending_dept", 1], "q", {"idx_approval_queue_state"}),
+    ("employees page: first", *page(employees_service, ReportFilter()), "e", None),
+    ("employees page: next", *page(employees_service, ReportFilter(), ["سالم", 42]), "e", {"idx_employees_name"}),
+    ("employees page: department", *page(employees_service, ReportFilter().equals("e.department_id", 1),
+                                         ["سالم", 42]), "e", {"idx_employees_department_name"}),
+    ("absences page: next", *page(absences_service, ReportFilter(), ["2025-03-01", 42], descending=True), "a",
+     {"idx_absences_date"}),
+    ("absences page: department + month", *page(absences_service, ReportFilter().period("a.date", month="2025-03")
+                                                .equals("a.department_id", 1), ["2025-03-10", 42], descending=True),
+     "a", {"idx_absences_department_date"}),
+    ("vacations page: next", *page(vacations_service, ReportFilter(), ["2025-03-01 10:00:00", 42], descending=True),
+     "v", {"idx_vacations_created"}),
+    ("vacations page: department", *page(vacations_service, ReportFilter().equals("v.department_id", 1),
+                                         ["2025-03-01 10:00:00", 42], descending=True),
+     "v", {"idx_vacations_department_created"}),
+    ("stats_counters: dashboard", COUNTERS_QUERY.replace("FROM stats_counters", "FROM stats_counters s"),
+     ["2025-03-01"], "s", {"PRIMARY KEY"}),
+]
+
+
+# A scan of a partial index only reads the rows matching its WHERE clause
+PARTIAL_INDEXES = {"idx_vacations_pending_dept", "idx_vacations_pending_manager"}
+
+
+def plan(cur, query, params):
+    cur.execute("EXPLAIN QUERY PLAN " + query, params)
+    return [row["detail"] for row in cur.fetchall()]
+
+
+def check(details, alias, indexes):
+    """Problems found in one plan (empty list = ok); every access to ``alias`` is checked (OR plans)."""
+    problems = []
+    access = [d for d in details if d.startswith((f"SEARCH {alias} ", f"SCAN {alias}"))]
+    if not access:
+        return [f"no access step for {alias}"]
+    for step in access:
+        if indexes is None:
+            if not step.startswith(f"SCAN {alias} USING"):
+                problems.append(f"unordered scan: {step}")
+            continue
+        used = [name for name in indexes if f"USING {name} " in step + " " or f"INDEX {name} " in step + " "]
+        if not used or not (step.startswith(f"SEARCH {alias} ") or used[0] in PARTIAL_INDEXES):
+            problems.append(f"expected SEARCH using {sorted(indexes)}, got: {step}")
+    problems += [f"temp sort: {d}" for d in details if "TEMP B-TREE" in d]
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="msd_plans_")
+
+    class PlanConfig(Config):
+        DB_PATH = os.path.join(tmp_dir, "plans.db")
+        SCHEDULER_ENABLED = False
+
+    app = create_app(PlanConfig)
+    failures = 0
+    with app.app_context():
+        conn = get_conn()
+        cur = conn.cursor()
+        for name, query, params, alias, indexes in CASES:
+            details = plan(cur, query, params)
+            problems = check(details, alias, indexes)
+            failures += bool(problems)
+            print(f"{'FAIL' if problems else 'ok':<5} {name}")
+            for line in (details if args.verbose or problems else []):
+                print(f"        {line}")
+            for problem in problems:
+                print(f"      ! {problem}")
+        conn.close()
+    close_pools()
+
+    if failures:
+        print(f"{failures} query plan(s) regressed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
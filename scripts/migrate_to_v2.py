@@ -1,20 +1,22 @@
 #!/usr/bin/env python3
 """
-Migration script to upgrade existing employees.db to v2 schema.
-This script is idempotent and safe to run multiple times.
+Migration script to upgrade existing employees.db to the latest schema.
+This script is idempotent and safe to run multiple times; the migration
+steps themselves live in msd/database/migrations.py.
 """
 
 import os
 import sys
 import sqlite3
 import shutil
+import argparse
 import logging
 from datetime import datetime
 
 # Add parent directory to path to import modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from msd.database.schema_init import init_database
+from msd.database.migrations import upgrade, get_schema_version, latest_version
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -43,179 +45,47 @@ def create_backup():
         raise
 
 
-def migrate_legacy_data():
-    """Migrate legacy data to new schema format."""
-    if not os.path.exists(DB_PATH):
-        logger.info("No existing database found, creating new one")
-        return
-    
+def run_migrations(target=None):
+    """Apply pending schema migrations (including the legacy data step)."""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
+    conn.execute("PRAGMA foreign_keys = ON")
     try:
-        # Check if we have legacy data that needs migration
-        tables = []
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
-        for row in cur.fetchall():
-            tables.append(row[0])
-        
-        logger.info(f"Found tables: {tables}")
-        
-        # Initialize employees.initial_vacation_balance if NULL
-        if 'employees' in tables:
-            cur.execute("""
-                UPDATE employees 
-                SET initial_vacation_balance = vacation_balance 
-                WHERE initial_vacation_balance IS NULL
-            """)
-            affected = cur.rowcount
-            if affected > 0:
-                logger.info(f"Initialized initial_vacation_balance for {affected} employees")
-        
-        # Migrate departments if we have legacy text department column
-        if 'employees' in tables:
-            # Check if employees has a text 'department' column
-            cur.execute("PRAGMA table_info(employees)")
-            columns = {row[1]: row[2] for row in cur.fetchall()}
-            
-            if 'department' in columns and columns['department'].upper() == 'TEXT':
-                logger.info("Found legacy text department column, migrating...")
-                
-                # Get unique department names
-                cur.execute("SELECT DISTINCT department FROM employees WHERE department IS NOT NULL AND department != ''")
-                legacy_departments = [row[0] for row in cur.fetchall()]
-                
-                for dept_name in legacy_departments:
-                    # Insert department if not exists
-                    cur.execute("INSERT OR IGNORE INTO departments (name) VALUES (?)", (dept_name,))
-                    
-                    # Get department ID
-                    cur.execute("SELECT id FROM departments WHERE name = ?", (dept_name,))
-                    dept_id = cur.fetchone()["id"]
-                    
-                    # Update employees with department_id
-                    cur.execute("""
-                        UPDATE employees 
-                        SET department_id = ? 
-                        WHERE department = ? AND (department_id IS NULL OR department_id = 0)
-                    """, (dept_id, dept_name))
-                
-                logger.info(f"Migrated {len(legacy_departments)} departments")
-        
-        # Migrate vacation workflow states if we have legacy columns
-        if 'vacations' in tables:
-            cur.execute("PRAGMA table_info(vacations)")
-            columns = [row[1] for row in cur.fetchall()]
-            
-            if 'status' in columns and 'dept_approval' in columns:
-                logger.info("Found legacy vacation approval columns, migrating workflow states...")
-                
-                # Migrate workflow states based on legacy approval columns
-                mappings = [
-                    ("'تحت الإجراء'", "dept_approval", "'pending_dept'"),
-                    ("'موافق'", "status", "'pending_manager'", "AND dept_approval = 'موافق'"),
-                    ("'موافق'", "status", "'approved'", "AND manager_approval = 'موافق'"),
-                    ("'approved'", "status", "'approved'"),
-                    ("'مرفوض'", "status", "'rejected'"),
-                    ("'rejected'", "status", "'rejected'"),
-                    ("'مرفوض'", "dept_approval", "'rejected'"),
-                ]
-                
-                # Simple migration for most common cases
-                cur.execute("""
-                    UPDATE vacations 
-                    SET workflow_state = 'pending_dept'
-                    WHERE dept_approval = 'تحت الإجراء' OR dept_approval = 'pending'
-                """)
-                
-                cur.execute("""
-                    UPDATE vacations 
-                    SET workflow_state = 'pending_manager'
-                    WHERE dept_approval = 'موافق' AND (status = 'تحت الإجراء' OR status = 'pending')
-                """)
-                
-                cur.execute("""
-                    UPDATE vacations 
-                    SET workflow_state = 'approved'
-                    WHERE status IN ('موافق', 'approved')
-                """)
-                
-                cur.execute("""
-                    UPDATE vacations 
-                    SET workflow_state = 'rejected'
-                    WHERE status IN ('مرفوض', 'rejected') OR dept_approval = 'مرفوض'
-                """)
-                
-                logger.info("Migrated vacation workflow states")
-        
-        # Map vacation types if we have legacy type text and type_code column exists
-        if 'vacations' in tables:
-            cur.execute("PRAGMA table_info(vacations)")
-            vacation_columns = [row[1] for row in cur.fetchall()]
-            
-            if 'type' in vacation_columns and 'type_code' in vacation_columns:
-                type_mappings = {
-                    'سنوية': 'annual',
-                    'طارئة': 'emergency',
-                    'وضع': 'maternity_single',
-                    'زواج': 'marriage',
-                    'حج': 'hajj',
-                    'وفاة': 'bereavement_d1',
-                    'مرضية': 'sick'
-                }
-                
-                for arabic_type, code in type_mappings.items():
-                    cur.execute("""
-                        UPDATE vacations 
-                        SET type_code = ?
-                        WHERE type = ? AND (type_code IS NULL OR type_code = '')
-                    """, (code, arabic_type))
-        
-        conn.commit()
-        logger.info("Legacy data migration completed successfully")
-        
-    except Exception as e:
-        conn.rollback()
-        logger.error(f"Error during migration: {e}")
-        raise
+        current = get_schema_version(conn)
+        logger.info(f"Current schema version: {current}, latest: {latest_version()}")
+        applied = upgrade(conn, target=target)
+        if applied:
+            logger.info(f"Applied migrations: {applied}")
+        else:
+            logger.info("Schema already up to date")
     finally:
         conn.close()
 
 
 def main():
     """Main migration function."""
-    logger.info("Starting migration to v2 schema...")
+    parser = argparse.ArgumentParser(description="Upgrade employees.db to the latest schema")
+    parser.add_argument("--to", type=int, default=None, dest="target",
+                        help="stop after this schema version (default: latest)")
+    parser.add_argument("--step", action="store_true",
+                        help="apply only the next pending migration")
+    args = parser.parse_args()
+
+    logger.info("Starting schema migration...")
     
     # Create backup
     backup_path = create_backup()
     
     try:
-        # First run the new schema initialization (idempotent)
-        logger.info("Initializing new schema...")
-        
-        # We need to mock the Flask app context for the schema init
-        class MockApp:
-            config = {"DB_PATH": DB_PATH}
-        
-        class MockCurrentApp:
-            def __init__(self):
-                self.config = {"DB_PATH": DB_PATH}
-        
-        # Temporarily replace current_app for schema_init
-        import msd.database.connection
-        original_current_app = getattr(msd.database.connection, 'current_app', None)
-        msd.database.connection.current_app = MockCurrentApp()
-        
-        try:
-            init_database()
-        finally:
-            if original_current_app:
-                msd.database.connection.current_app = original_current_app
-        
-        # Then migrate existing data
-        logger.info("Migrating legacy data...")
-        migrate_legacy_data()
+        target = args.target
+        if args.step and os.path.exists(DB_PATH):
+            conn = sqlite3.connect(DB_PATH)
+            target = get_schema_version(conn) + 1
+            conn.close()
+        elif args.step:
+            target = 1
+
+        run_migrations(target)
         
         logger.info("Migration completed successfully!")
         logger.info(f"Backup available at: {backup_path}")
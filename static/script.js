@@ -120,6 +120,84 @@ function showNotification(message, type = 'info') {
     }, 5000);
 }
 
+// تحميل الجداول صفحةً بعد صفحة من واجهات /api/... (ترقيم بالمفتاح عبر next_cursor)
+class KeysetPager {
+    constructor({ url, tbody, renderRow, moreButton, filters, limit = 50 }) {
+        this.url = url;
+        this.tbody = tbody;
+        this.renderRow = renderRow;
+        this.moreButton = moreButton;
+        this.filters = filters || (() => ({}));
+        this.limit = limit;
+        this.cursor = null;
+        this.generation = 0;
+        this.loading = false;
+        if (this.moreButton) {
+            this.moreButton.addEventListener('click', () => this.load());
+        }
+    }
+
+    // إعادة التحميل من الصفحة الأولى بعد تغيير عوامل التصفية
+    reset() {
+        this.generation += 1;
+        this.cursor = null;
+        this.loading = false;
+        this.tbody.replaceChildren();
+        return this.load();
+    }
+
+    async load() {
+        if (this.loading) return;
+        this.loading = true;
+        const generation = this.generation;
+        const params = new URLSearchParams({ limit: this.limit });
+        Object.entries(this.filters()).forEach(([key, value]) => {
+            if (value) params.set(key, value);
+        });
+        if (this.cursor) params.set('cursor', this.cursor);
+
+        try {
+            const response = await fetch(`${this.url}?${params}`);
+            const data = await response.json();
+            // نتيجة طلب قديم وصلت بعد تغيير التصفية
+            if (generation !== this.generation) return;
+            if (!response.ok || !data.success) {
+                showNotification(data.message || data.error || 'حدث خطأ في تحميل البيانات', 'error');
+                return;
+            }
+            const fragment = document.createDocumentFragment();
+            data.items.forEach(item => fragment.appendChild(this.renderRow(item)));
+            this.tbody.appendChild(fragment);
+            this.cursor = data.next_cursor;
+            if (this.moreButton) {
+                this.moreButton.style.display = this.cursor ? '' : 'none';
+            }
+        } catch (error) {
+            if (generation === this.generation) {
+                showNotification('حدث خطأ في الاتصال', 'error');
+            }
+        } finally {
+            if (generation === this.generation) this.loading = false;
+        }
+    }
+}
+
+// خلية جدول بنص آمن (بدون innerHTML)
+function tableCell(text) {
+    const cell = document.createElement('td');
+    cell.textContent = text === null || text === undefined ? '' : text;
+    return cell;
+}
+
+// تأخير التنفيذ أثناء الكتابة في مربع البحث
+function debounce(fn, delay = 300) {
+    let timer;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), delay);
+    };
+}
+
 // إضافة أنماط إضافية ديناميكياً
 const additionalStyles = `
 .loading-overlay {
@@ -175,6 +253,11 @@ const additionalStyles = `
     }
 }
 
+.load-more {
+    display: block;
+    margin: 1rem auto;
+}
+
 .form-group.focused label {
     color: var(--primary-color);
 }